@@ -0,0 +1,614 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import attr
+import click
+
+from commoncode.resource import VirtualCodebase
+
+from scancode_analyzer import license_analyzer
+from scancode_analyzer import summary
+from scancode_analyzer.analyzer_plugin import LicenseMatch
+from scancode_analyzer.analyzer_plugin import ResultsAnalyzer
+from scancode_analyzer.analyzer_plugin import ResultsAnalyzerTimings
+
+"""
+Benchmark the license detection issues analysis on synthetic ScanCode results
+with many license matches, to measure the time and peak memory of each stage,
+and to check these against the results of a previous run.
+
+The synthetic scans have realistic distributions of matchers, match coverages,
+rule types, unknown license intros and file-region layouts, and scale from a
+few thousand to many millions of license matches: the files are generated and
+analyzed one at a time, except for the `process_codebase` stage which needs a
+whole codebase in memory.
+"""
+
+# Default number of license matches of a synthetic scan
+DEFAULT_MATCHES_COUNT = 10000
+
+# Default maximum ratio of a stage time or peak memory to its baseline value
+DEFAULT_MAX_RATIO = 1.25
+
+# Stage times shorter than this are too noisy to be checked against a baseline
+MIN_CHECKED_DURATION = 0.05
+
+# Words of the synthetic matched texts
+WORDS = (
+    "license", "copyright", "software", "permission", "granted", "free",
+    "warranty", "redistribute", "modify", "terms", "conditions", "the", "of",
+    "and", "or", "any", "this", "under", "version", "without",
+)
+
+LICENSE_KEYS = (
+    "mit", "apache-2.0", "gpl-2.0-plus", "bsd-new", "lgpl-2.1-plus", "isc",
+    "mpl-2.0", "gpl-3.0", "epl-1.0", "zlib",
+)
+
+# Multiple keys expressions, serialized once for each license key
+LICENSE_EXPRESSIONS_WITH_MANY_KEYS = (
+    "gpl-2.0 OR mit", "apache-2.0 AND bsd-new", "gpl-2.0-plus WITH gcc-exception",
+)
+
+# {kind of file-region: relative weight}, from the proportions of file-regions
+# in the scans of large codebases
+REGION_KINDS = {
+    "notice": 45,
+    "text": 8,
+    "hash": 2,
+    "spdx": 10,
+    "reference": 10,
+    "tag": 5,
+    "fragments": 8,
+    "near-perfect": 5,
+    "extra-words": 4,
+    "unknown-intro": 3,
+}
+
+# Number of lines between two file-regions, more than the LINES_THRESHOLD used
+# to group license matches in file-regions
+REGION_GAP_LINES = license_analyzer.LINES_THRESHOLD + 10
+
+
+@attr.s
+class SyntheticRule:
+    """
+    The matched_rule of the synthetic license matches to a rule, with the lines
+    count of its matched text.
+    """
+    identifier = attr.ib()
+    license_expression = attr.ib()
+    is_license_text = attr.ib(default=False)
+    is_license_notice = attr.ib(default=False)
+    is_license_reference = attr.ib(default=False)
+    is_license_tag = attr.ib(default=False)
+    is_license_intro = attr.ib(default=False)
+    rule_length = attr.ib(default=100)
+    lines_count = attr.ib(default=10)
+
+    def to_dict(self, matcher, matched_length, match_coverage):
+        return dict(
+            identifier=self.identifier,
+            license_expression=self.license_expression,
+            licenses=get_license_keys(self.license_expression),
+            is_license_text=self.is_license_text,
+            is_license_notice=self.is_license_notice,
+            is_license_reference=self.is_license_reference,
+            is_license_tag=self.is_license_tag,
+            is_license_intro=self.is_license_intro,
+            matcher=matcher,
+            rule_length=self.rule_length,
+            matched_length=matched_length,
+            match_coverage=match_coverage,
+            rule_relevance=100,
+        )
+
+
+def get_license_keys(license_expression):
+    return [
+        key for key in license_expression.split()
+        if key not in ("AND", "OR", "WITH")
+    ]
+
+
+@attr.s
+class ScanGenerator:
+    """
+    Generate synthetic scanned files with license matches.
+    """
+    randomizer = attr.ib()
+    # {(region kind, rule number): SyntheticRule}
+    rules = attr.ib(factory=dict)
+    # {lines count: matched text}, as the texts of the same rules are repeated
+    texts = attr.ib(factory=dict)
+
+    def get_text(self, lines_count, variant=0):
+        text = self.texts.get((lines_count, variant))
+        if text is None:
+            randomizer = random.Random(lines_count * 1000 + variant)
+            text = "\n".join(
+                " ".join(randomizer.choice(WORDS) for _ in range(10))
+                for _ in range(lines_count)
+            )
+            self.texts[lines_count, variant] = text
+        return text
+
+    def get_rule(self, kind):
+        """
+        Return a SyntheticRule for a `kind` of file-region, picked from a few
+        hundred rules of each kind, as most matches are to a few rules.
+        """
+        randomizer = self.randomizer
+        number = int(randomizer.paretovariate(1.2)) % 300
+        rule = self.rules.get((kind, number))
+        if rule:
+            return rule
+
+        rule_randomizer = random.Random(f"{kind}:{number}")
+        if rule_randomizer.random() < 0.05:
+            license_expression = rule_randomizer.choice(
+                LICENSE_EXPRESSIONS_WITH_MANY_KEYS
+            )
+        else:
+            license_expression = rule_randomizer.choice(LICENSE_KEYS)
+        identifier = f"{license_expression.split()[0]}_{kind}_{number}.RULE"
+
+        if kind in ("text", "hash", "fragments"):
+            rule = SyntheticRule(
+                identifier=f"{license_expression.split()[0]}.LICENSE",
+                license_expression=license_expression,
+                is_license_text=True,
+                rule_length=rule_randomizer.randint(150, 3000),
+                lines_count=rule_randomizer.randint(20, 200),
+            )
+        elif kind == "spdx":
+            rule = SyntheticRule(
+                identifier=f"spdx-license-identifier-{license_expression}",
+                license_expression=license_expression,
+                is_license_tag=True,
+                rule_length=rule_randomizer.randint(2, 6),
+                lines_count=1,
+            )
+        elif kind == "reference":
+            rule = SyntheticRule(
+                identifier=identifier,
+                license_expression=license_expression,
+                is_license_reference=True,
+                rule_length=rule_randomizer.randint(2, 12),
+                lines_count=rule_randomizer.randint(1, 2),
+            )
+        elif kind == "tag":
+            rule = SyntheticRule(
+                identifier=identifier,
+                license_expression=license_expression,
+                is_license_tag=True,
+                rule_length=rule_randomizer.randint(1, 3),
+                lines_count=1,
+            )
+        elif kind == "unknown-intro":
+            rule = SyntheticRule(
+                identifier=f"license-intro_{number}.RULE",
+                license_expression="unknown-license-reference",
+                is_license_intro=True,
+                rule_length=rule_randomizer.randint(2, 8),
+                lines_count=1,
+            )
+        else:
+            rule = SyntheticRule(
+                identifier=identifier,
+                license_expression=license_expression,
+                is_license_notice=True,
+                rule_length=rule_randomizer.randint(20, 300),
+                lines_count=rule_randomizer.randint(3, 25),
+            )
+
+        self.rules[kind, number] = rule
+        return rule
+
+    def get_license_matches(self, rule, start_line, matcher, match_coverage, score):
+        """
+        Return a list of serialized license matches to a `rule` SyntheticRule,
+        one for each license key of its license expression as in ScanCode
+        results.
+        """
+        end_line = start_line + rule.lines_count - 1
+        matched_length = max(1, int(rule.rule_length * match_coverage / 100))
+        matched_rule = rule.to_dict(
+            matcher=matcher,
+            matched_length=matched_length,
+            match_coverage=match_coverage,
+        )
+        matched_text = self.get_text(rule.lines_count)
+        return [
+            dict(
+                key=key,
+                score=score,
+                start_line=start_line,
+                end_line=end_line,
+                matched_rule=matched_rule,
+                matched_text=matched_text,
+            )
+            for key in matched_rule["licenses"]
+        ]
+
+    def get_region_license_matches(self, kind, start_line):
+        """
+        Return a tuple of (list of serialized license matches, end line) of a
+        file-region of a `kind` starting at `start_line`.
+        """
+        randomizer = self.randomizer
+        rule = self.get_rule(kind)
+
+        if kind == "fragments":
+            license_matches = []
+            for _ in range(randomizer.randint(2, 8)):
+                match_coverage = round(randomizer.uniform(5, 60), 2)
+                license_matches.extend(self.get_license_matches(
+                    rule, start_line, "3-seq", match_coverage, match_coverage,
+                ))
+                start_line = license_matches[-1]["end_line"] + 1
+            return license_matches, start_line
+
+        if kind == "unknown-intro":
+            license_matches = self.get_license_matches(
+                rule, start_line, "2-aho", 100.0, 100.0,
+            )
+            notice = self.get_rule("notice")
+            license_matches.extend(self.get_license_matches(
+                notice, start_line + 1, "2-aho", 100.0, 100.0,
+            ))
+            return license_matches, license_matches[-1]["end_line"]
+
+        matcher = "2-aho"
+        match_coverage = 100.0
+        score = 100.0
+        if kind == "hash":
+            matcher = "1-hash"
+        elif kind == "spdx":
+            matcher = "4-spdx-id"
+        elif kind == "near-perfect":
+            match_coverage = score = round(randomizer.uniform(95, 99.9), 2)
+        elif kind == "extra-words":
+            score = round(randomizer.uniform(80, 99.9), 2)
+        elif kind == "tag" and randomizer.random() < 0.5:
+            # Short matches far in a file are likely false positives
+            start_line += 1000
+
+        license_matches = self.get_license_matches(
+            rule, start_line, matcher, match_coverage, score,
+        )
+        return license_matches, license_matches[-1]["end_line"]
+
+    def get_scanned_file(self, file_number):
+        """
+        Return a mapping of a synthetic scanned file with a few file-regions.
+        """
+        randomizer = self.randomizer
+        kinds = randomizer.choices(
+            list(REGION_KINDS),
+            weights=list(REGION_KINDS.values()),
+            k=min(int(randomizer.expovariate(0.8)) + 1, 8),
+        )
+        is_license_text = "text" in kinds and randomizer.random() < 0.5
+        start_line = randomizer.randint(1, 20)
+        license_matches = []
+        for kind in kinds:
+            region_license_matches, end_line = self.get_region_license_matches(
+                kind, start_line,
+            )
+            license_matches.extend(region_license_matches)
+            start_line = end_line + REGION_GAP_LINES
+
+        return dict(
+            path=f"codebase/dir{file_number % 1000}/file{file_number}.c",
+            type="file",
+            licenses=license_matches,
+            is_license_text=is_license_text,
+            is_legal=is_license_text and randomizer.random() < 0.5,
+            scan_errors=[],
+        )
+
+
+def generate_scanned_files(matches_count, seed=42):
+    """
+    Yield mappings of synthetic scanned files, with about `matches_count`
+    serialized license matches in total.
+    """
+    generator = ScanGenerator(randomizer=random.Random(seed))
+    generated_matches_count = 0
+    file_number = 0
+    while generated_matches_count < matches_count:
+        scanned_file = generator.get_scanned_file(file_number)
+        generated_matches_count += len(scanned_file["licenses"])
+        file_number += 1
+        yield scanned_file
+
+
+@attr.s
+class StageResult:
+    """
+    The time in seconds and peak traced memory in bytes of a benchmark stage.
+    """
+    duration = attr.ib(default=0.0)
+    peak_memory = attr.ib(default=None)
+
+
+@attr.s
+class MemoryTracer:
+    """
+    Trace the peak memory of the Python allocations of a benchmark stage, if
+    enabled, as tracing memory slows down the benchmark a lot.
+    """
+    enabled = attr.ib(default=False)
+
+    def start(self):
+        if self.enabled:
+            tracemalloc.start()
+
+    def stop(self, stage_result):
+        if self.enabled:
+            _current, stage_result.peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+
+def benchmark_analysis(matches_count, memory_tracer):
+    """
+    Return a mapping of {stage: StageResult} for the analysis of the synthetic
+    scanned files one at a time, with `LicenseMatch.from_files_licenses`,
+    `LicenseDetectionIssue.from_license_matches` and
+    `SummaryLicenseIssues.summarize`.
+    """
+    convert = StageResult()
+    analyze = StageResult()
+    summarize = StageResult()
+
+    license_issues = []
+    count_has_license = 0
+    count_files_with_issues = 0
+
+    memory_tracer.start()
+    for scanned_file in generate_scanned_files(matches_count):
+        count_has_license += 1
+
+        start = time.perf_counter()
+        license_matches = LicenseMatch.from_files_licenses(scanned_file["licenses"])
+        converted = time.perf_counter()
+        convert.duration += converted - start
+
+        ars = list(license_analyzer.LicenseDetectionIssue.from_license_matches(
+            license_matches=license_matches,
+            path=scanned_file["path"],
+            is_license_text=scanned_file["is_license_text"],
+            is_legal=scanned_file["is_legal"],
+        ))
+        analyze.duration += time.perf_counter() - converted
+
+        if ars:
+            count_files_with_issues += 1
+            license_issues.extend(ars)
+    memory_tracer.stop(analyze)
+
+    memory_tracer.start()
+    start = time.perf_counter()
+    summary.SummaryLicenseIssues.summarize(
+        license_issues, count_has_license, count_files_with_issues,
+    )
+    summarize.duration = time.perf_counter() - start
+    memory_tracer.stop(summarize)
+
+    return {
+        "from_files_licenses": convert,
+        "from_license_matches": analyze,
+        "summarize": summarize,
+    }
+
+
+def benchmark_process_codebase(matches_count, processes, memory_tracer):
+    """
+    Return a mapping of {stage: StageResult} for the analysis of a whole
+    VirtualCodebase of the synthetic scanned files with `process_codebase`,
+    including the timings of the stages reported by the analyzer.
+
+    The synthetic scanned files are written one at a time to a temporary scan
+    file that the VirtualCodebase is loaded from, so that they are not all in
+    memory before loading the codebase.
+    """
+    codebase_attributes = dict(ResultsAnalyzer.codebase_attributes)
+    codebase_attributes.update(ResultsAnalyzerTimings.codebase_attributes)
+
+    descriptor, scan_location = tempfile.mkstemp(suffix=".json")
+    try:
+        with os.fdopen(descriptor, "w") as scan_file:
+            write_scan_file(matches_count, scan_file)
+
+        load = StageResult()
+        memory_tracer.start()
+        start = time.perf_counter()
+        codebase = VirtualCodebase(
+            scan_location,
+            codebase_attributes=codebase_attributes,
+            resource_attributes=dict(ResultsAnalyzer.resource_attributes),
+        )
+        load.duration = time.perf_counter() - start
+        memory_tracer.stop(load)
+    finally:
+        os.remove(scan_location)
+
+    process = StageResult()
+    memory_tracer.start()
+    start = time.perf_counter()
+    ResultsAnalyzer().process_codebase(
+        codebase=codebase,
+        processes=processes,
+        analyze_license_results_timings=True,
+    )
+    process.duration = time.perf_counter() - start
+    memory_tracer.stop(process)
+
+    stages = {"load_codebase": load, "process_codebase": process}
+    analysis_timings = codebase.attributes.license_detection_issues_timings
+    for stage, duration in analysis_timings["timings"].items():
+        stages[f"process_codebase:{stage}"] = StageResult(duration=duration)
+    return stages
+
+
+def get_max_rss():
+    """
+    Return the maximum resident set size of this process in bytes, or None if
+    not available on this platform.
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # This is in kilobytes on Linux and in bytes on macOS
+    if sys.platform != "darwin":
+        max_rss *= 1024
+    return max_rss
+
+
+def check_baseline(results, baseline, max_ratio):
+    """
+    Return a list of messages for each stage time or peak memory of `results`
+    that is more than `max_ratio` times its value in the `baseline` results.
+    """
+    regressions = []
+    baseline_stages = baseline.get("stages", {})
+    for stage, result in results["stages"].items():
+        baseline_result = baseline_stages.get(stage)
+        if not baseline_result:
+            continue
+
+        for measure in ("duration", "peak_memory"):
+            value = result.get(measure)
+            baseline_value = baseline_result.get(measure)
+            if not value or not baseline_value:
+                continue
+            if measure == "duration" and baseline_value < MIN_CHECKED_DURATION:
+                continue
+            ratio = value / baseline_value
+            if ratio > max_ratio:
+                regressions.append(
+                    f"{stage} {measure}: {value} is {ratio:.2f} times the "
+                    f"baseline {baseline_value}"
+                )
+    return regressions
+
+
+def write_scan_file(matches_count, output):
+    """
+    Write a synthetic scan with `matches_count` license matches as JSON to the
+    `output` file, one file at a time.
+    """
+    output.write('{"headers": [], "files": [\n')
+    for file_number, scanned_file in enumerate(
+        generate_scanned_files(matches_count)
+    ):
+        if file_number:
+            output.write(",\n")
+        output.write(json.dumps(scanned_file))
+    output.write("\n]}\n")
+
+
+@click.command()
+@click.option("--matches", "matches_count", type=int,
+    default=DEFAULT_MATCHES_COUNT, show_default=True,
+    help="Number of license matches of the synthetic scan.")
+@click.option("--stage", "stages", multiple=True,
+    type=click.Choice(["analysis", "codebase"]),
+    help="Benchmark only these stages. [default: all]")
+@click.option("--processes", type=int, default=1, show_default=True,
+    help="Number of processes of process_codebase.")
+@click.option("--trace-memory", is_flag=True, default=False,
+    help="Trace the peak memory of each stage, which is much slower.")
+@click.option("--json", "json_output", type=click.File("w"), metavar="FILE",
+    help="Write the benchmark results as JSON to FILE.")
+@click.option("--baseline", type=click.File("r"), metavar="FILE",
+    help="Fail if any stage is slower or uses more memory than in the JSON "
+    "benchmark results of FILE, by more than --max-ratio.")
+@click.option("--max-ratio", type=float, default=DEFAULT_MAX_RATIO,
+    show_default=True,
+    help="Maximum ratio of a stage time or peak memory to its baseline.")
+@click.option("--write-scan", type=click.File("w"), metavar="FILE",
+    help="Only write the synthetic scan as JSON to FILE, for instance to "
+    "analyze it with the scancode-analyzer command.")
+@click.help_option("-h", "--help")
+def benchmark(
+    matches_count,
+    stages,
+    processes,
+    trace_memory,
+    json_output,
+    baseline,
+    max_ratio,
+    write_scan,
+):
+    """
+    Time the stages of the license detection issues analysis of a synthetic
+    scan, and track their peak memory.
+    """
+    if write_scan:
+        write_scan_file(matches_count, write_scan)
+        return
+
+    stages = stages or ("analysis", "codebase")
+    memory_tracer = MemoryTracer(enabled=trace_memory)
+
+    stage_results = {}
+    if "analysis" in stages:
+        stage_results.update(benchmark_analysis(matches_count, memory_tracer))
+    if "codebase" in stages:
+        stage_results.update(
+            benchmark_process_codebase(matches_count, processes, memory_tracer)
+        )
+
+    results = dict(
+        matches_count=matches_count,
+        processes=processes,
+        max_rss=get_max_rss(),
+        stages={
+            stage: attr.asdict(stage_result)
+            for stage, stage_result in stage_results.items()
+        },
+    )
+
+    click.echo(f"{matches_count} license matches, {processes} process(es)")
+    for stage, stage_result in stage_results.items():
+        line = f"{stage:<50} {stage_result.duration:10.3f}s"
+        if stage_result.peak_memory is not None:
+            line += f" {stage_result.peak_memory / 2 ** 20:10.1f} MB peak"
+        click.echo(line)
+    if results["max_rss"]:
+        click.echo(f"{'max RSS':<50} {results['max_rss'] / 2 ** 20:10.1f} MB")
+
+    if json_output:
+        json.dump(results, json_output, indent=2)
+
+    if baseline:
+        regressions = check_baseline(results, json.load(baseline), max_ratio)
+        if regressions:
+            raise click.ClickException(
+                "Performance regressions:\n" + "\n".join(regressions)
+            )
+
+
+if __name__ == "__main__":
+    benchmark()
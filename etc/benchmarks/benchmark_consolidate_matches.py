@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import random
+import time
+from unittest import mock
+
+import attr
+import click
+
+from scancode_analyzer import license_analyzer
+
+"""
+Benchmark `license_analyzer.consolidate_matches` on long file-regions with many
+fragment license matches, as in large license text files.
+"""
+
+
+@attr.s
+class FragmentMatch:
+    """
+    A license match with only the attributes used to consolidate matches.
+    """
+    start_line = attr.ib()
+    end_line = attr.ib()
+    matched_text = attr.ib()
+
+
+def quadratic_merge_string_with_overlap(string1, string2):
+    """
+    The previous implementation of `merge_string_with_overlap`.
+    """
+    idx = 0
+    while not string2.startswith(string1[idx:]):
+        idx += 1
+    return string1[:idx] + string2
+
+
+def get_fragment_matches(lines_count, line_length, fragment_lines, seed=42):
+    """
+    Return a list of FragmentMatch of `fragment_lines` lines each for a random
+    text of `lines_count` lines of `line_length` characters, where each fragment
+    overlaps the previous one on one line.
+    """
+    randomizer = random.Random(seed)
+    words = ["license", "copyright", "software", "the", "of", "and", "or", "any"]
+    lines = []
+    for _ in range(lines_count):
+        line = []
+        while sum(map(len, line)) + len(line) < line_length:
+            line.append(randomizer.choice(words))
+        lines.append(" ".join(line))
+
+    matches = []
+    start_line = 1
+    while start_line < lines_count:
+        end_line = min(start_line + fragment_lines - 1, lines_count)
+        matches.append(FragmentMatch(
+            start_line=start_line,
+            end_line=end_line,
+            matched_text="\n".join(lines[start_line - 1:end_line]),
+        ))
+        start_line = end_line
+    return matches
+
+
+def run_timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+@click.command()
+@click.option("--lines", "lines_count", type=int, default=2000, show_default=True,
+    help="Number of lines of the license text.")
+@click.option("--line-length", type=int, default=80, show_default=True,
+    help="Number of characters of each line.")
+@click.option("--fragment-lines", type=int, default=40, show_default=True,
+    help="Number of lines of each fragment match.")
+@click.option("--compare", is_flag=True, default=False,
+    help="Also time the previous quadratic overlap merge.")
+@click.help_option("-h", "--help")
+def benchmark(lines_count, line_length, fragment_lines, compare):
+    """
+    Time consolidating the matched texts of many fragment license matches.
+    """
+    matches = get_fragment_matches(lines_count, line_length, fragment_lines)
+    click.echo(
+        f"{len(matches)} fragment matches, "
+        f"{sum(len(m.matched_text) for m in matches)} characters"
+    )
+
+    matched_text, duration = run_timed(license_analyzer.consolidate_matches, matches)
+    click.echo(f"consolidate_matches: {duration:.3f}s")
+
+    if compare:
+        with mock.patch.object(
+            license_analyzer,
+            "merge_string_with_overlap",
+            quadratic_merge_string_with_overlap,
+        ):
+            expected, duration = run_timed(
+                license_analyzer.consolidate_matches, matches,
+            )
+        click.echo(f"consolidate_matches with quadratic merge: {duration:.3f}s")
+        if matched_text != expected:
+            raise click.ClickException("Consolidated matched texts are different.")
+
+
+if __name__ == "__main__":
+    benchmark()
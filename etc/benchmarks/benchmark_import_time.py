@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import click
+
+"""
+Benchmark the startup cost of the scancode-analyzer plugins, which ScanCode
+imports for every scan, even without the `--analyze-license-results` option.
+
+Each scenario runs in a fresh Python process, and reports its median time and
+which of the modules that are only needed by the analysis were imported.
+"""
+
+# Modules only imported when the license detection issues analysis runs
+DEFERRED_MODULES = (
+    "scancode_analyzer.license_analyzer",
+    "scancode_analyzer.summary",
+    "scancode_analyzer.cache",
+    "sqlite3",
+    "license_expression",
+    "scancode.api",
+    "scancode.pool",
+    "licensedcode.tokenize",
+)
+
+# Modules of this package only imported when the analysis runs. The other
+# DEFERRED_MODULES are also imported by other ScanCode plugins.
+DEFERRED_ANALYZER_MODULES = (
+    "scancode_analyzer.license_analyzer",
+    "scancode_analyzer.summary",
+    "scancode_analyzer.cache",
+)
+
+# Python code run in a fresh process, which prints a JSON mapping with the
+# elapsed time of its `{code}`, run after its `{setup}` code, and the
+# DEFERRED_MODULES imported by this code
+SCENARIO_TEMPLATE = """
+import json
+import sys
+import time
+
+{setup}
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps(dict(
+    elapsed=elapsed,
+    imported=[module for module in {modules!r} if module in sys.modules],
+)), file=sys.stderr)
+"""
+
+RUN_SCANCODE = """
+from scancode import cli
+try:
+    cli.scancode({args!r}, standalone_mode=False)
+except SystemExit:
+    pass
+"""
+
+# ScanCode has already imported these modules when it loads its plugins
+IMPORT_PLUGIN_FRAMEWORK = """
+import commoncode.cliutils
+import plugincode.post_scan
+"""
+
+# The scancode-analyzer plugins are loaded by ScanCode from this module
+IMPORT_PLUGIN = "import scancode_analyzer.analyzer_plugin"
+
+# Import the plugin and the modules that were imported with it before these
+# were deferred, to compare
+IMPORT_PLUGIN_AND_ANALYSIS = IMPORT_PLUGIN + "\n" + "\n".join(
+    f"import {module}" for module in DEFERRED_MODULES
+)
+
+
+def get_scenarios(output_location):
+    """
+    Return a mapping of {scenario name: (setup Python code, timed Python code,
+    modules which must not be imported by the timed code)}.
+    """
+    info_scan_args = [
+        "--info", "--processes", "-1", "--quiet",
+        "--json", output_location, __file__,
+    ]
+    return {
+        "import plugin": (
+            IMPORT_PLUGIN_FRAMEWORK, IMPORT_PLUGIN, DEFERRED_MODULES,
+        ),
+        "import plugin and analysis": (
+            IMPORT_PLUGIN_FRAMEWORK, IMPORT_PLUGIN_AND_ANALYSIS, (),
+        ),
+        "scancode --help": (
+            "",
+            RUN_SCANCODE.format(args=["--help"]),
+            DEFERRED_ANALYZER_MODULES,
+        ),
+        "scancode --info scan": (
+            "",
+            RUN_SCANCODE.format(args=info_scan_args),
+            DEFERRED_ANALYZER_MODULES,
+        ),
+    }
+
+
+def run_scenario(setup, code):
+    """
+    Return a mapping of the elapsed time and imported DEFERRED_MODULES of `code`
+    run after `setup` in a fresh Python process.
+    """
+    script = SCENARIO_TEMPLATE.format(
+        setup=setup,
+        code=code,
+        modules=DEFERRED_MODULES,
+    )
+    process = subprocess.run(
+        [sys.executable, "-c", script],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    # The results are printed last, after any warnings
+    return json.loads(process.stderr.strip().splitlines()[-1])
+
+
+@click.command()
+@click.option("--runs", type=int, default=10, show_default=True,
+    help="Number of runs of each scenario.")
+@click.option("--check", is_flag=True, default=False,
+    help="Fail if a scenario imports a module that is only needed by the "
+    "analysis.")
+@click.help_option("-h", "--help")
+def benchmark(runs, check):
+    """
+    Time the import of the scancode-analyzer plugins and of ScanCode commands
+    without the license detection issues analysis.
+    """
+    failures = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_location = os.path.join(temp_dir, "scan.json")
+        scenarios = get_scenarios(output_location)
+        for name, (setup, code, forbidden) in scenarios.items():
+            results = [run_scenario(setup, code) for _ in range(runs)]
+            median = statistics.median(result["elapsed"] for result in results)
+            imported = results[-1]["imported"]
+            click.echo(f"{name:<30} {median * 1000:10.1f} ms")
+            click.echo(f"{'':<30} imported: {', '.join(imported) or '-'}")
+
+            unexpected = [module for module in imported if module in forbidden]
+            if unexpected:
+                failures.append(f"{name} imported: {', '.join(unexpected)}")
+
+    if check and failures:
+        raise click.ClickException(
+            "Modules only needed by the analysis were imported:\n"
+            + "\n".join(failures)
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
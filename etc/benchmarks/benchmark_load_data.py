@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import itertools
+import tempfile
+import time
+
+import click
+import pandas as pd
+
+from licensedcode import models
+
+from scancode_analyzer import load_data
+
+"""
+Benchmark building the DataFrames of ScanCode rules and licenses of
+`load_data.LicenseRulesInfo`, from a record for each rule or license, against
+building and concatenating a one-row DataFrame for each rule or license, and
+loading them from a cold and a warm cache.
+"""
+
+
+def run_timed(function, *args):
+    """
+    Return a tuple of (result, elapsed seconds) of calling `function` with `args`.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def build_dataframe_per_row(records):
+    """
+    Return a DataFrame built from `records` as previously done, with a one-row
+    DataFrame for each record.
+    """
+    return pd.concat([
+        pd.DataFrame.from_dict(record, orient="index").T
+        for record in records
+    ])
+
+
+def get_memory_usage(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+@click.command()
+@click.option("--max-rules", type=int, default=5000, show_default=True,
+    help="Maximum number of rules to load, as building the DataFrame of all "
+    "the rules one row at a time takes minutes. Use 0 to load all the rules.")
+@click.option("--cache", is_flag=True, default=False,
+    help="Also time LicenseRulesInfo with all the rules and licenses, with a "
+    "cold and a warm cache.")
+@click.option("--processes", type=int, default=1, show_default=True,
+    help="Number of processes to load the rules and licenses files with, "
+    "when timing LicenseRulesInfo.")
+@click.option("--without-text", is_flag=True, default=False,
+    help="Load LicenseRulesInfo without the texts of the rules and licenses.")
+@click.help_option("-h", "--help")
+def benchmark(max_rules, cache, processes, without_text):
+    """
+    Time building the DataFrames of ScanCode rules and licenses, one row at a
+    time and from records, and report their memory usage.
+    """
+    rules = models.load_rules(models.rules_data_dir)
+    if max_rules:
+        rules = itertools.islice(rules, max_rules)
+    rule_records = [load_data.get_rule_record(rule) for rule in rules]
+
+    licenses = models.load_licenses(models.licenses_data_dir)
+    license_records = [
+        load_data.get_license_record(lic) for lic in licenses.values()
+    ]
+
+    datasets = [
+        (
+            "rules",
+            rule_records,
+            load_data.categorical_rule_attributes,
+            load_data.boolean_rule_attributes,
+        ),
+        (
+            "licenses",
+            license_records,
+            load_data.categorical_license_attributes,
+            load_data.boolean_license_attributes,
+        ),
+    ]
+
+    for name, records, categorical_columns, boolean_columns in datasets:
+        per_row_df, per_row_time = run_timed(build_dataframe_per_row, records)
+        records_df, records_time = run_timed(
+            load_data.build_dataframe,
+            records,
+            categorical_columns,
+            boolean_columns,
+        )
+        click.echo(f"{len(records)} {name}")
+        click.echo(
+            f"  per row:      {per_row_time:8.3f}s "
+            f"{get_memory_usage(per_row_df) / 2 ** 20:8.1f} MB"
+        )
+        click.echo(
+            f"  from records: {records_time:8.3f}s "
+            f"{get_memory_usage(records_df) / 2 ** 20:8.1f} MB"
+        )
+
+    if cache:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for name in ("cold cache", "warm cache"):
+                info, elapsed = run_timed(
+                    load_data.LicenseRulesInfo,
+                    models.rules_data_dir,
+                    models.licenses_data_dir,
+                    cache_dir,
+                    processes,
+                    not without_text,
+                )
+                memory_usage = (
+                    get_memory_usage(info.rule_df) + get_memory_usage(info.lic_df)
+                )
+                click.echo(
+                    f"LicenseRulesInfo, {name}: {elapsed:8.3f}s "
+                    f"{memory_usage / 2 ** 20:8.1f} MB"
+                )
+
+
+if __name__ == "__main__":
+    benchmark()
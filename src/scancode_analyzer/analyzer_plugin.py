@@ -7,20 +7,28 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+import cProfile
+import collections
+import functools
+import itertools
+import sys
 import traceback
 
 import attr
-from license_expression import Licensing
+import click
 
 from commoncode.cliutils import PluggableCommandLineOption
 from commoncode.cliutils import POST_SCAN_GROUP
 from plugincode.post_scan import PostScanPlugin
 from plugincode.post_scan import post_scan_impl
-from scancode.api import _licenses_data_from_match
-from scancode.api import SCANCODE_LICENSEDB_URL
 
-from scancode_analyzer import license_analyzer
-from scancode_analyzer import summary
+# ScanCode imports this module with all its post-scan plugins for every scan, so
+# the modules that are slow to import, such as license_analyzer, summary,
+# license_expression, scancode.api and cache with sqlite3, are only imported in
+# the functions that run the analysis, and are never imported by scans without
+# an analysis.
+from scancode_analyzer.source_text import SourceText
+from scancode_analyzer.timings import AnalysisTimings
 
 
 MISSING_OPTIONS_MESSAGE = (
@@ -28,6 +36,25 @@ MISSING_OPTIONS_MESSAGE = (
     "--license --license-text --is-license-text --classify --info"
 )
 
+# Number of resources sent at once to a worker process when analyzing with
+# multiple processes
+ANALYSIS_CHUNKSIZE = 100
+
+# Maximum number of chunks of resources sent to the worker processes and not
+# yet analyzed, for each worker process
+PENDING_CHUNKS_PER_PROCESS = 2
+
+# Default maximum number of entries of the license detection issues cache, the
+# same as cache.DEFAULT_CACHE_MAX_ENTRIES
+ANALYSIS_CACHE_MAX_ENTRIES = 1000000
+
+# Maximum number of distinct license expressions with a cached count of keys
+LICENSE_KEYS_COUNT_CACHE_SIZE = 10000
+
+# Codebase counter of the files found to have only correct license detections
+# from their serialized license matches, without a full analysis
+CORRECT_DETECTION_FILES_COUNTER = "license_detection_issues:correct_detection_files"
+
 
 @post_scan_impl
 class ResultsAnalyzer(PostScanPlugin):
@@ -55,89 +82,772 @@ class ResultsAnalyzer(PostScanPlugin):
             + MISSING_OPTIONS_MESSAGE,
             help_group=POST_SCAN_GROUP,
         ),
+        PluggableCommandLineOption(
+            ("--analyze-license-results-cache",),
+            type=click.Path(dir_okay=False, writable=True),
+            metavar="FILE",
+            required_options=["analyze_license_results"],
+            help="Reuse the license detection issues cached in FILE for the files "
+            "with the same license detections, and cache the issues of the other "
+            "files in FILE.",
+            help_group=POST_SCAN_GROUP,
+        ),
+        PluggableCommandLineOption(
+            ("--analyze-license-results-cache-size",),
+            type=int,
+            default=ANALYSIS_CACHE_MAX_ENTRIES,
+            metavar="INT",
+            show_default=True,
+            required_options=["analyze_license_results_cache"],
+            help="Keep at most INT entries in the license detection issues cache, "
+            "evicting the least recently used entries.",
+            help_group=POST_SCAN_GROUP,
+        ),
+        PluggableCommandLineOption(
+            ("--analyze-license-results-summary-only",),
+            is_flag=True,
+            default=False,
+            required_options=["analyze_license_results"],
+            help="Only report the codebase level summary of license detection "
+            "issues, and not the license detection issues of each file.",
+            help_group=POST_SCAN_GROUP,
+        ),
+        PluggableCommandLineOption(
+            ("--analyze-license-results-source-text",),
+            is_flag=True,
+            default=False,
+            required_options=["analyze_license_results"],
+            conflicting_options=["analyze_license_results_cache"],
+            help="Suggest the matched text of license detection issues with many "
+            "license matches from the lines of the scanned files, instead of "
+            "consolidating the matched texts. This is only done for the scanned "
+            "files that are available.",
+            help_group=POST_SCAN_GROUP,
+        ),
+        PluggableCommandLineOption(
+            ("--analyze-license-results-profile",),
+            type=click.Path(dir_okay=False, writable=True),
+            metavar="FILE",
+            required_options=["analyze_license_results"],
+            help="Profile the license detection analysis and dump the profile "
+            "statistics to FILE, to load with the Python `pstats` module. Only "
+            "the main process is profiled.",
+            help_group=POST_SCAN_GROUP,
+        ),
     ]
 
     def is_enabled(self, analyze_license_results, **kwargs):
         return analyze_license_results
 
-    def process_codebase(self, codebase, **kwargs):
-        msg = (
-            "Cannot analyze scan for license detection errors, because "
-            "required attributes are missing. " + MISSING_OPTIONS_MESSAGE,
+    def setup(self, analyze_license_results_summary_only=False, **kwargs):
+        # The files have no license detection issues attribute when only the
+        # summary is reported, instead of an empty list for every file.
+        if analyze_license_results_summary_only:
+            self.resource_attributes = {}
+
+    def process_codebase(
+        self,
+        codebase,
+        processes=1,
+        analyze_license_results_cache=None,
+        analyze_license_results_cache_size=ANALYSIS_CACHE_MAX_ENTRIES,
+        analyze_license_results_summary_only=False,
+        analyze_license_results_source_text=False,
+        analyze_license_results_timings=False,
+        analyze_license_results_profile=None,
+        **kwargs,
+    ):
+        analyze = functools.partial(
+            self.analyze_codebase,
+            codebase=codebase,
+            processes=processes,
+            cache_location=analyze_license_results_cache,
+            cache_size=analyze_license_results_cache_size,
+            summary_only=analyze_license_results_summary_only,
+            with_source_text=analyze_license_results_source_text,
+            with_timings=analyze_license_results_timings,
         )
 
-        license_issues = []
+        if not analyze_license_results_profile:
+            return analyze()
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(analyze)
+        finally:
+            profiler.dump_stats(analyze_license_results_profile)
+
+    def analyze_codebase(
+        self,
+        codebase,
+        processes=1,
+        cache_location=None,
+        cache_size=ANALYSIS_CACHE_MAX_ENTRIES,
+        summary_only=False,
+        with_source_text=False,
+        with_timings=False,
+    ):
+        """
+        Analyze the license detections of a `codebase` for license detection
+        issues, with the `process_codebase` options.
+        """
+        from scancode.pool import get_pool
+        from scancode_analyzer import cache
+        from scancode_analyzer import license_analyzer
+        from scancode_analyzer import summary
+
+        timings = None
+        if with_timings:
+            timings = AnalysisTimings()
+
+        summary_accumulator = summary.LicenseIssuesAccumulator()
         count_has_license = 0
         count_files_with_issues = 0
+        count_correct_detection_files = 0
 
-        for resource in codebase.walk():
-            if not resource.is_file:
-                continue
+        resources = get_analyzable_resources(codebase)
+        resource = None
 
-            # Case where a license scan was not performed
-            if not hasattr(resource, "licenses"):
-                codebase.errors.append(msg)
-                break
+        analysis_cache = None
+        if cache_location:
+            analysis_cache = cache.AnalysisCache(
+                location=cache_location,
+                max_entries=cache_size,
+            )
 
-            # Where the resource does not have any detected license
-            license_matches_serialized = getattr(resource, "licenses", [])
-            if not license_matches_serialized:
-                continue
+        pool = None
+        try:
+            # Only fan out the analysis when there is more than one process, as
+            # a single worker would only add pickling overhead.
+            if processes and processes > 1:
+                if analysis_cache:
+                    pool = get_pool(
+                        processes=processes,
+                        initializer=init_worker_analysis_cache,
+                        initargs=(analysis_cache.location,),
+                    )
+                else:
+                    pool = get_pool(processes=processes)
+                # The matched texts are only needed for the few file-regions
+                # with issues, so these are not sent to the worker processes and
+                # are attached in this process. The cache keys are hashes of the
+                # complete license matches, so these are all sent with a cache.
+                with_matched_text = analysis_cache is not None
+                resources_analyses = analyze_resources_in_pool(
+                    pool=pool,
+                    resources=resources,
+                    get_data=functools.partial(
+                        get_resource_data,
+                        with_location=with_source_text,
+                        with_matched_text=with_matched_text,
+                    ),
+                    analyze=functools.partial(
+                        analyze_resource_licenses_in_worker,
+                        with_timings=with_timings,
+                    ),
+                    max_pending_chunks=processes * PENDING_CHUNKS_PER_PROCESS,
+                )
+            else:
+                analyze = functools.partial(
+                    analyze_resource_licenses,
+                    analysis_cache=analysis_cache,
+                    with_timings=with_timings,
+                )
+                get_data = functools.partial(
+                    get_resource_data,
+                    with_location=with_source_text,
+                )
+                resources_analyses = (
+                    (resource, analyze(get_data(resource)))
+                    for resource in resources
+                )
 
-            # Case where any attribute essential for analysis is missing
-            if not is_analyzable(resource):
-                codebase.errors.append(msg)
-                break
+            for resource, analysis in resources_analyses:
+                count_has_license += 1
+                if timings is not None:
+                    start = timings.start()
+                    if analysis.timings:
+                        timings.merge(analysis.timings)
 
-            count_has_license += 1
+                if analysis.error:
+                    resource.scan_errors.append(analysis.error)
+                    codebase.save_resource(resource)
+                    continue
 
-            try:
-                license_matches = LicenseMatch.from_files_licenses(
-                    license_matches_serialized
-                )
-            except KeyError as e:
-                trace = traceback.format_exc()
-                msg = f"Cannot convert scancode data to LicenseMatch class: {e}\n{trace}"
-                codebase.errors.append(msg)
-                raise ScancodeDataChangedError(msg)
-
-            try:
-                ars = list(license_analyzer.LicenseDetectionIssue.from_license_matches(
-                    license_matches=license_matches,
-                    is_license_text=getattr(
-                        resource, "is_license_text", False),
-                    is_legal=getattr(resource, "is_legal", False),
-                    path=getattr(resource, "path"),
-                ))
-                if ars:
-                    count_files_with_issues += 1
-                license_issues.extend(ars)
-                resource.license_detection_issues = [
-                    ar.to_dict(is_summary=False)
-                    for ar in ars
-                ]
+                if analysis.is_correct_detection:
+                    count_correct_detection_files += 1
 
-            except Exception as e:
-                trace = traceback.format_exc()
-                msg = f"Cannot analyze scan for license scan errors: {e}\n{trace}"
-                resource.scan_errors.append(msg)
-            codebase.save_resource(resource)
+                ars = analysis.license_issues
+                try:
+                    attach_matched_texts(
+                        analysis, getattr(resource, "licenses", []),
+                    )
+                    if analysis_cache:
+                        update_analysis_cache(analysis_cache, analysis)
+                    restore_shared_issue_types(ars, analysis.issue_type_keys)
+                    if ars:
+                        count_files_with_issues += 1
+                    summary_accumulator.add_issues(ars)
+                    if timings is not None:
+                        start = timings.add_time("summary:add_issues", start)
+                        for ar in ars:
+                            timings.count(f"issues:{ar.issue_category}")
+                    if summary_only:
+                        continue
+
+                    license_detection_issues = [
+                        ar.to_dict(is_summary=False)
+                        for ar in ars
+                    ]
+                    # Only save the resources with changed issues, as saving
+                    # can be costly, and most files do not have any issue.
+                    previous_license_detection_issues = getattr(
+                        resource, "license_detection_issues", None,
+                    )
+                    if license_detection_issues != previous_license_detection_issues:
+                        resource.license_detection_issues = license_detection_issues
+                        if timings is not None:
+                            start = timings.start()
+                        codebase.save_resource(resource)
+                        if timings is not None:
+                            timings.add_time("save_resources", start)
+
+                except Exception as e:
+                    trace = traceback.format_exc()
+                    msg = f"Cannot analyze scan for license scan errors: {e}\n{trace}"
+                    resource.scan_errors.append(msg)
+                    codebase.save_resource(resource)
+
+        except ScancodeDataChangedError as e:
+            codebase.errors.append(str(e))
+            raise
+
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+            if analysis_cache:
+                analysis_cache.close()
+            codebase.counters[CORRECT_DETECTION_FILES_COUNTER] = (
+                count_correct_detection_files
+            )
 
         try:
-            summary_license = summary.SummaryLicenseIssues.summarize(
-                license_issues,
-                count_has_license,
-                count_files_with_issues,
+            summary_license = summary_accumulator.summarize(
+                count_has_license=count_has_license,
+                count_files_with_issues=count_files_with_issues,
+                timings=timings,
             )
             codebase.attributes.license_detection_issues_summary.update(
                 summary_license.to_dict(),
             )
+            if analysis_cache:
+                codebase.attributes.license_detection_issues_summary.update(
+                    analysis_cache=analysis_cache.get_statistics(),
+                )
+            if timings is not None:
+                timings.count("files", count_has_license)
+                timings.count("files_with_issues", count_files_with_issues)
+                timings.count(
+                    "correct_detection_files", count_correct_detection_files,
+                )
+                codebase.attributes.license_detection_issues_timings.update(
+                    timings.to_dict(),
+                )
 
         except Exception as e:
             trace = traceback.format_exc()
             msg = f"Cannot summarize license detection issues: {e}\n{trace}"
-            resource.scan_errors.append(msg)
-        codebase.save_resource(resource)
+            if resource:
+                resource.scan_errors.append(msg)
+                codebase.save_resource(resource)
+
+        finally:
+            license_analyzer.TOKENIZED_MATCHED_TEXTS.clear()
+
+
+@post_scan_impl
+class ResultsAnalyzerTimings(PostScanPlugin):
+    """
+    Report the timings and counters of the stages of the license detection
+    analysis. These are collected by the ResultsAnalyzer plugin, and this plugin
+    only adds the codebase attribute where they are reported, so that this
+    attribute is only reported when requested.
+    """
+
+    codebase_attributes = {
+        "license_detection_issues_timings": attr.ib(default=attr.Factory(dict))
+    }
+
+    sort_order = 80
+
+    options = [
+        PluggableCommandLineOption(
+            ("--analyze-license-results-timings",),
+            is_flag=True,
+            default=False,
+            required_options=["analyze_license_results"],
+            help="Report the cumulative timings and counters of the stages of "
+            "the license detection analysis. The timings of the stages that run "
+            "in worker processes are summed over all the processes.",
+            help_group=POST_SCAN_GROUP,
+        ),
+    ]
+
+    def is_enabled(self, analyze_license_results_timings, **kwargs):
+        return analyze_license_results_timings
+
+    def process_codebase(self, codebase, **kwargs):
+        # The timings are collected and reported by ResultsAnalyzer
+        pass
+
+
+def get_analyzable_resources(codebase):
+    """
+    Yield each file Resource of `codebase` that has detected licenses.
+    Stop and add an error to the codebase on the first Resource which is missing
+    any attribute essential for the analysis.
+    """
+    msg = (
+        "Cannot analyze scan for license detection errors, because "
+        "required attributes are missing. " + MISSING_OPTIONS_MESSAGE,
+    )
+
+    for resource in codebase.walk():
+        if not resource.is_file:
+            continue
+
+        # Case where a license scan was not performed
+        if not hasattr(resource, "licenses"):
+            codebase.errors.append(msg)
+            return
+
+        # Where the resource does not have any detected license
+        license_matches_serialized = getattr(resource, "licenses", [])
+        if not license_matches_serialized:
+            continue
+
+        # Case where any attribute essential for analysis is missing
+        if not is_analyzable(resource):
+            codebase.errors.append(msg)
+            return
+
+        yield resource
+
+
+def get_resource_data(resource, with_location=False, with_matched_text=True):
+    """
+    Return a tuple of (rid, path, serialized license matches, is_license_text,
+    is_legal, location) with the data of a `resource` Resource that is needed to
+    analyze it. The location of the scanned file is only included if
+    `with_location` is True, and is None for a virtual codebase.
+    The matched texts of the license matches are only included if
+    `with_matched_text` is True.
+    """
+    location = None
+    if with_location:
+        location = getattr(resource, "location", None)
+
+    license_matches_serialized = getattr(resource, "licenses", [])
+    if not with_matched_text:
+        license_matches_serialized = get_text_free_license_matches(
+            license_matches_serialized
+        )
+
+    return (
+        resource.rid,
+        resource.path,
+        license_matches_serialized,
+        getattr(resource, "is_license_text", False),
+        getattr(resource, "is_legal", False),
+        location,
+    )
+
+
+def get_text_free_license_matches(license_matches_serialized):
+    """
+    Return a copy of the `license_matches_serialized` list of serialized license
+    matches without their matched texts, to send less data to worker processes.
+    """
+    return [
+        {
+            key: value
+            for key, value in license_match.items()
+            if key != "matched_text"
+        }
+        for license_match in license_matches_serialized
+    ]
+
+
+def get_text_free_resource_data(resource_data):
+    """
+    Return a copy of a `resource_data` tuple as returned by `get_resource_data`
+    without the matched texts of its license matches.
+    """
+    rid, path, license_matches_serialized, *flags = resource_data
+    return (
+        rid,
+        path,
+        get_text_free_license_matches(license_matches_serialized),
+        *flags,
+    )
+
+
+@attr.s
+class ResourceAnalysis:
+    """
+    The results of the license detection issues analysis of a Resource.
+    """
+    rid = attr.ib()
+    # list of LicenseDetectionIssue or CachedLicenseDetectionIssue
+    license_issues = attr.ib(factory=list)
+    # ISSUE_TYPES_BY_CLASSIFICATION keys of the license_issues issue types
+    issue_type_keys = attr.ib(factory=list)
+    # error message if the analysis failed
+    error = attr.ib(default=None)
+    # key of the analysis in an AnalysisCache, if any
+    cache_key = attr.ib(default=None)
+    # True if the license_issues are loaded from an AnalysisCache
+    is_cached = attr.ib(default=False)
+    # True if all the license detections are correct, as found from the
+    # serialized license matches without a full analysis
+    is_correct_detection = attr.ib(default=False)
+    # AnalysisTimings of the analysis, if collected
+    timings = attr.ib(default=None)
+    # for each of the license_issues, the indexes of its original license matches
+    # in the serialized license matches, if analyzed without the matched texts
+    matched_text_indexes = attr.ib(default=None)
+
+
+def analyze_resource_licenses(resource_data, analysis_cache=None, with_timings=False):
+    """
+    Return a ResourceAnalysis for a `resource_data` tuple as returned by
+    `get_resource_data`. Reuse the issues cached in an `analysis_cache`
+    AnalysisCache if any, without building LicenseMatch or LicenseDetectionIssue.
+
+    This runs either in the main process or in a worker process from a pool, so
+    the issue type keys are returned to restore the issue types shared in the
+    main process.
+    If the `resource_data` has the location of the scanned file, suggest matched
+    texts from the lines of this file.
+    If the serialized license matches have no matched texts, the issues have no
+    matched texts and these are attached with `attach_matched_texts`.
+    Files with only correct license detections are found from their serialized
+    license matches, without building LicenseMatch or file-regions.
+    Collect the timings and counters of the analysis stages if `with_timings`.
+    Raise a ScancodeDataChangedError if the scan data cannot be converted.
+    """
+    from scancode_analyzer import cache
+    from scancode_analyzer import license_analyzer
+
+    (
+        rid,
+        path,
+        license_matches_serialized,
+        is_license_text,
+        is_legal,
+        location,
+    ) = resource_data
+
+    timings = None
+    if with_timings:
+        timings = AnalysisTimings()
+        timings.count("license_matches", len(license_matches_serialized))
+        timings.count("matched_text_bytes", sum(
+            len(license_match.get("matched_text", "").encode("utf-8"))
+            for license_match in license_matches_serialized
+        ))
+        start = timings.start()
+
+    try:
+        is_correct_detection = is_correct_detection_serialized(
+            license_matches_serialized
+        )
+        if timings is not None:
+            start = timings.add_time("check_correct_detection", start)
+        if is_correct_detection:
+            return ResourceAnalysis(
+                rid=rid, is_correct_detection=True, timings=timings,
+            )
+    except KeyError as e:
+        trace = traceback.format_exc()
+        msg = f"Cannot convert scancode data to LicenseMatch class: {e}\n{trace}"
+        raise ScancodeDataChangedError(msg)
+
+    cache_key = None
+    if analysis_cache:
+        cache_key = cache.get_cache_key(
+            license_matches_serialized, is_license_text, is_legal,
+        )
+        cached = analysis_cache.get_issues(cache_key, path)
+        if timings is not None:
+            start = timings.add_time("analysis_cache", start)
+        if cached:
+            ars, issue_type_keys = cached
+            return ResourceAnalysis(
+                rid=rid,
+                license_issues=ars,
+                issue_type_keys=issue_type_keys,
+                cache_key=cache_key,
+                is_cached=True,
+                timings=timings,
+            )
+
+    has_matched_text = all(
+        "matched_text" in license_match
+        for license_match in license_matches_serialized
+    )
+
+    try:
+        license_matches = LicenseMatch.from_files_licenses(
+            license_matches_serialized
+        )
+        if timings is not None:
+            timings.add_time("convert_license_matches", start)
+    except KeyError as e:
+        trace = traceback.format_exc()
+        msg = f"Cannot convert scancode data to LicenseMatch class: {e}\n{trace}"
+        raise ScancodeDataChangedError(msg)
+
+    source_text = None
+    if location:
+        source_text = SourceText(location)
+
+    try:
+        ars = list(license_analyzer.LicenseDetectionIssue.from_license_matches(
+            license_matches=license_matches,
+            is_license_text=is_license_text,
+            is_legal=is_legal,
+            path=path,
+            source_text=source_text,
+            timings=timings,
+        ))
+        issue_type_keys = [
+            license_analyzer.get_issue_type_key(ar.issue_type)
+            for ar in ars
+        ]
+        matched_text_indexes = None
+        if not has_matched_text:
+            # The issues reference the LicenseMatch they are built from
+            index_by_match_id = dict(zip(
+                map(id, license_matches),
+                get_primary_license_match_indexes(license_matches_serialized),
+            ))
+            matched_text_indexes = [
+                [
+                    index_by_match_id[id(license_match)]
+                    for license_match in ar.original_licenses
+                ]
+                for ar in ars
+            ]
+    except Exception as e:
+        trace = traceback.format_exc()
+        msg = f"Cannot analyze scan for license scan errors: {e}\n{trace}"
+        return ResourceAnalysis(rid=rid, error=msg, timings=timings)
+    finally:
+        if source_text:
+            source_text.close()
+
+    return ResourceAnalysis(
+        rid=rid,
+        license_issues=ars,
+        issue_type_keys=issue_type_keys,
+        cache_key=cache_key,
+        timings=timings,
+        matched_text_indexes=matched_text_indexes,
+    )
+
+
+def attach_matched_texts(analysis, license_matches_serialized):
+    """
+    Attach the matched texts of the `license_matches_serialized` list of
+    serialized license matches of a file to the issues of an `analysis`
+    ResourceAnalysis done without these matched texts, and complete the matched
+    texts suggested for these issues. This is a no-op for an analysis done with
+    the matched texts.
+    """
+    from scancode_analyzer import license_analyzer
+
+    if analysis.matched_text_indexes is None:
+        return
+
+    for license_issue, issue_type_key, indexes in zip(
+        analysis.license_issues,
+        analysis.issue_type_keys,
+        analysis.matched_text_indexes,
+    ):
+        license_issue.original_licenses = [
+            attr.evolve(
+                license_match,
+                matched_text=license_matches_serialized[index]["matched_text"],
+            )
+            for license_match, index in zip(license_issue.original_licenses, indexes)
+        ]
+        suggested_license = license_issue.suggested_license
+        if suggested_license.matched_text is None:
+            _license_expression, suggested_license.matched_text = (
+                license_analyzer.get_license_match_suggestion(
+                    license_issue.original_licenses,
+                    license_issue.issue_category,
+                    issue_type_key,
+                )
+            )
+
+    analysis.matched_text_indexes = None
+
+
+def is_correct_detection_serialized(license_matches_serialized):
+    """
+    Return True if every file-region of the `license_matches_serialized` list of
+    serialized license matches of a file is a correct license detection, without
+    building LicenseMatch or grouping them in file-regions.
+
+    This is the case if all the license matches are either exact license hash or
+    SPDX license identifier matches, or perfect matches with a full coverage, no
+    extra words, no unknown license and no short rule, as these cannot be any of
+    the other issue categories, whatever their file-regions.
+    """
+    from scancode_analyzer import license_analyzer
+
+    all_exact_matches = True
+    all_perfect_matches = True
+
+    for license_match in license_matches_serialized:
+        matched_rule = license_match["matched_rule"]
+
+        if all_exact_matches:
+            all_exact_matches = (
+                matched_rule["matcher"] in license_analyzer.EXACT_MATCHERS
+            )
+
+        if all_perfect_matches:
+            match_coverage = matched_rule["match_coverage"]
+            # Same as `license_analyzer.calculate_query_coverage_coefficient`
+            query_coverage_coefficient = (
+                match_coverage * matched_rule["rule_relevance"]
+            ) / 100 - license_match["score"]
+            all_perfect_matches = (
+                match_coverage >= license_analyzer.NEAR_PERFECT_MATCH_COVERAGE_THR
+                and query_coverage_coefficient <= 0
+                and "unknown" not in matched_rule["identifier"]
+                and "unknown" not in matched_rule["license_expression"]
+                and matched_rule["rule_length"]
+                > license_analyzer.FALSE_POSITIVE_RULE_LENGTH_THRESHOLD
+            )
+
+        if not (all_exact_matches or all_perfect_matches):
+            return False
+
+    return True
+
+
+# Read-only AnalysisCache of a worker process, if any
+WORKER_ANALYSIS_CACHE = None
+
+
+def init_worker_analysis_cache(location):
+    """
+    Open the AnalysisCache at `location` for reading in a worker process.
+    """
+    from scancode_analyzer import cache
+
+    global WORKER_ANALYSIS_CACHE
+    WORKER_ANALYSIS_CACHE = cache.AnalysisCache(location=location, read_only=True)
+
+
+def analyze_resource_licenses_in_worker(resource_data, with_timings=False):
+    """
+    Return a ResourceAnalysis for a `resource_data` tuple in a worker process,
+    using the worker AnalysisCache if any.
+    """
+    return analyze_resource_licenses(
+        resource_data,
+        analysis_cache=WORKER_ANALYSIS_CACHE,
+        with_timings=with_timings,
+    )
+
+
+def analyze_resources_in_pool(
+    pool,
+    resources,
+    analyze,
+    get_data=None,
+    chunksize=ANALYSIS_CHUNKSIZE,
+    max_pending_chunks=PENDING_CHUNKS_PER_PROCESS,
+):
+    """
+    Yield a tuple of (resource, ResourceAnalysis) for each of the `resources` in
+    order, with the ResourceAnalysis returned by
+    calling `analyze` on the data returned by `get_data` for a resource, or on
+    the resource itself if `get_data` is None, in the worker processes of a
+    `pool`.
+
+    The resources are walked and their data is read in the calling thread, as
+    the codebase is not thread-safe and is updated in this thread while the
+    analyses are yielded. The data is read by chunks of `chunksize` resources,
+    and at most `max_pending_chunks` chunks are read ahead of the yielded
+    analyses, so that the data of all the resources is never in memory at once.
+    """
+    resources = iter(resources)
+    pending_chunks = collections.deque()
+    has_more_resources = True
+    while True:
+        while has_more_resources and len(pending_chunks) < max_pending_chunks:
+            resources_chunk = list(itertools.islice(resources, chunksize))
+            resources_data = resources_chunk
+            if get_data:
+                resources_data = [get_data(resource) for resource in resources_chunk]
+            if not resources_data:
+                has_more_resources = False
+                break
+            # Each chunk is sent at once to a worker process, which makes the
+            # serialization overhead reasonable for many small resources.
+            pending_chunks.append((
+                resources_chunk,
+                pool.map_async(analyze, resources_data, chunksize=len(resources_data)),
+            ))
+
+        if not pending_chunks:
+            return
+
+        resources_chunk, analyses = pending_chunks.popleft()
+        yield from zip(resources_chunk, analyses.get())
+
+
+def update_analysis_cache(analysis_cache, analysis):
+    """
+    Record a cache hit or cache the issues of a miss in the `analysis_cache`
+    AnalysisCache for an `analysis` ResourceAnalysis. This runs only in the main
+    process, which is the only writer of the cache. Files with only correct
+    license detections found without a full analysis are not cached.
+    """
+    if analysis.is_correct_detection:
+        return
+
+    if analysis.is_cached:
+        analysis_cache.add_hit(analysis.cache_key)
+    else:
+        analysis_cache.put(
+            analysis.cache_key,
+            analysis.license_issues,
+            analysis.issue_type_keys,
+        )
+
+
+def restore_shared_issue_types(license_issues, issue_type_keys):
+    """
+    Point each of the `license_issues` LicenseDetectionIssue to the IssueType
+    shared in this process for its `issue_type_keys` key, and modify its analysis
+    confidence again, exactly as if the issue was analyzed in this process.
+    This is a no-op for issues which were analyzed in this process.
+    """
+    from scancode_analyzer import license_analyzer
+
+    for license_issue, issue_type_key in zip(license_issues, issue_type_keys):
+        license_issue.issue_type = (
+            license_analyzer.ISSUE_TYPES_BY_CLASSIFICATION[issue_type_key]
+        )
+        license_analyzer.modify_analysis_confidence(license_issue)
 
 
 class ScancodeDataChangedError(Exception):
@@ -147,27 +857,240 @@ class ScancodeDataChangedError(Exception):
     pass
 
 
+def intern_string(value):
+    """
+    Return an interned `value` string, or `value` as-is if not a string.
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+@attr.s(slots=True, frozen=True)
+class Rule:
+    """
+    The attributes of the license detection rule of a license match, which are
+    the same for all the license matches to this rule.
+    """
+    license_expression = attr.ib(converter=intern_string)
+    rule_identifier = attr.ib(converter=intern_string)
+    is_license_text = attr.ib()
+    is_license_notice = attr.ib()
+    is_license_reference = attr.ib()
+    is_license_tag = attr.ib()
+    is_license_intro = attr.ib()
+    rule_length = attr.ib()
+    rule_relevance = attr.ib()
+
+
 @attr.s
+class RuleIndex:
+    """
+    An index of the Rule of all the license matches seen in a process, where
+    each Rule has a small integer rule id, which is an index in the `rules` and
+    `features` lists.
+
+    Rules are keyed by identifier and all their attributes, so that rules with
+    the same identifier from scans with different ScanCode versions are never
+    mixed.
+    """
+    rules = attr.ib(factory=list)
+    # feature bit flags of each rule, see `license_analyzer.ALL_FEATURES`, or
+    # None until these are needed
+    features = attr.ib(factory=list)
+    # {tuple of Rule attribute values: rule id}
+    rule_ids_by_key = attr.ib(factory=dict)
+
+    def get_rule_id_from_key(self, key):
+        """
+        Return the rule id of the Rule with the `key` tuple of attribute values,
+        adding this Rule to this index if needed.
+        """
+        rule_id = self.rule_ids_by_key.get(key)
+        if rule_id is None:
+            rule = Rule(*key)
+            rule_id = len(self.rules)
+            self.rules.append(rule)
+            self.features.append(None)
+            self.rule_ids_by_key[key] = rule_id
+        return rule_id
+
+    def get_features(self, rule_id):
+        """
+        Return the feature bit flags of the Rule with `rule_id`.
+        """
+        features = self.features[rule_id]
+        if features is None:
+            from scancode_analyzer import license_analyzer
+            features = license_analyzer.get_license_match_features(
+                self.rules[rule_id]
+            )
+            self.features[rule_id] = features
+        return features
+
+    def get_rule_id(self, rule):
+        """
+        Return the rule id of a `rule` Rule, adding it to this index if needed.
+        """
+        return self.get_rule_id_from_key(attr.astuple(rule, recurse=False))
+
+    def get_rule_id_from_matched_rule(self, matched_rule):
+        """
+        Return the rule id of a `matched_rule` mapping of a serialized license
+        match, without building a Rule for the rules already in this index.
+        """
+        return self.get_rule_id_from_key((
+            matched_rule["license_expression"],
+            matched_rule["identifier"],
+            matched_rule["is_license_text"],
+            matched_rule["is_license_notice"],
+            matched_rule["is_license_reference"],
+            matched_rule["is_license_tag"],
+            matched_rule["is_license_intro"],
+            matched_rule["rule_length"],
+            matched_rule["rule_relevance"],
+        ))
+
+
+# Shared by all the license matches of a process
+RULE_INDEX = RuleIndex()
+
+
+def get_rule_attribute(name):
+    """
+    Return a read-only property for the `name` attribute of the Rule of a
+    LicenseMatch.
+    """
+    def get_attribute(license_match):
+        return getattr(RULE_INDEX.rules[license_match.rule_id], name)
+
+    return property(get_attribute, doc=f"The {name} of the rule of this match.")
+
+
+@attr.s(slots=True, frozen=True)
 class LicenseMatch:
     """
     Represent a license match to a rule.
+
+    There are many license matches in a large scan, so these have no instance
+    dict, and only store the id of their Rule in the RULE_INDEX with the
+    attributes of this match. The Rule attributes are available as properties.
     """
-    license_expression = attr.ib()
+    rule_id = attr.ib()
     score = attr.ib()
     start_line = attr.ib()
     end_line = attr.ib()
-    rule_identifier = attr.ib()
-    is_license_text = attr.ib()
-    is_license_notice = attr.ib()
-    is_license_reference = attr.ib()
-    is_license_tag = attr.ib()
-    is_license_intro = attr.ib()
-    matcher = attr.ib()
+    matcher = attr.ib(converter=intern_string)
     matched_length = attr.ib()
-    rule_length = attr.ib()
     match_coverage = attr.ib()
-    rule_relevance = attr.ib()
-    matched_text = attr.ib()
+    matched_text = attr.ib(default=None)
+
+    license_expression = get_rule_attribute("license_expression")
+    rule_identifier = get_rule_attribute("rule_identifier")
+    is_license_text = get_rule_attribute("is_license_text")
+    is_license_notice = get_rule_attribute("is_license_notice")
+    is_license_reference = get_rule_attribute("is_license_reference")
+    is_license_tag = get_rule_attribute("is_license_tag")
+    is_license_intro = get_rule_attribute("is_license_intro")
+    rule_length = get_rule_attribute("rule_length")
+    rule_relevance = get_rule_attribute("rule_relevance")
+
+    @property
+    def rule(self):
+        return RULE_INDEX.rules[self.rule_id]
+
+    @property
+    def rule_features(self):
+        """
+        The feature bit flags of the rule of this match.
+        """
+        return RULE_INDEX.get_features(self.rule_id)
+
+    @classmethod
+    def from_rule(
+        cls,
+        rule,
+        score,
+        start_line,
+        end_line,
+        matcher,
+        matched_length,
+        match_coverage,
+        matched_text=None,
+    ):
+        """
+        Return a LicenseMatch to a `rule` Rule with the other attributes of
+        a match.
+        """
+        return cls(
+            rule_id=RULE_INDEX.get_rule_id(rule),
+            score=score,
+            start_line=start_line,
+            end_line=end_line,
+            matcher=matcher,
+            matched_length=matched_length,
+            match_coverage=match_coverage,
+            matched_text=matched_text,
+        )
+
+    @classmethod
+    def from_attributes(
+        cls,
+        license_expression,
+        score,
+        start_line,
+        end_line,
+        rule_identifier,
+        is_license_text,
+        is_license_notice,
+        is_license_reference,
+        is_license_tag,
+        is_license_intro,
+        matcher,
+        matched_length,
+        rule_length,
+        match_coverage,
+        rule_relevance,
+        matched_text=None,
+    ):
+        """
+        Return a LicenseMatch from all the attributes of a match and of its rule.
+        """
+        rule = Rule(
+            license_expression=license_expression,
+            rule_identifier=rule_identifier,
+            is_license_text=is_license_text,
+            is_license_notice=is_license_notice,
+            is_license_reference=is_license_reference,
+            is_license_tag=is_license_tag,
+            is_license_intro=is_license_intro,
+            rule_length=rule_length,
+            rule_relevance=rule_relevance,
+        )
+        return cls.from_rule(
+            rule=rule,
+            score=score,
+            start_line=start_line,
+            end_line=end_line,
+            matcher=matcher,
+            matched_length=matched_length,
+            match_coverage=match_coverage,
+            matched_text=matched_text,
+        )
+
+    def __reduce__(self):
+        # Rule ids are only valid in a process, so a LicenseMatch sent to another
+        # process is rebuilt from its Rule.
+        return LicenseMatch.from_rule, (
+            self.rule,
+            self.score,
+            self.start_line,
+            self.end_line,
+            self.matcher,
+            self.matched_length,
+            self.match_coverage,
+            self.matched_text,
+        )
 
     @classmethod
     def from_files_licenses(cls, license_matches):
@@ -175,55 +1098,97 @@ class LicenseMatch:
         Return LicenseMatch built from the scancode files.licenses dictionary.
         """
         matches = []
-        licensing = Licensing()
-        # Whenever we have multiple matches with the same expression, we want to only
-        # keep the first and skip the secondary matches
-        skip_secondary_matches = 0
-
-        for license_match in license_matches:
-            if skip_secondary_matches:
-                skip_secondary_matches -= 1
-                continue
-
+        for index in get_primary_license_match_indexes(license_matches):
+            license_match = license_matches[index]
             matched_rule = license_match["matched_rule"]
-            # key = license_match["key"]
-            license_expression = matched_rule["license_expression"]
-            expression_keys = licensing.license_keys(license_expression)
-
-            if len(expression_keys) != 1:
-                skip_secondary_matches = len(expression_keys) - 1
-
             matches.append(
                 cls(
-                    license_expression=license_expression,
+                    rule_id=RULE_INDEX.get_rule_id_from_matched_rule(matched_rule),
                     score=license_match["score"],
                     start_line=license_match["start_line"],
                     end_line=license_match["end_line"],
-                    rule_identifier=matched_rule["identifier"],
-                    is_license_text=matched_rule["is_license_text"],
-                    is_license_notice=matched_rule["is_license_notice"],
-                    is_license_reference=matched_rule["is_license_reference"],
-                    is_license_tag=matched_rule["is_license_tag"],
-                    is_license_intro=matched_rule["is_license_intro"],
                     matcher=matched_rule["matcher"],
                     matched_length=matched_rule["matched_length"],
-                    rule_length=matched_rule["rule_length"],
                     match_coverage=matched_rule["match_coverage"],
-                    rule_relevance=matched_rule["rule_relevance"],
-                    matched_text=license_match["matched_text"],
+                    # Not sent to worker processes, see `attach_matched_texts`
+                    matched_text=license_match.get("matched_text"),
                 )
             )
 
         return matches
 
     def to_dict(self):
-        return attr.asdict(self)
+        return dict(
+            license_expression=self.license_expression,
+            score=self.score,
+            start_line=self.start_line,
+            end_line=self.end_line,
+            rule_identifier=self.rule_identifier,
+            is_license_text=self.is_license_text,
+            is_license_notice=self.is_license_notice,
+            is_license_reference=self.is_license_reference,
+            is_license_tag=self.is_license_tag,
+            is_license_intro=self.is_license_intro,
+            matcher=self.matcher,
+            matched_length=self.matched_length,
+            rule_length=self.rule_length,
+            match_coverage=self.match_coverage,
+            rule_relevance=self.rule_relevance,
+            matched_text=self.matched_text,
+        )
+
+
+def get_primary_license_match_indexes(license_matches):
+    """
+    Yield the index of each of the `license_matches` scancode files.licenses
+    matches that is converted to a LicenseMatch.
+    """
+    # Whenever we have multiple matches with the same expression, we want to only
+    # keep the first and skip the secondary matches
+    skip_secondary_matches = 0
+
+    for index, license_match in enumerate(license_matches):
+        if skip_secondary_matches:
+            skip_secondary_matches -= 1
+            continue
+
+        # key = license_match["key"]
+        license_expression = license_match["matched_rule"]["license_expression"]
+        license_keys_count = get_license_keys_count(license_expression)
+
+        if license_keys_count != 1:
+            skip_secondary_matches = license_keys_count - 1
+
+        yield index
+
+
+@functools.lru_cache(maxsize=LICENSE_KEYS_COUNT_CACHE_SIZE)
+def get_license_keys_count(license_expression):
+    """
+    Return the number of unique license keys in a `license_expression` string.
+    The same few expressions are used by most license matches, so the counts are
+    cached.
+    """
+    return len(get_licensing().license_keys(license_expression))
+
+
+@functools.lru_cache(maxsize=1)
+def get_licensing():
+    """
+    Return a Licensing shared by all the license matches of a process.
+    """
+    from license_expression import Licensing
+
+    return Licensing()
 
 
 def from_license_match_object(license_matches):
     """
     Return LicenseMatch built from a list of licensedcode.match.LicenseMatch objects.
     """
+    from scancode.api import _licenses_data_from_match
+    from scancode.api import SCANCODE_LICENSEDB_URL
+
     detected_licenses = []
 
     for match in license_matches:
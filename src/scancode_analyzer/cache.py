@@ -0,0 +1,286 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import hashlib
+import json
+import sqlite3
+
+import attr
+
+"""
+An on-disk cache of the license detection issues of files, to avoid analyzing
+again the files whose license detections did not change between scans.
+
+The cache is a SQLite database where each entry is keyed by a hash of the
+serialized license matches and flags of a file and of the analyzer version.
+The main process is the only writer, and worker processes only read entries.
+"""
+
+# Default maximum number of entries kept in a cache
+DEFAULT_CACHE_MAX_ENTRIES = 1000000
+
+# Default number of cache writes committed at once, after evicting the entries
+# above the maximum number of entries
+DEFAULT_CACHE_COMMIT_INTERVAL = 1000
+
+
+def get_cache_key(license_matches_serialized, is_license_text, is_legal):
+    """
+    Return a stable hash string for the analysis of a file with the
+    `license_matches_serialized` scancode files.licenses data and
+    `is_license_text` and `is_legal` flags.
+    """
+    from scancode_analyzer import license_analyzer
+
+    data = [
+        license_analyzer.ISSUE_CASES_VERSION,
+        is_license_text,
+        is_legal,
+        license_matches_serialized,
+    ]
+    serialized = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(serialized.encode("utf-8")).hexdigest()
+
+
+def as_tuple(value):
+    """
+    Return a `value` with all nested lists converted to tuples, to get back
+    hashable issue identifiers from JSON.
+    """
+    if isinstance(value, list):
+        return tuple(as_tuple(item) for item in value)
+    return value
+
+
+@attr.s
+class CachedLicenseDetectionIssue:
+    """
+    A license detection issue loaded from the cache, which is used in place of a
+    LicenseDetectionIssue both in the results of a file and in the summary.
+    """
+    issue_category = attr.ib(type=str)
+    issue_type = attr.ib()
+    license_detection_issue = attr.ib(type=dict)
+    file_regions = attr.ib(factory=list)
+    identifier = attr.ib(default=None)
+    identifier_for_unknown_intro = attr.ib(default=None)
+
+    def to_dict(self, is_summary=True):
+        # The issue type may have been modified since this issue was cached
+        license_detection_issue = dict(
+            self.license_detection_issue,
+            issue_type=attr.asdict(self.issue_type),
+        )
+        if not is_summary:
+            license_detection_issue["file_regions"] = [
+                {
+                    "start_line": file_region.start_line,
+                    "end_line": file_region.end_line,
+                }
+                for file_region in self.file_regions
+            ]
+        return license_detection_issue
+
+    @classmethod
+    def from_cached(cls, cached_issue, path):
+        """
+        Return a CachedLicenseDetectionIssue from a `cached_issue` mapping for a
+        file at `path`.
+        """
+        from scancode_analyzer import license_analyzer
+
+        license_detection_issue = cached_issue["license_detection_issue"]
+        issue_type_key = cached_issue["issue_type_key"]
+        return cls(
+            issue_category=license_detection_issue["issue_category"],
+            issue_type=license_analyzer.ISSUE_TYPES_BY_CLASSIFICATION[issue_type_key],
+            license_detection_issue=license_detection_issue,
+            file_regions=[
+                license_analyzer.FileRegion(
+                    path=path,
+                    start_line=cached_issue["start_line"],
+                    end_line=cached_issue["end_line"],
+                )
+            ],
+            identifier=as_tuple(cached_issue["identifier"]),
+            identifier_for_unknown_intro=as_tuple(
+                cached_issue["identifier_for_unknown_intro"]
+            ),
+        )
+
+
+def to_cached(license_issue, issue_type_key):
+    """
+    Return a mapping to cache for a `license_issue` LicenseDetectionIssue with an
+    `issue_type_key` key of ISSUE_TYPES_BY_CLASSIFICATION.
+    """
+    [file_region] = license_issue.file_regions
+    return {
+        "issue_type_key": issue_type_key,
+        "license_detection_issue": license_issue.to_dict(),
+        "start_line": file_region.start_line,
+        "end_line": file_region.end_line,
+        "identifier": license_issue.identifier,
+        "identifier_for_unknown_intro": license_issue.identifier_for_unknown_intro,
+    }
+
+
+@attr.s
+class AnalysisCache:
+    """
+    A size-bounded on-disk cache of the license detection issues of files,
+    evicting the least recently used entries.
+
+    The writes are committed every `commit_interval` writes, so that they are
+    not lost on a crash and that the worker processes can read the new entries.
+    """
+    location = attr.ib(type=str)
+    max_entries = attr.ib(type=int, default=DEFAULT_CACHE_MAX_ENTRIES)
+    read_only = attr.ib(default=False)
+    commit_interval = attr.ib(type=int, default=DEFAULT_CACHE_COMMIT_INTERVAL)
+
+    hits = attr.ib(type=int, default=0)
+    misses = attr.ib(type=int, default=0)
+    evictions = attr.ib(type=int, default=0)
+
+    connection = attr.ib(default=None, repr=False)
+    # last use counter of the cache, increasing with each use of an entry
+    last_used = attr.ib(type=int, default=0, repr=False)
+    # number of entries, possibly including replaced entries until evicted
+    entries_count = attr.ib(type=int, default=0, repr=False)
+    # number of writes not yet committed
+    pending_writes = attr.ib(type=int, default=0, repr=False)
+
+    def __attrs_post_init__(self):
+        self.connection = sqlite3.connect(self.location, timeout=60)
+        if self.read_only:
+            return
+
+        # Allow reading from worker processes while the main process writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS license_detection_issues ("
+            "key TEXT PRIMARY KEY, issues TEXT NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS license_detection_issues_last_used "
+            "ON license_detection_issues (last_used)"
+        )
+        self.connection.commit()
+        [(last_used, entries_count)] = self.connection.execute(
+            "SELECT COALESCE(MAX(last_used), 0), COUNT(*) "
+            "FROM license_detection_issues"
+        )
+        self.last_used = last_used
+        self.entries_count = entries_count
+
+    def get(self, key):
+        """
+        Return a list of cached issue mappings for `key` or None.
+        """
+        row = self.connection.execute(
+            "SELECT issues FROM license_detection_issues WHERE key = ?", (key,)
+        ).fetchone()
+        if row:
+            return json.loads(row[0])
+
+    def get_issues(self, key, path):
+        """
+        Return a tuple of (list of CachedLicenseDetectionIssue, list of their
+        ISSUE_TYPES_BY_CLASSIFICATION keys) for `key` and a file at `path`, or
+        None if not cached.
+        """
+        cached_issues = self.get(key)
+        if cached_issues is None:
+            return
+
+        license_issues = [
+            CachedLicenseDetectionIssue.from_cached(cached_issue, path)
+            for cached_issue in cached_issues
+        ]
+        issue_type_keys = [
+            cached_issue["issue_type_key"] for cached_issue in cached_issues
+        ]
+        return license_issues, issue_type_keys
+
+    def add_hit(self, key):
+        """
+        Record a cache hit for `key`.
+        """
+        self.hits += 1
+        self.last_used += 1
+        self.connection.execute(
+            "UPDATE license_detection_issues SET last_used = ? WHERE key = ?",
+            (self.last_used, key),
+        )
+        self.add_pending_write()
+
+    def put(self, key, license_issues, issue_type_keys):
+        """
+        Cache the `license_issues` list of LicenseDetectionIssue and their
+        `issue_type_keys` for `key`. This is a cache miss.
+        """
+        self.misses += 1
+        self.last_used += 1
+        cached_issues = [
+            to_cached(license_issue, issue_type_key)
+            for license_issue, issue_type_key in zip(license_issues, issue_type_keys)
+        ]
+        self.connection.execute(
+            "INSERT OR REPLACE INTO license_detection_issues VALUES (?, ?, ?)",
+            (key, json.dumps(cached_issues), self.last_used),
+        )
+        self.entries_count += 1
+        self.add_pending_write()
+
+    def add_pending_write(self):
+        """
+        Record a write and commit the pending writes every `commit_interval`
+        writes.
+        """
+        self.pending_writes += 1
+        if self.pending_writes >= self.commit_interval:
+            self.commit()
+
+    def commit(self):
+        """
+        Evict the entries above `max_entries` if any, and commit the pending
+        writes.
+        """
+        if self.entries_count > self.max_entries:
+            self.evict()
+        self.connection.commit()
+        self.pending_writes = 0
+
+    def evict(self):
+        """
+        Remove the least recently used entries above `max_entries`.
+        """
+        cursor = self.connection.execute(
+            "DELETE FROM license_detection_issues WHERE key IN ("
+            "SELECT key FROM license_detection_issues "
+            "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.evictions += cursor.rowcount
+        [(self.entries_count,)] = self.connection.execute(
+            "SELECT COUNT(*) FROM license_detection_issues"
+        )
+
+    def close(self):
+        if not self.read_only:
+            self.commit()
+        self.connection.close()
+
+    def get_statistics(self):
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
@@ -0,0 +1,141 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import json
+
+import click
+
+from scancode_analyzer import stream_analyzer
+from scancode_analyzer import summary
+from scancode_analyzer.analyzer_plugin import MISSING_OPTIONS_MESSAGE
+from scancode_analyzer.analyzer_plugin import ScancodeDataChangedError
+
+
+@click.group()
+def cli():
+    """
+    Analyze ScanCode license detection results for license detection issues.
+    """
+    pass
+
+
+@cli.command()
+@click.argument(
+    "input",
+    metavar="INPUT",
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+)
+@click.argument(
+    "output",
+    metavar="OUTPUT",
+    type=click.File(mode="w", encoding="utf-8"),
+)
+@click.option(
+    "-n",
+    "--processes",
+    type=int,
+    default=1,
+    metavar="INT",
+    show_default=True,
+    help="Set the number of parallel processes to use.",
+)
+@click.option(
+    "--partial-summary",
+    type=click.File(mode="w", encoding="utf-8"),
+    metavar="FILE",
+    help="Also write a partial summary of the license detection issues to FILE, "
+    "to merge with the partial summaries of other parts of the same scan.",
+)
+def analyze(input, output, processes, partial_summary):
+    """
+    Analyze the ScanCode JSON or JSON Lines results file at INPUT and write
+    license detection issues to OUTPUT as JSON Lines: one line for each file with
+    license detection issues or analysis errors, and a last line with the
+    license detection issues summary.
+
+    The scan must have been run with these options:
+    --license --license-text --is-license-text --classify --info
+    """
+    analyzed_files, analyzer = stream_analyzer.analyze_results_file(
+        location=input,
+        processes=processes,
+    )
+
+    try:
+        for analyzed_file in analyzed_files:
+            output.write(json.dumps(analyzed_file.to_dict()))
+            output.write("\n")
+    except stream_analyzer.ResultsFileError as e:
+        raise click.ClickException(str(e))
+    except ScancodeDataChangedError as e:
+        # The message ends with a traceback, which is not useful here
+        message, _, _trace = str(e).partition("\n")
+        raise click.ClickException(
+            f"Invalid license matches in the scan: {message}. "
+            + MISSING_OPTIONS_MESSAGE
+        )
+
+    if partial_summary:
+        json.dump(analyzer.get_partial_summary().to_dict(), partial_summary)
+
+    summary_license = analyzer.summarize()
+    output.write(json.dumps(
+        {"license_detection_issues_summary": summary_license.to_dict()}
+    ))
+    output.write("\n")
+
+
+@cli.command()
+@click.argument(
+    "partial_summaries",
+    metavar="PARTIAL_SUMMARY...",
+    nargs=-1,
+    required=True,
+    type=click.File(mode="r", encoding="utf-8"),
+)
+@click.argument(
+    "output",
+    metavar="OUTPUT",
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.option(
+    "--partial",
+    is_flag=True,
+    default=False,
+    help="Write the merged partial summary instead of the summary.",
+)
+def merge(partial_summaries, output, partial):
+    """
+    Merge the PARTIAL_SUMMARY files created with the "analyze --partial-summary"
+    option for each part of a scan, in the order of these parts, and write the
+    license detection issues summary of the whole scan to OUTPUT as JSON.
+
+    Partial summaries are only created by the "analyze" command of this tool,
+    from the results files of the parts of a scan, and not by the
+    --analyze-license-results option of a scancode run. OUTPUT is only written
+    once all the partial summaries are merged.
+    """
+    try:
+        merged = summary.merge_partial_summaries(
+            summary.PartialSummaryLicenseIssues.from_dict(json.load(partial_summary))
+            for partial_summary in partial_summaries
+        )
+    except (ValueError, KeyError) as e:
+        raise click.ClickException(f"Invalid partial summary: {e!r}")
+
+    if partial:
+        merged_summary = merged.to_dict()
+    else:
+        merged_summary = {
+            "license_detection_issues_summary": merged.summarize().to_dict()
+        }
+
+    with open(output, "w", encoding="utf-8") as output_file:
+        json.dump(merged_summary, output_file)
+        output_file.write("\n")
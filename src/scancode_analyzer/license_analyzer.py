@@ -7,8 +7,13 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+import functools
+import itertools
+import sys
+
 import attr
 from collections import Counter
+from collections import OrderedDict
 
 from licensedcode.tokenize import query_tokenizer
 
@@ -28,6 +33,9 @@ LINES_THRESHOLD = 4
 FALSE_POSITIVE_START_LINE_THRESHOLD = 1000
 FALSE_POSITIVE_RULE_LENGTH_THRESHOLD = 3
 
+# Matchers of license matches which are always correct license detections
+EXACT_MATCHERS = ("1-hash", "4-spdx-id")
+
 # Whether to Use the NLP BERT Models
 USE_LICENSE_CASE_BERT_MODEL = False
 USE_FALSE_POSITIVE_BERT_MODEL = False
@@ -211,7 +219,19 @@ ISSUE_TYPES_BY_CLASSIFICATION = {
 }
 
 
-@attr.s
+def get_issue_type_key(issue_type):
+    """
+    Return the key of an `issue_type` IssueType in ISSUE_TYPES_BY_CLASSIFICATION.
+    Note that this is not always the same as its `classification_id`.
+    """
+    for key, shared_issue_type in ISSUE_TYPES_BY_CLASSIFICATION.items():
+        if shared_issue_type is issue_type:
+            return key
+
+    raise ValueError(f"Unknown issue type: {issue_type!r}")
+
+
+@attr.s(slots=True)
 class SuggestedLicenseMatch:
     """
     After analysis of a license detection issue, an alternate license detection is
@@ -221,7 +241,7 @@ class SuggestedLicenseMatch:
     matched_text = attr.ib(type=str)
 
 
-@attr.s
+@attr.s(slots=True)
 class FileRegion:
     """
     A file has one or more file-regions, which are separate regions of the file
@@ -233,6 +253,56 @@ class FileRegion:
     end_line = attr.ib(type=int)
 
 
+# Maximum number of matched texts with cached tokens
+MATCHED_TEXTS_CACHE_SIZE = 10000
+
+
+@attr.s
+class TokenizedMatchedTexts:
+    """
+    An interning table of tokenized license matched texts, as the same texts (for
+    instance unknown license intros) are repeated in many files of a codebase.
+    The same tuple of tokens is returned for all the matched texts that have the
+    same tokens.
+
+    Only the tokens of the `max_size` most recently used matched texts are
+    cached, as each cached matched text is kept in memory.
+    """
+    max_size = attr.ib(default=MATCHED_TEXTS_CACHE_SIZE)
+    # {matched text: tuple of tokens} in least recently used first order
+    tokens_by_matched_text = attr.ib(factory=OrderedDict)
+    interned_tokens = attr.ib(factory=dict)
+
+    def get_tokens(self, matched_text):
+        """
+        Return a tuple of tokens for a `matched_text` string.
+        """
+        tokens_by_matched_text = self.tokens_by_matched_text
+        tokens = tokens_by_matched_text.get(matched_text)
+        if tokens is not None:
+            tokens_by_matched_text.move_to_end(matched_text)
+            return tokens
+
+        tokens = tuple(
+            sys.intern(token) for token in query_tokenizer(matched_text)
+        )
+        tokens = self.interned_tokens.setdefault(tokens, tokens)
+        tokens_by_matched_text[matched_text] = tokens
+        if len(tokens_by_matched_text) > self.max_size:
+            tokens_by_matched_text.popitem(last=False)
+
+        return tokens
+
+    def clear(self):
+        self.tokens_by_matched_text.clear()
+        self.interned_tokens.clear()
+
+
+# Shared by all the license detection issues of a codebase, and cleared after
+# the analysis of a codebase.
+TOKENIZED_MATCHED_TEXTS = TokenizedMatchedTexts()
+
+
 @attr.s
 class LicenseDetectionIssue:
     """
@@ -256,49 +326,67 @@ class LicenseDetectionIssue:
 
     def to_dict(self, is_summary=True):
         if is_summary:
-            return attr.asdict(
+            license_detection_issue = attr.asdict(
                 self, filter=lambda attr, value: attr.name not in [
                     "file_regions"],
             )
         else:
-            return attr.asdict(
+            license_detection_issue = attr.asdict(
                 self, filter=lambda attr, value: attr.name not in ["path"],
             )
+        # LicenseMatch have attributes of their rule which are not attrs fields
+        license_detection_issue["original_licenses"] = [
+            license_match.to_dict() for license_match in self.original_licenses
+        ]
+        return license_detection_issue
 
     @property
     def identifier(self):
         """
         This is an identifier for a issue, based on it's underlying license matches.
+        It is computed once and cached on the issue.
         """
-        data = []
-        for license_match in self.original_licenses:
-            identifier = (license_match.rule_identifier,
-                          license_match.match_coverage,)
-            data.append(identifier)
+        identifier = getattr(self, "_identifier", None)
+        if identifier is None:
+            identifier = tuple(
+                (license_match.rule_identifier, license_match.match_coverage,)
+                for license_match in self.original_licenses
+            )
+            self._identifier = identifier
 
-        return tuple(data)
+        return identifier
 
     @property
     def identifier_for_unknown_intro(self):
         """
         This is an identifier for a issue, which is an unknown license intro,
-        based on it's underlying license matches.
+        based on it's underlying license matches, or None if none of these
+        matches is unknown, as only such issues can have the identifier of an
+        unknown license intro.
+        It is computed once and cached on the issue.
         """
-        data = []
-        for license_match in self.original_licenses:
-            tokenized_matched_text = tuple(
-                query_tokenizer(license_match.matched_text))
-            identifier = (
-                license_match.rule_identifier,
-                license_match.match_coverage,
-                tokenized_matched_text,
+        try:
+            return self._identifier_for_unknown_intro
+        except AttributeError:
+            pass
+
+        identifier = None
+        if has_unknown_matches(self.original_licenses):
+            identifier = tuple(
+                (
+                    license_match.rule_identifier,
+                    license_match.match_coverage,
+                    TOKENIZED_MATCHED_TEXTS.get_tokens(license_match.matched_text),
+                )
+                for license_match in self.original_licenses
             )
-            data.append(identifier)
-
-        return tuple(data)
+        self._identifier_for_unknown_intro = identifier
+        return identifier
 
     @staticmethod
-    def format_analysis_result(issue_category, issue_type, license_matches, path):
+    def format_analysis_result(
+        issue_category, issue_type, license_matches, path, source_text=None,
+    ):
         """
         Format the analysis result to generate an LicenseDetectionIssue object for
         this license detection issue.
@@ -312,6 +400,9 @@ class LicenseDetectionIssue:
             LicenseMatch object.
         :param path: str
             Path of the resource where the license issue exists
+        :param source_text: SourceText
+            The text of the scanned file, to suggest matched texts from, if
+            available.
         """
         # Don't generate LicenseDetectionIssue objects for correct License Detections.
         if issue_category == "correct-license-detection":
@@ -319,7 +410,7 @@ class LicenseDetectionIssue:
 
         start_line, end_line = get_start_end_line(license_matches)
         license_expression, matched_text = get_license_match_suggestion(
-            license_matches, issue_category, issue_type
+            license_matches, issue_category, issue_type, source_text=source_text,
         )
 
         license_detection_issue = LicenseDetectionIssue(
@@ -343,7 +434,12 @@ class LicenseDetectionIssue:
 
     @staticmethod
     def from_license_matches(
-        license_matches, path=None, is_license_text=False, is_legal=False,
+        license_matches,
+        path=None,
+        is_license_text=False,
+        is_legal=False,
+        source_text=None,
+        timings=None,
     ):
         """
         Group `license_matches` into file-regions and for each license detection issue,
@@ -358,16 +454,32 @@ class LicenseDetectionIssue:
             True if most of a file is license text.
         :param is_legal: bool
             True if the file has a common legal name.
+        :param source_text: SourceText
+            The text of the scanned file, to suggest matched texts from, if
+            available.
+        :param timings: AnalysisTimings
+            Collect the timings and counters of the analysis stages, if any.
         """
         if not license_matches:
             return []
 
+        if timings is not None:
+            start = timings.start()
+
         if not is_license_text:
             groups_of_license_matches = group_matches(license_matches)
+            if timings is not None:
+                groups_of_license_matches = list(groups_of_license_matches)
+                timings.add_time("group_matches", start)
         else:
             groups_of_license_matches = [license_matches]
         return analyze_matches(
-            groups_of_license_matches, path, is_license_text, is_legal
+            groups_of_license_matches,
+            path,
+            is_license_text,
+            is_legal,
+            source_text=source_text,
+            timings=timings,
         )
 
 
@@ -381,7 +493,7 @@ def is_correct_detection(license_matches):
         List of LicenseMatch.
     """
     matchers = (license_match.matcher for license_match in license_matches)
-    return all(matcher in ("1-hash", "4-spdx-id") for matcher in matchers)
+    return all(matcher in EXACT_MATCHERS for matcher in matchers)
 
 
 def is_match_coverage_less_than_threshold(license_matches, threshold):
@@ -686,6 +798,187 @@ def get_issue_type(
         return "intro-unknown-match"
 
 
+# Bit flags of the features of license matches which are used to classify the
+# license detection issues into one of ISSUE_TYPES_BY_CLASSIFICATION
+IS_LICENSE_TEXT_FEATURE = 1 << 0
+IS_LICENSE_NOTICE_FEATURE = 1 << 1
+IS_LICENSE_TAG_FEATURE = 1 << 2
+IS_LICENSE_REFERENCE_FEATURE = 1 << 3
+IS_LICENSE_INTRO_FEATURE = 1 << 4
+HAS_UNKNOWN_RULE_IDENTIFIER_FEATURE = 1 << 5
+HAS_LEAD_RULE_IDENTIFIER_FEATURE = 1 << 6
+HAS_UNKNOWN_LICENSE_EXPRESSION_FEATURE = 1 << 7
+HAS_CONNECTOR_LICENSE_EXPRESSION_FEATURE = 1 << 8
+
+ALL_FEATURES = (1 << 9) - 1
+
+# Maximum number of distinct rule identifiers or license expressions with
+# cached features
+FEATURES_CACHE_SIZE = 100000
+
+
+@functools.lru_cache(maxsize=FEATURES_CACHE_SIZE)
+def get_rule_identifier_features(rule_identifier):
+    """
+    Return the feature bit flags of a `rule_identifier` string.
+    """
+    features = 0
+    if "unknown" in rule_identifier:
+        features |= HAS_UNKNOWN_RULE_IDENTIFIER_FEATURE
+    if "lead" in rule_identifier:
+        features |= HAS_LEAD_RULE_IDENTIFIER_FEATURE
+    return features
+
+
+@functools.lru_cache(maxsize=FEATURES_CACHE_SIZE)
+def get_license_expression_features(license_expression):
+    """
+    Return the feature bit flags of a `license_expression` string.
+    """
+    features = 0
+    if "unknown" in license_expression:
+        features |= HAS_UNKNOWN_LICENSE_EXPRESSION_FEATURE
+    if any(
+        license_expression_connector in license_expression
+        for license_expression_connector in ("AND", "OR", "WITH")
+    ):
+        features |= HAS_CONNECTOR_LICENSE_EXPRESSION_FEATURE
+    return features
+
+
+def get_license_match_features(license_match):
+    """
+    Return the feature bit flags of a `license_match` LicenseMatch.
+    """
+    # The features of the rule of a LicenseMatch are computed once in its
+    # RuleIndex
+    features = getattr(license_match, "rule_features", None)
+    if features is not None:
+        return features
+
+    features = (
+        get_rule_identifier_features(license_match.rule_identifier)
+        | get_license_expression_features(license_match.license_expression)
+    )
+    if license_match.is_license_text:
+        features |= IS_LICENSE_TEXT_FEATURE
+    if license_match.is_license_notice:
+        features |= IS_LICENSE_NOTICE_FEATURE
+    if license_match.is_license_tag:
+        features |= IS_LICENSE_TAG_FEATURE
+    if license_match.is_license_reference:
+        features |= IS_LICENSE_REFERENCE_FEATURE
+    if license_match.is_license_intro:
+        features |= IS_LICENSE_INTRO_FEATURE
+    return features
+
+
+def get_region_features(license_matches):
+    """
+    Return a tuple of (features of any license match, features of all license
+    matches) bit flags for the `license_matches` LicenseMatch of a file-region.
+    """
+    any_features = 0
+    all_features = ALL_FEATURES
+    for license_match in license_matches:
+        features = get_license_match_features(license_match)
+        any_features |= features
+        all_features &= features
+    return any_features, all_features
+
+
+@attr.s(slots=True, frozen=True)
+class FeaturesLicenseMatch:
+    """
+    A minimal license match with the given feature bit flags, used to compile the
+    issue types decision table with the classification functions.
+    """
+    rule_identifier = attr.ib()
+    license_expression = attr.ib()
+    is_license_text = attr.ib()
+    is_license_notice = attr.ib()
+    is_license_tag = attr.ib()
+    is_license_reference = attr.ib()
+    is_license_intro = attr.ib()
+
+    @classmethod
+    def from_features(cls, features):
+        rule_identifier = "rule"
+        if features & HAS_UNKNOWN_RULE_IDENTIFIER_FEATURE:
+            rule_identifier += "-unknown"
+        if features & HAS_LEAD_RULE_IDENTIFIER_FEATURE:
+            rule_identifier += "-lead"
+
+        license_expression = "license"
+        if features & HAS_UNKNOWN_LICENSE_EXPRESSION_FEATURE:
+            license_expression = "unknown"
+        if features & HAS_CONNECTOR_LICENSE_EXPRESSION_FEATURE:
+            license_expression += " AND license"
+
+        return cls(
+            rule_identifier=rule_identifier,
+            license_expression=license_expression,
+            is_license_text=bool(features & IS_LICENSE_TEXT_FEATURE),
+            is_license_notice=bool(features & IS_LICENSE_NOTICE_FEATURE),
+            is_license_tag=bool(features & IS_LICENSE_TAG_FEATURE),
+            is_license_reference=bool(features & IS_LICENSE_REFERENCE_FEATURE),
+            is_license_intro=bool(features & IS_LICENSE_INTRO_FEATURE),
+        )
+
+
+@functools.lru_cache(maxsize=1)
+def get_issue_types_decision_table():
+    """
+    Return a mapping of {(is_license_text, is_legal, issue_category, features):
+    issue type key of ISSUE_TYPES_BY_CLASSIFICATION or None} compiled once using
+    `get_issue_rule_type` and `get_issue_type`.
+
+    The issue type of a file-region only depends on the features of any or all of
+    its license matches: a file-region where all the license matches have some
+    features has the same issue type as a file-region with a single license match
+    with these features.
+    """
+    decision_table = {}
+    for is_license_text, is_legal, issue_category, features in itertools.product(
+        (False, True),
+        (False, True),
+        ISSUE_CATEGORIES,
+        range(ALL_FEATURES + 1),
+    ):
+        license_matches = [FeaturesLicenseMatch.from_features(features)]
+        issue_rule_type = get_issue_rule_type(
+            license_matches, is_license_text, is_legal,
+        )
+        decision_table[is_license_text, is_legal, issue_category, features] = (
+            get_issue_type(
+                license_matches,
+                is_license_text,
+                is_legal,
+                issue_category,
+                issue_rule_type,
+            )
+        )
+    return decision_table
+
+
+def get_issue_type_from_decision_table(
+    license_matches, is_license_text, is_legal, issue_category,
+):
+    """
+    Classifies the license detection issue of a file-region with `license_matches`
+    into one of ISSUE_TYPES_BY_CLASSIFICATION as `get_issue_rule_type` and
+    `get_issue_type` do, using the precompiled issue types decision table.
+    """
+    any_features, all_features = get_region_features(license_matches)
+    # Only the license expression connectors are needed in all license matches
+    features = (any_features & ~HAS_CONNECTOR_LICENSE_EXPRESSION_FEATURE) | (
+        all_features & HAS_CONNECTOR_LICENSE_EXPRESSION_FEATURE
+    )
+    return get_issue_types_decision_table()[
+        bool(is_license_text), bool(is_legal), issue_category, features
+    ]
+
+
 def get_issue_rule_type_using_bert(license_matches):
     raise NotImplementedError
 
@@ -704,11 +997,54 @@ def merge_string_without_overlap(string1, string2):
 def merge_string_with_overlap(string1, string2):
     """
     Merge two Strings that has a common substring.
+    The longest suffix of `string1` which is a prefix of `string2` is only kept
+    once, and is found in linear time.
+    """
+    overlap_length = get_overlap_length(string1, string2)
+    return string1[:len(string1) - overlap_length] + string2
+
+
+def get_prefix_function(string):
+    """
+    Return a list of the length of the longest proper prefix of `string` which is
+    also a suffix of `string[:i + 1]` for each position i of `string`, as in the
+    Knuth-Morris-Pratt algorithm.
+    """
+    prefix_function = [0] * len(string)
+    length = 0
+    for position in range(1, len(string)):
+        character = string[position]
+        while length and string[length] != character:
+            length = prefix_function[length - 1]
+        if string[length] == character:
+            length += 1
+        prefix_function[position] = length
+    return prefix_function
+
+
+def get_overlap_length(string1, string2):
+    """
+    Return the length of the longest suffix of `string1` which is a prefix of
+    `string2`.
     """
-    idx = 0
-    while not string2.startswith(string1[idx:]):
-        idx += 1
-    return string1[:idx] + string2
+    if not string1 or not string2:
+        return 0
+
+    # A longer suffix of string1 cannot be a prefix of string2
+    string1 = string1[-len(string2):]
+    if string2.startswith(string1):
+        return len(string1)
+
+    # Match string2 with the end of string1 as in the Knuth-Morris-Pratt
+    # algorithm: the length matched at the end of string1 is the overlap.
+    prefix_function = get_prefix_function(string2)
+    length = 0
+    for character in string1:
+        while length and (length == len(string2) or string2[length] != character):
+            length = prefix_function[length - 1]
+        if string2[length] == character:
+            length += 1
+    return length
 
 
 def get_start_end_line(license_matches):
@@ -769,7 +1105,9 @@ def predict_license_expression(license_matches):
     return license_expression_prediction
 
 
-def get_license_match_suggestion(license_matches, issue_category, issue_type):
+def get_license_match_suggestion(
+    license_matches, issue_category, issue_type, source_text=None,
+):
     """
     Suggest a license match rectifying the license detection issue.
 
@@ -779,6 +1117,10 @@ def get_license_match_suggestion(license_matches, issue_category, issue_type):
         One of LicenseDetectionIssue.ISSUE_CATEGORIES.
     :param issue_type:
         One of LicenseDetectionIssue.ISSUE_TYPES_BY_CLASSIFICATION
+    :param source_text:
+        A SourceText of the scanned file. If available, the matched text of
+        many license matches is read from the lines of the file-region instead
+        of being consolidated from the matched texts.
     :returns license_expression:
         A complete license expression from all the licenses matches.
     :returns matched_text:
@@ -800,7 +1142,12 @@ def get_license_match_suggestion(license_matches, issue_category, issue_type):
             else:
                 license_expression = predict_license_expression(
                     license_matches)
-                matched_text = consolidate_matches(license_matches)
+                if source_text:
+                    matched_text = source_text.get_lines_text(
+                        *get_start_end_line(license_matches)
+                    )
+                if matched_text is None:
+                    matched_text = consolidate_matches(license_matches)
 
     return license_expression, matched_text
 
@@ -811,7 +1158,11 @@ def consolidate_matches(license_matches):
     license detection issue, i.e. in the same file-region.
     The license matches are incorrect matches and has fragments of a larger text,
     but, may not contain the entire text even after consolidating.
+    Return None if the matched texts are not loaded, as in worker processes.
     """
+    if any(license_match.matched_text is None for license_match in license_matches):
+        return None
+
     matched_text = None
     string_end_line = None
     is_first_group = True
@@ -873,21 +1224,21 @@ def analyze_region_for_license_scan_issues(license_matches, is_license_text, is_
     if issue_category != "correct-license-detection":
 
         if not USE_LICENSE_CASE_BERT_MODEL:
-            issue_rule_type = get_issue_rule_type(
+            issue_type = get_issue_type_from_decision_table(
                 license_matches,
                 is_license_text,
                 is_legal,
+                issue_category,
             )
         else:
             issue_rule_type = get_issue_rule_type_using_bert(license_matches)
-
-        issue_type = get_issue_type(
-            license_matches,
-            is_license_text,
-            is_legal,
-            issue_category,
-            issue_rule_type,
-        )
+            issue_type = get_issue_type(
+                license_matches,
+                is_license_text,
+                is_legal,
+                issue_category,
+                issue_rule_type,
+            )
 
     return issue_category, issue_type
 
@@ -901,16 +1252,30 @@ def modify_analysis_confidence(license_detection_issue):
     :param license_detection_issue:
         A LicenseDetectionIssue object.
     """
+    analysis_confidence = get_modified_analysis_confidence(
+        license_detection_issue.issue_category
+    )
+    if analysis_confidence:
+        license_detection_issue.issue_type.analysis_confidence = analysis_confidence
+
+
+def get_modified_analysis_confidence(issue_category):
+    """
+    Return the analysis confidence set by `modify_analysis_confidence` on the issue
+    type of an issue with an `issue_category`, or None if it is not modified.
+
+    :param issue_category: str
+    """
     if (
-        license_detection_issue.issue_category == "extra-words"
-        or license_detection_issue.issue_category == "near-perfect-match-coverage"
+        issue_category == "extra-words"
+        or issue_category == "near-perfect-match-coverage"
     ):
-        license_detection_issue.issue_type.analysis_confidence = "high"
+        return "high"
     elif (
-        license_detection_issue.issue_category == "false-positive"
-        or license_detection_issue.issue_category == "unknown-match"
+        issue_category == "false-positive"
+        or issue_category == "unknown-match"
     ):
-        license_detection_issue.issue_type.analysis_confidence = "low"
+        return "low"
 
 
 def group_matches(license_matches, lines_threshold=LINES_THRESHOLD):
@@ -945,7 +1310,14 @@ def group_matches(license_matches, lines_threshold=LINES_THRESHOLD):
     yield group_of_license_matches
 
 
-def analyze_matches(groups_of_license_matches, path, is_license_text, is_legal):
+def analyze_matches(
+    groups_of_license_matches,
+    path,
+    is_license_text,
+    is_legal,
+    source_text=None,
+    timings=None,
+):
     """
     Analyze all license detection issues in a file, for license detection issues.
 
@@ -955,18 +1327,37 @@ def analyze_matches(groups_of_license_matches, path, is_license_text, is_legal):
         Path of the resource where the license issue exists
     :param is_license_text: bool
     :param is_legal: bool
+    :param source_text: SourceText
+        The text of the scanned file, to suggest matched texts from, if available.
+    :param timings: AnalysisTimings
+        Collect the timings and counters of the analysis stages, if any.
     :returns: list generator
         A list of LicenseDetectionIssue objects one for each license detection
         issue.
     """
     for group_of_license_matches in groups_of_license_matches:
+        if timings is not None:
+            start = timings.start()
+
         issue_category, issue_type = analyze_region_for_license_scan_issues(
             license_matches=group_of_license_matches,
             is_license_text=is_license_text,
             is_legal=is_legal,
         )
+        if timings is not None:
+            start = timings.add_time("analyze_regions", start)
+
         license_detection_issue = LicenseDetectionIssue.format_analysis_result(
-            issue_category, issue_type, group_of_license_matches, path
+            issue_category,
+            issue_type,
+            group_of_license_matches,
+            path,
+            source_text=source_text,
         )
+        if timings is not None:
+            timings.add_time("format_issues", start)
+            timings.count("regions")
+            timings.count(f"regions:{issue_category}")
+
         if license_detection_issue:
             yield license_detection_issue
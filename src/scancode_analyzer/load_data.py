@@ -22,9 +22,20 @@
 #  ScanCode is a free software code scanning tool from nexB Inc. and others.
 #  Visit https://github.com/aboutcode-org/scancode-toolkit/ for support and download.
 
+import functools
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import warnings
+
 import pandas as pd
 
 from licensedcode import models
+from scancode.pool import get_pool
+from scancode_config import __version__ as scancode_version
+from scancode_config import scancode_cache_dir
 
 # Threshold of Words which is used in `Rule.compute_relevance` in `scancode.licensedcode.models.py`
 THRESHOLD_COMPUTE_RELEVANCE = 18.0
@@ -42,6 +53,260 @@ ignorables = [
 
 other_optionals = ['referenced_filenames', 'notes']
 
+# Columns with few distinct values, stored as categoricals
+categorical_rule_attributes = ["license_expression"]
+
+categorical_license_attributes = ["key", "category", "owner", "language"]
+
+boolean_license_attributes = ["is_exception", "is_deprecated", "is_unknown"]
+
+# Directory of the cached rules and licenses DataFrames
+LICENSE_RULES_INFO_CACHE_DIR = os.path.join(scancode_cache_dir, "scancode-analyzer")
+
+# Prefix of the cached DataFrames files names, followed by "text-" or
+# "metadata-" if loaded without the texts, and by their fingerprint
+LICENSE_RULES_INFO_CACHE_PREFIX = "license_rules_info-"
+
+# Number of rules or licenses files loaded at once by a worker process when
+# loading with multiple processes
+LOAD_CHUNKSIZE = 200
+
+# Change this when the cached DataFrames change, to invalidate the caches
+LICENSE_RULES_INFO_CACHE_VERSION = "4"
+
+# First line of a cache file, followed by a JSON line of its header, see
+# `get_cache_header`, and by the pickled DataFrames
+LICENSE_RULES_INFO_CACHE_MAGIC = b"scancode-analyzer license rules info cache\n"
+
+# Errors of a cache file that is truncated, not a cache file, or with pickled
+# objects that cannot be loaded
+INVALID_CACHE_ERRORS = (
+    OSError,
+    EOFError,
+    ValueError,
+    TypeError,
+    AttributeError,
+    ImportError,
+    pickle.UnpicklingError,
+)
+
+
+def get_files_stats(directory):
+    """
+    Return a mapping of {file name: (size, modification time in nanoseconds)}
+    for the files of a `directory`.
+    """
+    files_stats = {}
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            stat = entry.stat()
+            files_stats[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return files_stats
+
+
+def get_files_digests(directory, previous_files_digests=None):
+    """
+    Return a mapping of {file name: (size, modification time in nanoseconds,
+    SHA1 of the content)} for the files of a `directory`.
+
+    The digests of a `previous_files_digests` mapping are reused for the files
+    with the same size and modification time, so that only new or touched files
+    are read.
+    """
+    previous_files_digests = previous_files_digests or {}
+    files_digests = {}
+    for name, (size, mtime) in get_files_stats(directory).items():
+        previous = previous_files_digests.get(name)
+        if previous and previous[:2] == (size, mtime):
+            files_digests[name] = previous
+            continue
+
+        with open(os.path.join(directory, name), "rb") as data_file:
+            digest = hashlib.sha1(data_file.read()).hexdigest()
+        files_digests[name] = (size, mtime, digest)
+    return files_digests
+
+
+def get_changed_file_names(files_digests, previous_files_digests):
+    """
+    Return a set of the names of the files added, deleted or with a changed
+    content between the `previous_files_digests` and `files_digests` mappings
+    as returned by `get_files_digests`.
+    """
+    return {
+        name
+        for name in set(files_digests).union(previous_files_digests)
+        if files_digests.get(name, ())[2:] != previous_files_digests.get(name, ())[2:]
+    }
+
+
+def get_data_fingerprint(*directories):
+    """
+    Return a fingerprint string of the files of the `directories`, from their
+    names, sizes and modification times, the versions of ScanCode and pandas,
+    and the LICENSE_RULES_INFO_CACHE_VERSION. This changes whenever the ScanCode
+    rules or licenses are changed, added or removed, or only touched.
+
+    :param directories: str
+        Paths of the directories of the rules and licenses data files.
+    """
+    fingerprint = hashlib.sha1()
+    for version in (LICENSE_RULES_INFO_CACHE_VERSION, scancode_version, pd.__version__):
+        fingerprint.update(f"{version}\n".encode("utf-8"))
+
+    for directory in directories:
+        fingerprint.update(f"{os.path.abspath(directory)}\n".encode("utf-8"))
+        files_stats = get_files_stats(directory)
+        # There are tens of thousands of rules, so these are hashed at once
+        fingerprint.update("".join(
+            f"{name}:{size}:{mtime}\n"
+            for name, (size, mtime) in sorted(files_stats.items())
+        ).encode("utf-8"))
+
+    return fingerprint.hexdigest()
+
+
+def get_cache_header():
+    """
+    Return a mapping of the versions a cache file is saved with, that must be
+    the same to load its pickled DataFrames.
+    """
+    return dict(
+        cache_version=LICENSE_RULES_INFO_CACHE_VERSION,
+        scancode_version=scancode_version,
+        pandas_version=pd.__version__,
+    )
+
+
+def read_cache_header(cache_file):
+    """
+    Return the header mapping read from a binary `cache_file` opened at its
+    start. Raise a ValueError if this is not a cache file.
+    """
+    if cache_file.readline() != LICENSE_RULES_INFO_CACHE_MAGIC:
+        raise ValueError("Not a license rules info cache file")
+
+    header = json.loads(cache_file.readline())
+    if not isinstance(header, dict):
+        raise ValueError(f"Invalid license rules info cache header: {header!r}")
+    return header
+
+
+def is_compatible_cache_header(header, same_scancode_version=True):
+    """
+    Return True if a cache file with a `header` mapping was saved with the same
+    cache format and pandas version, and with the same ScanCode version if
+    `same_scancode_version` is True.
+    """
+    expected = get_cache_header()
+    if not same_scancode_version:
+        header = dict(header, scancode_version=scancode_version)
+    return all(header.get(key) == value for key, value in expected.items())
+
+
+def get_rule_record(rule, with_text=True):
+    """
+    Return a mapping of the attributes of a `rule` Rule, a row of the rules
+    DataFrame, with its text if `with_text` is True.
+    """
+    record = rule.to_dict()
+    rule_text = rule.text()
+    record["rule_filename"] = rule.data_file.split("/")[-1][:-4]
+    if with_text:
+        record["text"] = rule_text
+    record["words_count"] = len(rule_text.split())
+    return record
+
+
+def get_license_record(license, with_text=True):
+    """
+    Return a mapping of the attributes of a `license` License, a row of the
+    licenses DataFrame, with its text if `with_text` is True.
+    """
+    record = license.to_dict()
+    license_text = license.text
+    record["license_filename"] = license.data_file.split("/")[-1][:-4]
+    if with_text:
+        record["text"] = license_text
+    record["words_count"] = len(license_text.split())
+    return record
+
+
+def get_rule_record_from_data_file(data_file, with_text=True):
+    """
+    Return a rule record for the rule with a `data_file` YAML file and a text
+    file with the same base name.
+    """
+    text_file = f"{data_file[:-4]}.RULE"
+    rule = models.Rule(data_file=data_file, text_file=text_file)
+    return get_rule_record(rule, with_text=with_text)
+
+
+def get_license_record_from_key(key, licenses_folder, with_text=True):
+    """
+    Return a license record for the license with a `key` in `licenses_folder`,
+    or None if this license is deprecated.
+    """
+    license = models.License(key=key, src_dir=licenses_folder)
+    if license.is_deprecated:
+        return
+    return get_license_record(license, with_text=with_text)
+
+
+def map_with_processes(function, items, processes=1):
+    """
+    Return a list of the results of calling `function` on each of the `items`,
+    in a pool of `processes` worker processes if more than one.
+    """
+    if not processes or processes <= 1:
+        return [function(item) for item in items]
+
+    pool = get_pool(processes=processes)
+    try:
+        # There are many small files, so these are loaded by chunks to make the
+        # serialization overhead reasonable.
+        return pool.map(function, items, chunksize=LOAD_CHUNKSIZE)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def build_dataframe(records, categorical_columns=(), boolean_columns=()):
+    """
+    Return a DataFrame built at once from a list of `records` mappings, with
+    the dtypes set by `set_dtypes`.
+
+    Columns are ordered as first seen in the records.
+
+    :param records: list
+        List of mappings of {column name: value}, one for each row.
+    :param categorical_columns: iterable
+        Names of the columns with few distinct values.
+    :param boolean_columns: iterable
+        Names of the flag columns.
+    """
+    df = pd.DataFrame.from_records(records)
+    return set_dtypes(df, categorical_columns, boolean_columns)
+
+
+def set_dtypes(df, categorical_columns=(), boolean_columns=()):
+    """
+    Return a `df` DataFrame with categorical dtypes for the `categorical_columns`
+    and boolean dtypes for the `boolean_columns`, where a missing value is False.
+    """
+    dtypes = {}
+    for column in categorical_columns:
+        if column in df.columns:
+            dtypes[column] = "category"
+    for column in boolean_columns:
+        if column in df.columns:
+            df[column] = df[column].fillna(False)
+            dtypes[column] = bool
+    if "words_count" in df.columns:
+        dtypes["words_count"] = "int64"
+
+    return df.astype(dtypes)
+
 
 class LicenseRulesInfo:
     """
@@ -51,49 +316,342 @@ class LicenseRulesInfo:
     def __init__(
         self,
         rules_folder=models.rules_data_dir,
-        licenses_folder=models.licenses_data_dir
+        licenses_folder=models.licenses_data_dir,
+        cache_dir=LICENSE_RULES_INFO_CACHE_DIR,
+        processes=1,
+        with_text=True,
     ):
+        """
+        :param cache_dir: str
+            Directory where the rules and licenses DataFrames are cached, keyed
+            by a fingerprint of the rules and licenses folders, or None to not
+            use a cache.
+        :param processes: int
+            Number of processes to load the rules and licenses files with.
+        :param with_text: bool
+            If False, the DataFrames do not have a `text` column, which uses
+            most of their memory. The texts are then read on demand with
+            `get_rule_text` and `get_license_text`, or all added to the
+            DataFrames by calling `load_texts`.
+        """
         self.rule_df = None
         self.lic_df = None
+        self.with_text = with_text
+        self.rules_folder = os.path.abspath(rules_folder)
+        self.licenses_folder = os.path.abspath(licenses_folder)
+        mode = "text" if with_text else "metadata"
+        self.cache_prefix = f"{LICENSE_RULES_INFO_CACHE_PREFIX}{mode}-"
+        # {file name: (size, modification time, SHA1)} of the loaded rules and
+        # licenses files, see `get_files_digests`
+        self.rules_files_digests = {}
+        self.licenses_files_digests = {}
 
-        self.load_scancode_rules(rules_folder)
-        self.load_scancode_licenses(licenses_folder)
+        cache_location = None
+        if cache_dir:
+            fingerprint = get_data_fingerprint(rules_folder, licenses_folder)
+            cache_location = os.path.join(
+                cache_dir, f"{self.cache_prefix}{fingerprint}.pickle"
+            )
+            if self.load_cache(cache_location):
+                return
+
+            # Only a few rules change between ScanCode releases, so a stale
+            # cache is refreshed with only the changed rules and licenses
+            if self.load_stale_cache(cache_dir):
+                self.refresh_licenses()
+                self.refresh_rules()
+                self.save_cache(cache_location)
+                return
+
+        self.rules_files_digests = get_files_digests(rules_folder)
+        self.licenses_files_digests = get_files_digests(licenses_folder)
+        self.load_scancode_rules(rules_folder, processes=processes)
+        self.load_scancode_licenses(licenses_folder, processes=processes)
         self.modify_lic_rule_info()
 
-    def load_scancode_rules(self, rules_folder):
+        if cache_location:
+            self.save_cache(cache_location)
+
+    def load_cache(self, cache_location, same_scancode_version=True):
         """
-        Loads all scancode rules into a Dataframe.
+        Load the rules and licenses DataFrames from the cache file at
+        `cache_location`. Return True if loaded, or False if this cache file does
+        not exist, or was saved with another cache format or pandas version, or
+        with another ScanCode version if `same_scancode_version` is True.
+
+        A cache file that cannot be loaded is reported with a warning, and
+        then rebuilt.
         """
-        rules = list(models.load_rules(rules_folder))
-        rules_df = []
+        try:
+            with open(cache_location, "rb") as cache_file:
+                header = read_cache_header(cache_file)
+                if not is_compatible_cache_header(header, same_scancode_version):
+                    return False
+                rule_df, lic_df, state = pickle.load(cache_file)
+        except FileNotFoundError:
+            return False
+        except INVALID_CACHE_ERRORS as e:
+            warnings.warn(
+                f"Ignoring invalid license rules info cache file: "
+                f"{cache_location!r}: {e!r}"
+            )
+            return False
+
+        self.rule_df = rule_df
+        self.lic_df = lic_df
+        self.rules_files_digests = state["rules_files_digests"]
+        self.licenses_files_digests = state["licenses_files_digests"]
+        return True
 
-        for rule in rules:
-            df = pd.DataFrame.from_dict(rule.to_dict(), orient='index').T
-            rule_text = rule.text()
-            df["rule_filename"] = rule.data_file.split("/")[-1][:-4]
-            df["text"] = rule_text
-            df["words_count"] = len(rule_text.split())
-            rules_df.append(df)
+    def load_stale_cache(self, cache_dir):
+        """
+        Load the rules and licenses DataFrames from a cache file in `cache_dir`
+        of other rules or licenses files, such as the files of a previous
+        ScanCode release. Return True if loaded, or False if there is no such
+        cache file.
+        """
+        if not os.path.isdir(cache_dir):
+            return False
 
-        self.rule_df = pd.concat(rules_df)
+        for name in os.listdir(cache_dir):
+            if name.startswith(self.cache_prefix):
+                location = os.path.join(cache_dir, name)
+                if self.load_cache(location, same_scancode_version=False):
+                    return True
+        return False
 
-    def load_scancode_licenses(self, licenses_folder):
+    def save_cache(self, cache_location):
+        """
+        Save the rules and licenses DataFrames to the cache file at
+        `cache_location`, and remove the stale cache files of other fingerprints
+        in its directory.
+        """
+        cache_dir = os.path.dirname(cache_location)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Write to a temporary file first, so that a concurrent load never sees
+        # a partially written cache file
+        descriptor, temp_location = tempfile.mkstemp(dir=cache_dir)
+        try:
+            with os.fdopen(descriptor, "wb") as cache_file:
+                cache_file.write(LICENSE_RULES_INFO_CACHE_MAGIC)
+                header = json.dumps(get_cache_header())
+                cache_file.write(f"{header}\n".encode("utf-8"))
+                state = dict(
+                    rules_files_digests=self.rules_files_digests,
+                    licenses_files_digests=self.licenses_files_digests,
+                )
+                pickle.dump(
+                    (self.rule_df, self.lic_df, state),
+                    cache_file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(temp_location, cache_location)
+        except BaseException:
+            os.remove(temp_location)
+            raise
+
+        for name in os.listdir(cache_dir):
+            location = os.path.join(cache_dir, name)
+            if name.startswith(self.cache_prefix) and location != cache_location:
+                try:
+                    os.remove(location)
+                except OSError:
+                    pass
+
+    def load_scancode_rules(self, rules_folder, processes=1):
+        """
+        Loads all scancode rules into a Dataframe.
+
+        The DataFrame is built once from a record for each rule, as building and
+        concatenating a DataFrame for each of the many rules is very slow.
+        With multiple `processes`, the rules files are loaded in worker
+        processes, without the checks of orphaned or misnamed rules files done
+        by `models.load_rules`.
+        """
+        if processes and processes > 1:
+            data_files = sorted(
+                os.path.join(rules_folder, name)
+                for name in os.listdir(rules_folder)
+                if name.endswith(".yml")
+            )
+            records = map_with_processes(
+                functools.partial(
+                    get_rule_record_from_data_file,
+                    with_text=self.with_text,
+                ),
+                data_files,
+                processes=processes,
+            )
+        else:
+            records = [
+                get_rule_record(rule, with_text=self.with_text)
+                for rule in models.load_rules(rules_folder)
+            ]
+
+        self.rule_df = build_dataframe(
+            records,
+            categorical_columns=categorical_rule_attributes,
+            boolean_columns=boolean_rule_attributes,
+        )
+
+    def load_scancode_licenses(self, licenses_folder, processes=1):
         """
         Loads all scancode licenses into a Dataframe.
+
+        The DataFrame is built once from a record for each license, except the
+        deprecated licenses. With multiple `processes`, the licenses files are
+        loaded in worker processes, without the checks of orphaned licenses
+        files done by `models.load_licenses`.
+        """
+        if processes and processes > 1:
+            keys = sorted(
+                name[:-4]
+                for name in os.listdir(licenses_folder)
+                if name.endswith(".yml")
+            )
+            records = map_with_processes(
+                functools.partial(
+                    get_license_record_from_key,
+                    licenses_folder=licenses_folder,
+                    with_text=self.with_text,
+                ),
+                keys,
+                processes=processes,
+            )
+            records = [record for record in records if record]
+        else:
+            licenses = models.load_licenses(licenses_folder)
+            records = [
+                get_license_record(license, with_text=self.with_text)
+                for license in licenses.values()
+            ]
+
+        self.lic_df = build_dataframe(
+            records,
+            categorical_columns=categorical_license_attributes,
+            boolean_columns=boolean_license_attributes,
+        )
+
+    def refresh_licenses(self):
+        """
+        Reload the licenses DataFrame if any license file was added, modified
+        or deleted in the licenses folder since these were loaded. Return True
+        if reloaded.
+
+        Files are compared by content, so that touched files are not reloaded.
+        There are few licenses, so these are all reloaded.
+        """
+        files_digests = get_files_digests(
+            self.licenses_folder,
+            self.licenses_files_digests,
+        )
+        changed = get_changed_file_names(files_digests, self.licenses_files_digests)
+        self.licenses_files_digests = files_digests
+        if not changed:
+            return False
+
+        self.load_scancode_licenses(self.licenses_folder)
+        self.licences_compute_min_cov(self.lic_df)
+        return True
+
+    def refresh_rules(self):
+        """
+        Update the rules DataFrame with the rules added, modified or deleted in
+        the rules folder since these were loaded, only loading and computing
+        the relevance and minimum coverage of the added or modified rules.
+        Return a set of the `rule_filename` of these rules.
+
+        Files are compared by content, so that the rules files which are only
+        touched, as when ScanCode is reinstalled, are not loaded again. The
+        updated rules are moved at the end of the DataFrame.
         """
-        licenses = models.load_licenses(licenses_folder)
-        licenses_df = []
+        rules_folder = self.rules_folder
+        files_digests = get_files_digests(rules_folder, self.rules_files_digests)
+        rule_filenames = {
+            os.path.splitext(name)[0]
+            for name in get_changed_file_names(
+                files_digests,
+                self.rules_files_digests,
+            )
+        }
+        self.rules_files_digests = files_digests
+        if not rule_filenames:
+            return rule_filenames
 
-        for license in licenses.values():
+        records = []
+        for rule_filename in sorted(rule_filenames):
+            data_file = os.path.join(rules_folder, f"{rule_filename}.yml")
+            # This rule is deleted
+            if not os.path.exists(data_file):
+                continue
+            text_file = os.path.join(rules_folder, f"{rule_filename}.RULE")
+            rule = models.Rule(data_file=data_file, text_file=text_file)
+            records.append(get_rule_record(rule, with_text=self.with_text))
 
-            df = pd.DataFrame.from_dict(license.to_dict(), orient='index').T
-            license_text = license.text
-            df["license_filename"] = license.data_file.split("/")[-1][:-4]
-            df["text"] = license_text
-            df["words_count"] = len(license_text.split())
-            licenses_df.append(df)
+        rule_df = self.rule_df[~self.rule_df["rule_filename"].isin(rule_filenames)]
+        # The columns of attributes only set by deleted or modified rules are
+        # dropped, as in a DataFrame of all the rules
+        empty_columns = [
+            column for column in rule_df.columns
+            if not (
+                rule_df[column].any()
+                if column in boolean_rule_attributes
+                else rule_df[column].notna().any()
+            )
+        ]
+        rule_df = rule_df.drop(columns=empty_columns)
+        if records:
+            updated_df = pd.DataFrame.from_records(records)
+            columns = rule_df.columns.union(updated_df.columns, sort=False)
+            updated_df = set_dtypes(
+                updated_df.reindex(columns=columns),
+                boolean_columns=boolean_rule_attributes,
+            )
+            self.rules_compute_relevance(updated_df)
+            self.rules_compute_min_cov(updated_df)
+            rule_df = pd.concat([rule_df, updated_df])
 
-        self.lic_df = pd.concat(licenses_df)
+        # The categories of the updated rules are merged, the flags of the
+        # rules without a new flag column are False, and the columns with
+        # missing values of the updated rules have the dtypes inferred as when
+        # loading all the rules
+        self.rule_df = set_dtypes(
+            rule_df.reset_index(drop=True).infer_objects(),
+            categorical_columns=categorical_rule_attributes,
+            boolean_columns=boolean_rule_attributes,
+        )
+        return rule_filenames
+
+    def get_rule_text(self, rule_filename):
+        """
+        Return the text of the rule with a `rule_filename`, read from its file.
+        """
+        text_file = os.path.join(self.rules_folder, f"{rule_filename}.RULE")
+        return models.Rule(text_file=text_file).text()
+
+    def get_license_text(self, license_filename):
+        """
+        Return the text of the license with a `license_filename`, read from its
+        file.
+        """
+        return models.License(key=license_filename, src_dir=self.licenses_folder).text
+
+    def load_texts(self):
+        """
+        Add the `text` column to the rules and licenses DataFrames, if these
+        were loaded without their texts.
+        """
+        if "text" not in self.rule_df.columns:
+            self.rule_df["text"] = [
+                self.get_rule_text(rule_filename)
+                for rule_filename in self.rule_df["rule_filename"]
+            ]
+        if "text" not in self.lic_df.columns:
+            self.lic_df["text"] = [
+                self.get_license_text(license_filename)
+                for license_filename in self.lic_df["license_filename"]
+            ]
 
     @staticmethod
     def rules_compute_relevance(rule_df, threshold=THRESHOLD_COMPUTE_RELEVANCE):
@@ -106,7 +664,7 @@ class LicenseRulesInfo:
             The threshold value, above which rules have a relevance of 100
         """
 
-        rule_df.loc[rule_df["is_false_positive"] is True, "relevance"] = 100
+        rule_df.loc[rule_df["is_false_positive"], "relevance"] = 100
 
         rule_df.loc[rule_df["words_count"] >= threshold, "relevance"] = 100
 
@@ -149,11 +707,7 @@ class LicenseRulesInfo:
         :param lic_df: pd.DataFrame
             DataFrame with all License Information.
         """
-        # Convert NaN Values in Boolean Columns to False, making it a boolean column, not object
-        self.rule_df.fillna(
-            {x: False for x in boolean_rule_attributes},
-            inplace=True
-        )
+        # The NaN Values in Boolean Columns are converted to False when loading
 
         self.rules_compute_relevance(self.rule_df)
         self.rules_compute_min_cov(self.rule_df)
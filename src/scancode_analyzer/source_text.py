@@ -0,0 +1,102 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+from array import array
+import mmap
+
+"""
+Read spans of lines of a scanned file, to suggest the exact text of a file-region
+of a license detection issue instead of consolidating the matched texts of its
+license matches.
+"""
+
+
+class SourceText:
+    """
+    The text of a scanned file, read by spans of lines.
+
+    The file is only memory-mapped when a span of lines is first read, and lines
+    are only indexed up to the last line read so far.
+    """
+
+    def __init__(self, location):
+        self.location = location
+        self.file = None
+        self.data = None
+        # Offset of the start of each line indexed so far
+        self.line_offsets = array("q", [0])
+        self.is_indexed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        """
+        Memory-map the file if not done yet.
+        """
+        if self.data is not None:
+            return
+
+        self.file = open(self.location, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be memory-mapped
+            self.data = b""
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = None
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def index_lines(self, line_number):
+        """
+        Index the offsets of lines up to the start of the line after the
+        `line_number` line, or up to the end of the file.
+        """
+        line_offsets = self.line_offsets
+        data = self.data
+        while len(line_offsets) <= line_number and not self.is_indexed:
+            newline_offset = data.find(b"\n", line_offsets[-1])
+            if newline_offset == -1:
+                self.is_indexed = True
+            else:
+                line_offsets.append(newline_offset + 1)
+
+    def get_lines_text(self, start_line, end_line):
+        """
+        Return the text of the lines from `start_line` to `end_line` included,
+        numbered from 1, or None if the file cannot be read or does not have
+        these lines.
+        """
+        try:
+            self.open()
+        except OSError:
+            return
+
+        self.index_lines(end_line)
+        line_offsets = self.line_offsets
+        if start_line < 1 or end_line < start_line or end_line > len(line_offsets):
+            return
+
+        start_offset = line_offsets[start_line - 1]
+        if end_line < len(line_offsets):
+            # Up to the newline at the end of the `end_line` line
+            end_offset = line_offsets[end_line] - 1
+        else:
+            end_offset = len(self.data)
+
+        text = self.data[start_offset:end_offset].decode("utf-8", errors="replace")
+        return text.replace("\r\n", "\n").rstrip("\r")
@@ -0,0 +1,369 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import json
+
+import attr
+from scancode.pool import get_pool
+
+from scancode_analyzer import license_analyzer
+from scancode_analyzer import summary
+from scancode_analyzer.analyzer_plugin import analyze_resource_licenses
+from scancode_analyzer.analyzer_plugin import analyze_resources_in_pool
+from scancode_analyzer.analyzer_plugin import ANALYSIS_CHUNKSIZE
+from scancode_analyzer.analyzer_plugin import attach_matched_texts
+from scancode_analyzer.analyzer_plugin import get_text_free_resource_data
+from scancode_analyzer.analyzer_plugin import MISSING_OPTIONS_MESSAGE
+from scancode_analyzer.analyzer_plugin import PENDING_CHUNKS_PER_PROCESS
+from scancode_analyzer.analyzer_plugin import restore_shared_issue_types
+
+"""
+Analyze license detection issues in an existing ScanCode JSON or JSON Lines
+results file, without loading the whole results file in memory.
+
+The "files" of the results are parsed incrementally, one file at a time, so
+that the memory used to read the results does not depend on the number of
+files in the scan.
+"""
+
+# Size of the text chunks read from a results file
+READ_CHUNK_SIZE = 1024 * 1024
+
+JSON_WHITESPACES = " \t\n\r"
+
+
+class ResultsFileError(Exception):
+    """
+    Raised when a results file cannot be parsed or analyzed.
+    """
+    pass
+
+
+class JSONStreamReader:
+    """
+    Read JSON values incrementally from a text file-like object, keeping only a
+    small buffer of text in memory.
+    """
+
+    def __init__(self, file_handler, chunk_size=READ_CHUNK_SIZE):
+        self.file_handler = file_handler
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.is_eof = False
+
+    def read_more(self, size=None):
+        """
+        Read more text in the buffer and return False if the end of file is
+        reached.
+        """
+        if self.is_eof:
+            return False
+
+        # drop the text that has already been parsed
+        if self.position:
+            self.buffer = self.buffer[self.position:]
+            self.position = 0
+
+        chunk = self.file_handler.read(size or self.chunk_size)
+        if not chunk:
+            self.is_eof = True
+            return False
+
+        self.buffer += chunk
+        return True
+
+    def peek(self):
+        """
+        Return the next non-whitespace character without consuming it or an
+        empty string at the end of the file.
+        """
+        while True:
+            buffer = self.buffer
+            position = self.position
+            length = len(buffer)
+            while position < length and buffer[position] in JSON_WHITESPACES:
+                position += 1
+            self.position = position
+            if position < length:
+                return buffer[position]
+            if not self.read_more():
+                return ""
+
+    def expect(self, characters):
+        """
+        Consume and return the next non-whitespace character, which must be one
+        of `characters`.
+        """
+        character = self.peek()
+        if not character or character not in characters:
+            raise ResultsFileError(
+                f"Invalid JSON: expected one of {characters!r} "
+                f"but found: {character!r}"
+            )
+        self.position += 1
+        return character
+
+    def read_value(self):
+        """
+        Decode and return the next JSON value.
+        """
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # a value ending with the buffer may be truncated, such as a number
+                if end < len(self.buffer) or self.is_eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.is_eof:
+                    raise ResultsFileError(f"Invalid JSON: {e}") from e
+
+            # read more text with a growing size to keep a linear time for
+            # values that span many chunks
+            self.read_more(size)
+            size *= 2
+
+    def iter_object_items(self, streamed_keys=()):
+        """
+        Yield (key, value) tuples for each item of the next JSON object.
+        The value of any key in `streamed_keys` must be an array, and it is
+        returned as an iterator of its items that must be consumed before
+        reading any further item.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.position += 1
+            return
+
+        while True:
+            key = self.read_value()
+            self.expect(":")
+            if key in streamed_keys:
+                items = self.iter_array_items()
+                yield key, items
+                # consume whatever was not consumed by the caller
+                for _item in items:
+                    pass
+            else:
+                yield key, self.read_value()
+
+            if self.expect(",}") == "}":
+                return
+
+    def iter_array_items(self):
+        """
+        Yield each item of the next JSON array.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+            return
+
+        while True:
+            yield self.read_value()
+            if self.expect(",]") == "]":
+                return
+
+
+def iter_scanned_files(location):
+    """
+    Yield a mapping of scan data for each file or directory in the ScanCode
+    results file at `location`. This file is either a JSON file with a top level
+    "files" list as created with the --json or --json-pp options, or a JSON Lines
+    file as created with the --json-lines option.
+    """
+    with open(location, encoding="utf-8") as results_file:
+        reader = JSONStreamReader(results_file)
+        # A JSON Lines results file is a sequence of objects, each with either
+        # the "headers" or a list of "files"
+        while reader.peek():
+            for key, value in reader.iter_object_items(streamed_keys=("files",)):
+                if key == "files":
+                    yield from value
+
+
+def is_analyzable_scanned_file(scanned_file):
+    """
+    Return True if a `scanned_file` mapping has all the data required for the
+    analysis.
+    """
+    return (
+        "is_license_text" in scanned_file
+        and "is_legal" in scanned_file
+        and all(
+            "matched_text" in match for match in scanned_file.get("licenses", [])
+        )
+    )
+
+
+def get_scanned_files_data(scanned_files):
+    """
+    Yield a tuple of (path, path, serialized license matches, is_license_text,
+    is_legal, location) for each of the `scanned_files` mappings that is a file
+    with detected licenses. The path is also used in place of a Resource rid to
+    identify the analysis results of a file, and the location is None as the
+    scanned files are not available.
+    Raise a ResultsFileError if the license scan or any attribute essential for
+    the analysis is missing.
+    """
+    for scanned_file in scanned_files:
+        if scanned_file.get("type", "file") != "file":
+            continue
+
+        if "licenses" not in scanned_file:
+            raise ResultsFileError(
+                "Cannot analyze scan for license detection errors, because "
+                "required attributes are missing. " + MISSING_OPTIONS_MESSAGE
+            )
+
+        license_matches_serialized = scanned_file["licenses"]
+        if not license_matches_serialized:
+            continue
+
+        if not is_analyzable_scanned_file(scanned_file):
+            raise ResultsFileError(
+                "Cannot analyze scan for license detection errors, because "
+                "required attributes are missing. " + MISSING_OPTIONS_MESSAGE
+            )
+
+        path = scanned_file.get("path")
+        yield (
+            path,
+            path,
+            license_matches_serialized,
+            scanned_file["is_license_text"],
+            scanned_file["is_legal"],
+            None,
+        )
+
+
+@attr.s
+class AnalyzedFile:
+    """
+    The license detection issues of a scanned file.
+    """
+    path = attr.ib(type=str)
+    license_detection_issues = attr.ib(factory=list)
+    scan_errors = attr.ib(factory=list)
+
+    def to_dict(self):
+        return attr.asdict(self)
+
+
+@attr.s
+class ResultsFileAnalyzer:
+    """
+    Analyze license detection issues in a stream of scanned files and summarize
+    these issues once all the files are analyzed.
+    """
+    summary_accumulator = attr.ib(factory=summary.LicenseIssuesAccumulator)
+    count_has_license = attr.ib(type=int, default=0)
+    count_files_with_issues = attr.ib(type=int, default=0)
+
+    def analyze(self, scanned_files, processes=1):
+        """
+        Yield an AnalyzedFile for each of the `scanned_files` mappings that has
+        license detection issues or analysis errors.
+        Analyze files using a pool of `processes` processes if more than one.
+        The scanned files are read in the calling thread, and only a few chunks
+        of files are read ahead of the yielded AnalyzedFile.
+        """
+        files_data = get_scanned_files_data(scanned_files)
+
+        pool = None
+        try:
+            if processes and processes > 1:
+                pool = get_pool(processes=processes)
+                # The matched texts are attached in this process, only for the
+                # file-regions with issues
+                files_analyses = analyze_resources_in_pool(
+                    pool=pool,
+                    resources=files_data,
+                    get_data=get_text_free_resource_data,
+                    analyze=analyze_resource_licenses,
+                    chunksize=ANALYSIS_CHUNKSIZE,
+                    max_pending_chunks=processes * PENDING_CHUNKS_PER_PROCESS,
+                )
+            else:
+                files_analyses = (
+                    (file_data, analyze_resource_licenses(file_data))
+                    for file_data in files_data
+                )
+
+            for file_data, analysis in files_analyses:
+                self.count_has_license += 1
+                path = analysis.rid
+
+                if analysis.error:
+                    yield AnalyzedFile(path=path, scan_errors=[analysis.error])
+                    continue
+
+                ars = analysis.license_issues
+                _rid, _path, license_matches_serialized, *_flags = file_data
+                attach_matched_texts(analysis, license_matches_serialized)
+                restore_shared_issue_types(ars, analysis.issue_type_keys)
+                if not ars:
+                    continue
+
+                self.count_files_with_issues += 1
+                self.summary_accumulator.add_issues(ars)
+                yield AnalyzedFile(
+                    path=path,
+                    license_detection_issues=[
+                        ar.to_dict(is_summary=False)
+                        for ar in ars
+                    ],
+                )
+
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+
+    def get_partial_summary(self):
+        """
+        Return a PartialSummaryLicenseIssues for all the files analyzed so far,
+        to merge with the partial summaries of other parts of a scan.
+        """
+        return summary.PartialSummaryLicenseIssues(
+            count_has_license=self.count_has_license,
+            count_files_with_issues=self.count_files_with_issues,
+            accumulator=self.summary_accumulator,
+        )
+
+    def summarize(self):
+        """
+        Return a SummaryLicenseIssues for all the files analyzed so far.
+        """
+        try:
+            return self.summary_accumulator.summarize(
+                count_has_license=self.count_has_license,
+                count_files_with_issues=self.count_files_with_issues,
+            )
+        finally:
+            license_analyzer.TOKENIZED_MATCHED_TEXTS.clear()
+
+
+def analyze_results_file(location, processes=1):
+    """
+    Analyze license detection issues in the ScanCode JSON or JSON Lines results
+    file at `location`. Return a tuple of (iterator of AnalyzedFile,
+    ResultsFileAnalyzer). The summary is available from the ResultsFileAnalyzer
+    once all the AnalyzedFile have been consumed.
+    """
+    analyzer = ResultsFileAnalyzer()
+    analyzed_files = analyzer.analyze(
+        scanned_files=iter_scanned_files(location),
+        processes=processes,
+    )
+    return analyzed_files, analyzer
@@ -10,6 +10,10 @@
 from collections import Counter
 import attr
 
+from scancode_analyzer import license_analyzer
+from scancode_analyzer.cache import as_tuple
+from scancode_analyzer.cache import CachedLicenseDetectionIssue
+
 """
 Data Format and example output of analyzer summary, having unique
 license detection issues and statistics.
@@ -68,21 +72,13 @@ class SummaryLicenseIssues:
         """
         Generate summary with Unique Issues and Statistics.
         """
-        unique_issues = UniqueIssue.get_unique_issues(
-            license_issues,
-        )
-        statistics = StatisticsLicenseIssues.generate_statistics(
-            license_issues=license_issues,
-            count_unique_issues=len(unique_issues),
+        accumulator = LicenseIssuesAccumulator()
+        accumulator.add_issues(license_issues)
+        return accumulator.summarize(
             count_has_license=count_has_license,
             count_files_with_issues=count_files_with_issues,
         )
 
-        return SummaryLicenseIssues(
-            unique_license_detection_issues=unique_issues,
-            statistics=statistics,
-        )
-
 
 @attr.s
 class StatisticsLicenseIssues:
@@ -121,51 +117,12 @@ class StatisticsLicenseIssues:
             Number of files having license detection issues
         :returns UniqueLicenseIssues: list of UniqueIssue
         """
-        issue_statistics = dict(Counter((
-            issue.issue_category for issue in license_issues
-        )))
-        issue_type_statistics = dict(Counter((
-            issue.issue_type.classification_id
-            for issue in license_issues
-        )))
-
-        flags_statistics = {
-            "license_text": sum((
-                issue.issue_type.is_license_text
-                for issue in license_issues
-            )),
-            "license_notice": sum((
-                issue.issue_type.is_license_notice
-                for issue in license_issues
-            )),
-            "license_tag": sum((
-                issue.issue_type.is_license_tag
-                for issue in license_issues
-            )),
-            "license_reference": sum((
-                issue.issue_type.is_license_reference
-                for issue in license_issues
-            )),
-        }
-
-        license_info_type_statistics = {
-            flag: count
-            for flag, count in flags_statistics.items()
-            if count
-        }
-
-        analysis_confidence_statistics = dict(Counter((
-            issue.issue_type.analysis_confidence for issue in license_issues
-        )))
-
-        return StatisticsLicenseIssues(
-            total_files_with_license=count_has_license,
-            total_files_with_license_detection_issues=count_files_with_issues,
-            total_unique_license_detection_issues=count_unique_issues,
-            issue_category_counts=issue_statistics,
-            issue_classification_id_counts=issue_type_statistics,
-            license_info_type_counts=license_info_type_statistics,
-            analysis_confidence_counts=analysis_confidence_statistics,
+        accumulator = LicenseIssuesAccumulator()
+        accumulator.add_issues(license_issues)
+        return accumulator.get_statistics(
+            count_has_license=count_has_license,
+            count_files_with_issues=count_files_with_issues,
+            count_unique_issues=count_unique_issues,
         )
 
 
@@ -198,32 +155,409 @@ class UniqueIssue:
         :param license_issues: list of LicenseDetectionIssue
         :returns UniqueLicenseIssues: list of UniqueIssue
         """
-        identifiers = get_identifiers(license_issues)
-        unique_issue_category_counts = dict(Counter(identifiers))
+        accumulator = LicenseIssuesAccumulator()
+        accumulator.add_issues(license_issues)
+        return accumulator.get_unique_issues()
+
 
-        unique_license_issues = []
-        for issue_number, (unique_issue_identifier, counts) in enumerate(
-            unique_issue_category_counts.items(), start=1,
+@attr.s
+class LicenseIssuesAccumulator:
+    """
+    Accumulate the statistics and the unique license detection issues of a scan
+    one license detection issue at a time, as each file is analyzed.
+
+    Only one representative issue and the file regions are kept for each issue
+    identifier, instead of all the LicenseDetectionIssue with their license
+    matches. The issue types are counted, and the issue types statistics are
+    computed only when summarizing, as the analysis confidence of a shared issue
+    type can be modified by any issue.
+    """
+    count_by_issue_category = attr.ib(factory=Counter)
+    # {id of IssueType: [IssueType, count]} in first occurrence order
+    counts_by_issue_type = attr.ib(factory=dict)
+    # {id of IssueType: last analysis confidence set by an issue}
+    modified_confidence_by_issue_type = attr.ib(factory=dict)
+
+    # identifiers of the unique issues, as a dict used as an ordered set
+    unique_identifiers = attr.ib(factory=dict)
+    # An issue is an occurrence of every unique issue whose identifier is either
+    # one of its two identifiers, and any of these may only become the identifier
+    # of a unique issue later, so both are tracked.
+    first_issue_by_identifier = attr.ib(factory=dict)
+    file_regions_by_identifier = attr.ib(factory=dict)
+
+    def add_issue(self, issue):
+        """
+        Add a license detection `issue` LicenseDetectionIssue.
+        """
+        self.count_by_issue_category[issue.issue_category] += 1
+
+        issue_type_count = self.counts_by_issue_type.get(id(issue.issue_type))
+        if issue_type_count is None:
+            self.counts_by_issue_type[id(issue.issue_type)] = [issue.issue_type, 1]
+        else:
+            issue_type_count[1] += 1
+
+        analysis_confidence = license_analyzer.get_modified_analysis_confidence(
+            issue.issue_category
+        )
+        if analysis_confidence:
+            self.modified_confidence_by_issue_type[id(issue.issue_type)] = (
+                analysis_confidence
+            )
+
+        identifier = issue.identifier
+        identifier_for_unknown_intro = issue.identifier_for_unknown_intro
+        issue_identifiers = [identifier]
+        # Only the issues with an unknown match have an identifier for unknown
+        # intros, with the tokens of their matched texts, which is only tracked
+        # for these issues.
+        if identifier_for_unknown_intro is not None:
+            issue_identifiers.append(identifier_for_unknown_intro)
+
+        unique_identifier = get_identifier(
+            issue, identifier, identifier_for_unknown_intro,
+        )
+        self.unique_identifiers[unique_identifier] = None
+
+        file_region = issue.file_regions[0]
+        for issue_identifier in issue_identifiers:
+            file_regions = self.file_regions_by_identifier.get(issue_identifier)
+            if file_regions is None:
+                self.file_regions_by_identifier[issue_identifier] = [file_region]
+                self.first_issue_by_identifier[issue_identifier] = issue
+            else:
+                file_regions.append(file_region)
+
+    def add_issues(self, license_issues):
+        """
+        Add each of the `license_issues` LicenseDetectionIssue.
+        """
+        for issue in license_issues:
+            self.add_issue(issue)
+
+    def merge(self, other):
+        """
+        Merge the issues of an `other` LicenseIssuesAccumulator with issues that
+        occur after the issues of this accumulator, and return this accumulator.
+        """
+        self.count_by_issue_category.update(other.count_by_issue_category)
+
+        for type_id, (issue_type, count) in other.counts_by_issue_type.items():
+            issue_type_count = self.counts_by_issue_type.get(type_id)
+            if issue_type_count is None:
+                self.counts_by_issue_type[type_id] = [issue_type, count]
+            else:
+                issue_type_count[1] += count
+        self.modified_confidence_by_issue_type.update(
+            other.modified_confidence_by_issue_type
+        )
+
+        for unique_identifier in other.unique_identifiers:
+            self.unique_identifiers[unique_identifier] = None
+
+        for identifier, file_regions in other.file_regions_by_identifier.items():
+            own_file_regions = self.file_regions_by_identifier.get(identifier)
+            if own_file_regions is None:
+                self.file_regions_by_identifier[identifier] = list(file_regions)
+                self.first_issue_by_identifier[identifier] = (
+                    other.first_issue_by_identifier[identifier]
+                )
+            else:
+                own_file_regions.extend(file_regions)
+
+        return self
+
+    def apply_analysis_confidences(self):
+        """
+        Set the analysis confidence of the shared issue types as the last issue
+        of each type did, as if all the issues were analyzed in this process.
+        """
+        for type_id, analysis_confidence in (
+            self.modified_confidence_by_issue_type.items()
         ):
-            file_regions = (
-                issue.file_regions[0]
-                for issue in license_issues
-                if unique_issue_identifier in [issue.identifier, issue.identifier_for_unknown_intro]
+            issue_type, _count = self.counts_by_issue_type[type_id]
+            issue_type.analysis_confidence = analysis_confidence
+
+    def to_dict(self):
+        """
+        Return a mapping of the issues added so far that can be serialized to
+        JSON and loaded back with `from_dict`.
+        """
+        issue_types = [
+            dict(
+                issue_type_key=license_analyzer.get_issue_type_key(issue_type),
+                count=count,
+                analysis_confidence=self.modified_confidence_by_issue_type.get(
+                    type_id
+                ),
             )
-            all_issues = (
-                issue
-                for issue in license_issues
-                if unique_issue_identifier in [issue.identifier, issue.identifier_for_unknown_intro]
+            for type_id, (issue_type, count) in self.counts_by_issue_type.items()
+        ]
+
+        # Representative issues are shared by both identifiers of an issue
+        issues = []
+        index_by_issue = {}
+        identifiers = []
+        index_by_identifier = {}
+        for identifier, issue in self.first_issue_by_identifier.items():
+            issue_index = index_by_issue.get(id(issue))
+            if issue_index is None:
+                issue_index = index_by_issue[id(issue)] = len(issues)
+                issues.append(dict(
+                    issue_type_key=license_analyzer.get_issue_type_key(
+                        issue.issue_type
+                    ),
+                    license_detection_issue=issue.to_dict(),
+                ))
+
+            index_by_identifier[identifier] = len(identifiers)
+            identifiers.append(dict(
+                identifier=identifier,
+                issue=issue_index,
+                file_regions=[
+                    attr.asdict(file_region)
+                    for file_region in self.file_regions_by_identifier[identifier]
+                ],
+            ))
+
+        return dict(
+            analyzer_version=license_analyzer.ISSUE_CASES_VERSION,
+            issue_category_counts=dict(self.count_by_issue_category),
+            issue_types=issue_types,
+            issues=issues,
+            identifiers=identifiers,
+            unique_identifiers=[
+                index_by_identifier[unique_identifier]
+                for unique_identifier in self.unique_identifiers
+            ],
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Return a LicenseIssuesAccumulator from a `data` mapping as returned by
+        `to_dict`. Raise a ValueError if this mapping was created by another
+        version of the analyzer.
+        """
+        analyzer_version = data.get("analyzer_version")
+        if analyzer_version != license_analyzer.ISSUE_CASES_VERSION:
+            raise ValueError(
+                f"Cannot load license detection issues of analyzer version: "
+                f"{analyzer_version!r}, expected version: "
+                f"{license_analyzer.ISSUE_CASES_VERSION!r}"
             )
-            unique_license_issues.append(
-                UniqueIssue.get_formatted_unique_issue(
-                    files=list(file_regions),
-                    license_issue=next(all_issues),
-                    unique_identifier=issue_number,
+
+        accumulator = cls(
+            count_by_issue_category=Counter(data["issue_category_counts"]),
+        )
+
+        for issue_type_data in data["issue_types"]:
+            issue_type = license_analyzer.ISSUE_TYPES_BY_CLASSIFICATION[
+                issue_type_data["issue_type_key"]
+            ]
+            accumulator.counts_by_issue_type[id(issue_type)] = [
+                issue_type, issue_type_data["count"],
+            ]
+            if issue_type_data["analysis_confidence"]:
+                accumulator.modified_confidence_by_issue_type[id(issue_type)] = (
+                    issue_type_data["analysis_confidence"]
                 )
+
+        issues = [
+            CachedLicenseDetectionIssue(
+                issue_category=issue_data["license_detection_issue"]["issue_category"],
+                issue_type=license_analyzer.ISSUE_TYPES_BY_CLASSIFICATION[
+                    issue_data["issue_type_key"]
+                ],
+                license_detection_issue=issue_data["license_detection_issue"],
             )
+            for issue_data in data["issues"]
+        ]
+
+        identifiers = []
+        for identifier_data in data["identifiers"]:
+            identifier = as_tuple(identifier_data["identifier"])
+            identifiers.append(identifier)
+            accumulator.first_issue_by_identifier[identifier] = (
+                issues[identifier_data["issue"]]
+            )
+            accumulator.file_regions_by_identifier[identifier] = [
+                license_analyzer.FileRegion(**file_region)
+                for file_region in identifier_data["file_regions"]
+            ]
+
+        for identifier_index in data["unique_identifiers"]:
+            accumulator.unique_identifiers[identifiers[identifier_index]] = None
 
-        return unique_license_issues
+        return accumulator
+
+    def get_unique_issues(self):
+        """
+        Return a list of UniqueIssue in the order of their first occurrence.
+        """
+        return [
+            UniqueIssue.get_formatted_unique_issue(
+                files=self.file_regions_by_identifier[unique_identifier],
+                license_issue=self.first_issue_by_identifier[unique_identifier],
+                unique_identifier=issue_number,
+            )
+            for issue_number, unique_identifier in enumerate(
+                self.unique_identifiers, start=1,
+            )
+        ]
+
+    def get_statistics(
+        self, count_has_license, count_files_with_issues, count_unique_issues=None,
+    ):
+        """
+        Return a StatisticsLicenseIssues for the issues added so far.
+
+        :param count_has_license int:
+            Number of files having license information
+        :param count_files_with_issues: int
+            Number of files having license detection issues
+        :param count_unique_issues: int
+            Number of unique license detection issues, computed if None
+        """
+        if count_unique_issues is None:
+            count_unique_issues = len(self.unique_identifiers)
+
+        issue_type_statistics = Counter()
+        analysis_confidence_statistics = Counter()
+        flags_statistics = {
+            "license_text": 0,
+            "license_notice": 0,
+            "license_tag": 0,
+            "license_reference": 0,
+        }
+        for issue_type, count in self.counts_by_issue_type.values():
+            issue_type_statistics[issue_type.classification_id] += count
+            analysis_confidence_statistics[issue_type.analysis_confidence] += count
+            flags_statistics["license_text"] += issue_type.is_license_text * count
+            flags_statistics["license_notice"] += issue_type.is_license_notice * count
+            flags_statistics["license_tag"] += issue_type.is_license_tag * count
+            flags_statistics["license_reference"] += (
+                issue_type.is_license_reference * count
+            )
+
+        license_info_type_statistics = {
+            flag: count
+            for flag, count in flags_statistics.items()
+            if count
+        }
+
+        return StatisticsLicenseIssues(
+            total_files_with_license=count_has_license,
+            total_files_with_license_detection_issues=count_files_with_issues,
+            total_unique_license_detection_issues=count_unique_issues,
+            issue_category_counts=dict(self.count_by_issue_category),
+            issue_classification_id_counts=dict(issue_type_statistics),
+            license_info_type_counts=license_info_type_statistics,
+            analysis_confidence_counts=dict(analysis_confidence_statistics),
+        )
+
+    def summarize(self, count_has_license, count_files_with_issues, timings=None):
+        """
+        Return a SummaryLicenseIssues with the unique issues and statistics of
+        the issues added so far. Collect the timings of the summary stages in a
+        `timings` AnalysisTimings, if any.
+        """
+        if timings is not None:
+            start = timings.start()
+
+        unique_issues = self.get_unique_issues()
+        if timings is not None:
+            start = timings.add_time("summary:unique_issues", start)
+            timings.count("unique_issues", len(unique_issues))
+
+        statistics = self.get_statistics(
+            count_has_license=count_has_license,
+            count_files_with_issues=count_files_with_issues,
+            count_unique_issues=len(unique_issues),
+        )
+        if timings is not None:
+            timings.add_time("summary:statistics", start)
+
+        return SummaryLicenseIssues(
+            unique_license_detection_issues=unique_issues,
+            statistics=statistics,
+        )
+
+
+@attr.s
+class PartialSummaryLicenseIssues:
+    """
+    Partial summary of the License Detection Issues of a part of a scan, such as
+    a shard of a scan analyzed on another machine. The partial summaries of all
+    the parts of a scan are merged in the order of these parts to summarize the
+    whole scan, exactly as if the whole scan was analyzed at once.
+    """
+    count_has_license = attr.ib(type=int, default=0)
+    count_files_with_issues = attr.ib(type=int, default=0)
+    accumulator = attr.ib(factory=LicenseIssuesAccumulator)
+
+    def merge(self, other):
+        """
+        Merge an `other` PartialSummaryLicenseIssues of the part of a scan which
+        is after the part of this partial summary, and return this partial
+        summary.
+        """
+        self.count_has_license += other.count_has_license
+        self.count_files_with_issues += other.count_files_with_issues
+        self.accumulator.merge(other.accumulator)
+        return self
+
+    def summarize(self):
+        """
+        Return a SummaryLicenseIssues for this partial summary.
+        """
+        self.accumulator.apply_analysis_confidences()
+        return self.accumulator.summarize(
+            count_has_license=self.count_has_license,
+            count_files_with_issues=self.count_files_with_issues,
+        )
+
+    def to_dict(self):
+        return dict(
+            total_files_with_license=self.count_has_license,
+            total_files_with_license_detection_issues=self.count_files_with_issues,
+            license_detection_issues=self.accumulator.to_dict(),
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            count_has_license=data["total_files_with_license"],
+            count_files_with_issues=data["total_files_with_license_detection_issues"],
+            accumulator=LicenseIssuesAccumulator.from_dict(
+                data["license_detection_issues"]
+            ),
+        )
+
+
+def merge_partial_summaries(partial_summaries):
+    """
+    Return a PartialSummaryLicenseIssues merging the `partial_summaries` list of
+    PartialSummaryLicenseIssues, in the order of the parts of a scan.
+    """
+    merged = PartialSummaryLicenseIssues()
+    for partial_summary in partial_summaries:
+        merged.merge(partial_summary)
+    return merged
+
+
+def get_identifier(issue, identifier, identifier_for_unknown_intro):
+    """
+    Return the identifier used to find the unique issues from a license detection
+    `issue` and its `identifier` and `identifier_for_unknown_intro`.
+
+    :param issue: LicenseDetectionIssue
+    """
+    if issue.issue_category != "unknown-match":
+        return identifier
+    else:
+        return identifier_for_unknown_intro
 
 
 def get_identifiers(license_issues):
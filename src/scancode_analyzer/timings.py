@@ -0,0 +1,75 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+from collections import Counter
+from time import perf_counter
+
+import attr
+
+"""
+Cumulative timings and counters of the stages of the license detection issues
+analysis.
+
+These are only collected when an AnalysisTimings is passed to the analysis
+functions, which otherwise only check that their `timings` argument is None.
+"""
+
+# Number of decimals of the reported timings in seconds
+TIMINGS_PRECISION = 6
+
+
+@attr.s
+class AnalysisTimings:
+    """
+    Cumulative timings in seconds and counters of the stages of the analysis.
+    These are collected in each worker process for each file, and merged in the
+    main process.
+    """
+    # {stage name: cumulative time in seconds}
+    timings = attr.ib(factory=Counter)
+    # {counter name: cumulative count}
+    counters = attr.ib(factory=Counter)
+
+    @staticmethod
+    def start():
+        """
+        Return a start time to pass to `add_time`.
+        """
+        return perf_counter()
+
+    def add_time(self, stage, start):
+        """
+        Add the time elapsed since a `start` time to the `stage` timing, and
+        return the current time, to use as the start time of a next stage.
+        """
+        now = perf_counter()
+        self.timings[stage] += now - start
+        return now
+
+    def count(self, counter, value=1):
+        """
+        Add `value` to the `counter` counter.
+        """
+        self.counters[counter] += value
+
+    def merge(self, other):
+        """
+        Add the timings and counters of an `other` AnalysisTimings to this one.
+        """
+        self.timings.update(other.timings)
+        self.counters.update(other.counters)
+
+    def to_dict(self):
+        return dict(
+            timings={
+                stage: round(seconds, TIMINGS_PRECISION)
+                for stage, seconds in sorted(self.timings.items())
+            },
+            counters=dict(sorted(self.counters.items())),
+        )
@@ -0,0 +1,38 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+from commoncode.resource import VirtualCodebase
+
+from scancode_analyzer.analyzer_plugin import ResultsAnalyzer
+
+
+def create_analyzer_codebase(input_json):
+    """
+    Return a VirtualCodebase from `input_json` with the analyzer plugin codebase
+    and resource attributes.
+    """
+    return VirtualCodebase(
+        input_json,
+        codebase_attributes=dict(ResultsAnalyzer.codebase_attributes),
+        resource_attributes=dict(ResultsAnalyzer.resource_attributes),
+    )
+
+
+def analyze_codebase(input_json, **kwargs):
+    """
+    Return a tuple of (list of (path, license_detection_issues), summary mapping)
+    for the analysis of the VirtualCodebase at `input_json` with `kwargs` options.
+    """
+    codebase = create_analyzer_codebase(input_json)
+    ResultsAnalyzer().process_codebase(codebase=codebase, **kwargs)
+    issues = [
+        (resource.path, resource.license_detection_issues)
+        for resource in codebase.walk()
+    ]
+    return issues, dict(codebase.attributes.license_detection_issues_summary)
@@ -9,6 +9,12 @@
 
 import os
 import json
+import pickle
+import pstats
+import subprocess
+import sys
+import threading
+from unittest import mock
 
 import attr
 
@@ -19,11 +25,18 @@ from commoncode.resource import build_attributes_defs
 from scancode.cli_test_utils import check_json_scan
 from scancode.cli_test_utils import run_scan_click
 
+from analyzer_codebase import analyze_codebase
+from analyzer_codebase import create_analyzer_codebase
 from file_io import load_json
+from scancode_analyzer import analyzer_plugin
+from scancode_analyzer import license_analyzer
+from scancode_analyzer.analyzer_plugin import CORRECT_DETECTION_FILES_COUNTER
 from scancode_analyzer.analyzer_plugin import is_analyzable
 from scancode_analyzer.analyzer_plugin import ResultsAnalyzer
 from scancode_analyzer.analyzer_plugin import MISSING_OPTIONS_MESSAGE
+from scancode_analyzer.analyzer_plugin import get_license_keys_count
 from scancode_analyzer.analyzer_plugin import LicenseMatch
+from scancode_analyzer.analyzer_plugin import RULE_INDEX
 from scancode_analyzer.analyzer_plugin import ScancodeDataChangedError
 
 
@@ -57,6 +70,31 @@ class TestAnalyzerPlugin(FileBasedTesting):
             regen=False,
         )
 
+    def test_analyze_results_plugin_with_source_text(self):
+        test_dir = self.get_test_loc("scan-files/")
+        result_file = self.get_temp_file("json")
+        args = [
+            "--license",
+            "--info",
+            "--license-text",
+            "--is-license-text",
+            "--classify",
+            test_dir,
+            "--json-pp",
+            result_file,
+            "--analyze-license-results",
+            "--analyze-license-results-source-text",
+        ]
+        run_scan_click(args)
+        # The issues of these files have a single license match, with the same
+        # suggested matched text
+        check_json_scan(
+            self.get_test_loc("results_analyzer_expected.json"),
+            result_file,
+            remove_file_date=True,
+            regen=False,
+        )
+
     def test_analyze_results_plugin_load_from_json_analyze(self):
 
         input_json = self.get_test_loc("sample_files_result.json")
@@ -76,6 +114,270 @@ class TestAnalyzerPlugin(FileBasedTesting):
             regen=False,
         )
 
+    def test_analyze_results_plugin_load_from_json_analyze_with_processes(self):
+
+        input_json = self.get_test_loc("sample_files_result.json")
+        result_file = self.get_temp_file("json")
+        args = [
+            "--from-json",
+            input_json,
+            "--json-pp",
+            result_file,
+            "--analyze-license-results",
+            "--processes",
+            "2",
+        ]
+        run_scan_click(args)
+        check_json_scan(
+            self.get_test_loc(
+                "results_analyzer_from_sample_json_expected.json"),
+            result_file,
+            regen=False,
+        )
+
+    def test_analyze_results_plugin_with_timings_and_profile(self):
+        input_json = self.get_test_loc("sample_files_result.json")
+        result_file = self.get_temp_file("json")
+        profile_file = self.get_temp_file("prof")
+        args = [
+            "--from-json",
+            input_json,
+            "--json-pp",
+            result_file,
+            "--analyze-license-results",
+            "--analyze-license-results-timings",
+            "--analyze-license-results-profile",
+            profile_file,
+        ]
+        run_scan_click(args)
+
+        results = load_json(result_file)
+        statistics = results["license_detection_issues_summary"]["statistics"]
+        timings = results["license_detection_issues_timings"]
+        counters = timings["counters"]
+        assert counters["files"] == statistics["total_files_with_license"]
+        assert counters["files_with_issues"] == (
+            statistics["total_files_with_license_detection_issues"]
+        )
+        issue_category_counts = {
+            counter.partition(":")[2]: count
+            for counter, count in counters.items()
+            if counter.startswith("issues:")
+        }
+        assert issue_category_counts == statistics["issue_category_counts"]
+        assert counters["matched_text_bytes"] > 0
+        assert set(timings["timings"]) >= {
+            "convert_license_matches",
+            "group_matches",
+            "analyze_regions",
+            "format_issues",
+            "summary:add_issues",
+            "summary:unique_issues",
+        }
+
+        stats = pstats.Stats(profile_file)
+        assert stats.total_calls
+
+    def test_analyze_results_plugin_without_timings(self):
+        input_json = self.get_test_loc("sample_files_result.json")
+        result_file = self.get_temp_file("json")
+        args = [
+            "--from-json",
+            input_json,
+            "--json-pp",
+            result_file,
+            "--analyze-license-results",
+        ]
+        run_scan_click(args)
+        assert "license_detection_issues_timings" not in load_json(result_file)
+
+    def test_process_codebase_with_processes_is_same_as_serial(self):
+        input_json = self.get_test_loc(
+            "sample_files_result_same_unique_issues.json")
+
+        serial_issues, serial_summary = analyze_codebase(input_json)
+        parallel_issues, parallel_summary = analyze_codebase(
+            input_json, processes=3)
+
+        assert parallel_issues == serial_issues
+        assert parallel_summary == serial_summary
+
+    def test_process_codebase_with_processes_reads_resources_in_main_thread(self):
+        input_json = self.get_test_loc(
+            "sample_files_result_same_unique_issues.json")
+        codebase = create_analyzer_codebase(input_json)
+        threads = []
+        original_get_resource_data = analyzer_plugin.get_resource_data
+
+        def get_resource_data(resource, **kwargs):
+            threads.append(threading.current_thread())
+            return original_get_resource_data(resource, **kwargs)
+
+        with mock.patch.object(
+            analyzer_plugin, "get_resource_data", side_effect=get_resource_data,
+        ), mock.patch.object(analyzer_plugin, "ANALYSIS_CHUNKSIZE", 1):
+            ResultsAnalyzer().process_codebase(codebase=codebase, processes=2)
+
+        assert threads
+        assert set(threads) == {threading.main_thread()}
+
+    def test_analyze_resources_in_pool_reads_bounded_chunks(self):
+        pool = mock.Mock()
+        read = []
+
+        def get_data(resource):
+            read.append(resource)
+            return resource
+
+        def map_async(function, resources_data, chunksize):
+            result = mock.Mock()
+            result.get.return_value = [function(data) for data in resources_data]
+            return result
+
+        pool.map_async.side_effect = map_async
+        analyses = analyzer_plugin.analyze_resources_in_pool(
+            pool=pool,
+            resources=range(10),
+            get_data=get_data,
+            analyze=str,
+            chunksize=3,
+            max_pending_chunks=2,
+        )
+
+        assert next(analyses) == (0, "0")
+        assert read == list(range(6))
+        assert list(analyses) == [(number, str(number)) for number in range(1, 10)]
+        assert pool.map_async.call_count == 4
+
+    def test_analyze_resource_licenses_without_matched_texts(self):
+        input_json = self.get_test_loc(
+            "sample_files_result_same_unique_issues.json")
+        codebase = create_analyzer_codebase(input_json)
+
+        for resource in analyzer_plugin.get_analyzable_resources(codebase):
+            expected = analyzer_plugin.analyze_resource_licenses(
+                analyzer_plugin.get_resource_data(resource)
+            )
+
+            resource_data = analyzer_plugin.get_resource_data(
+                resource, with_matched_text=False,
+            )
+            _rid, _path, license_matches_serialized, *_flags = resource_data
+            assert not any(
+                "matched_text" in license_match
+                for license_match in license_matches_serialized
+            )
+            analysis = analyzer_plugin.analyze_resource_licenses(resource_data)
+            analyzer_plugin.attach_matched_texts(analysis, resource.licenses)
+
+            results = [ar.to_dict(is_summary=False) for ar in analysis.license_issues]
+            assert results == [
+                ar.to_dict(is_summary=False) for ar in expected.license_issues
+            ]
+
+    def test_process_codebase_with_summary_only(self):
+        input_json = self.get_test_loc(
+            "sample_files_result_same_unique_issues.json")
+
+        _issues, expected_summary = analyze_codebase(input_json)
+        issues, summary = analyze_codebase(
+            input_json, analyze_license_results_summary_only=True)
+
+        assert not any(
+            license_detection_issues for _path, license_detection_issues in issues
+        )
+        assert summary == expected_summary
+
+    def test_process_codebase_counts_correct_detection_files(self):
+        input_json = self.get_test_loc("sample_files_result.json")
+        codebase = create_analyzer_codebase(input_json)
+        with mock.patch.object(
+            LicenseMatch,
+            "from_files_licenses",
+            side_effect=LicenseMatch.from_files_licenses,
+        ) as from_files_licenses:
+            ResultsAnalyzer().process_codebase(codebase=codebase)
+
+        assert codebase.counters[CORRECT_DETECTION_FILES_COUNTER] == 1
+        summary = codebase.attributes.license_detection_issues_summary
+        assert (
+            from_files_licenses.call_count
+            == summary["statistics"]["total_files_with_license"] - 1
+        )
+
+    def test_process_codebase_saves_only_resources_with_changed_issues(self):
+        input_json = self.get_test_loc("sample_files_result.json")
+        codebase = create_analyzer_codebase(input_json)
+
+        with mock.patch.object(
+            VirtualCodebase,
+            "save_resource",
+            autospec=True,
+            side_effect=VirtualCodebase.save_resource,
+        ) as save_resource:
+            ResultsAnalyzer().process_codebase(codebase=codebase)
+
+        saved_paths = [
+            resource.path
+            for _codebase, resource in (
+                call.args for call in save_resource.call_args_list
+            )
+        ]
+
+        expected = [
+            resource.path
+            for resource in codebase.walk()
+            if resource.license_detection_issues
+        ]
+        assert saved_paths == expected
+        assert len(expected) == 2
+
+    def test_analyze_results_plugin_with_summary_only_has_no_file_issues(self):
+        input_json = self.get_test_loc("sample_files_result.json")
+        result_file = self.get_temp_file("json")
+        args = [
+            "--from-json",
+            input_json,
+            "--json-pp",
+            result_file,
+            "--analyze-license-results",
+            "--analyze-license-results-summary-only",
+        ]
+        run_scan_click(args)
+        results = load_json(result_file)
+        assert results["license_detection_issues_summary"]
+        assert results["files"]
+        assert not any(
+            "license_detection_issues" in scanned_file
+            for scanned_file in results["files"]
+        )
+
+    @staticmethod
+    def test_analyzer_plugin_import_does_not_import_analysis_modules():
+        # Run in a fresh process, as the tests import these modules
+        code = (
+            "import sys\n"
+            "import scancode_analyzer.analyzer_plugin\n"
+            "deferred = ['scancode_analyzer.license_analyzer', "
+            "'scancode_analyzer.summary', 'scancode_analyzer.cache', 'sqlite3', "
+            "'license_expression', 'scancode.api']\n"
+            "print([module for module in deferred if module in sys.modules])\n"
+        )
+        output = subprocess.check_output(
+            [sys.executable, "-c", code],
+            universal_newlines=True,
+        )
+        assert output.strip() == "[]"
+
+    @staticmethod
+    def test_analysis_cache_max_entries_is_the_cache_default():
+        from scancode_analyzer import cache
+
+        assert (
+            analyzer_plugin.ANALYSIS_CACHE_MAX_ENTRIES
+            == cache.DEFAULT_CACHE_MAX_ENTRIES
+        )
+
     @staticmethod
     def test_is_analyzable_returns_true_if_all_attributes_are_present():
         data = {
@@ -220,7 +522,7 @@ class TestLicenseMatch(FileBasedTesting):
         license_matches_serialized = load_json(test_file)
         license_matches = LicenseMatch.from_files_licenses(
             license_matches_serialized)
-        results = list(map(attr.asdict, license_matches))
+        results = [license_match.to_dict() for license_match in license_matches]
         expected_file = test_file + "-expected"
         if regen:
             expected = results
@@ -276,3 +578,72 @@ class TestLicenseMatch(FileBasedTesting):
         license_matches = LicenseMatch.from_files_licenses(
             license_matches_serialized)
         assert len(license_matches) == 4
+
+    @staticmethod
+    def test_get_license_keys_count():
+        assert get_license_keys_count("mit") == 1
+        assert get_license_keys_count("gpl-2.0 OR mit") == 2
+        assert get_license_keys_count("(mit AND bsd-new) OR mit") == 2
+
+        hits = get_license_keys_count.cache_info().hits
+        assert get_license_keys_count("gpl-2.0 OR mit") == 2
+        assert get_license_keys_count.cache_info().hits == hits + 1
+
+    def test_from_files_license_matches_are_compact(self):
+        test_file = self.get_test_loc(
+            "from_files_license_multiple_match_simple_many.json"
+        )
+        license_matches = LicenseMatch.from_files_licenses(
+            load_json(test_file))
+        other_license_matches = LicenseMatch.from_files_licenses(
+            load_json(test_file))
+
+        license_match = license_matches[0]
+        assert not hasattr(license_match, "__dict__")
+        try:
+            license_match.score = 0
+            self.fail(msg="Exception not raised")
+        except attr.exceptions.FrozenInstanceError:
+            pass
+
+        other_license_match = other_license_matches[0]
+        assert license_match == other_license_match
+        assert (
+            license_match.rule_identifier is other_license_match.rule_identifier
+        )
+        assert (
+            license_match.license_expression
+            is other_license_match.license_expression
+        )
+        assert license_match.matcher is other_license_match.matcher
+
+    def test_from_files_license_matches_share_rules_from_the_rule_index(self):
+        test_file = self.get_test_loc(
+            "from_files_license_multiple_match_simple_many.json"
+        )
+        license_matches_serialized = load_json(test_file)
+        license_matches = LicenseMatch.from_files_licenses(
+            license_matches_serialized)
+        other_license_matches = LicenseMatch.from_files_licenses(
+            license_matches_serialized)
+
+        for license_match, other_license_match, license_match_serialized in zip(
+            license_matches, other_license_matches, license_matches_serialized,
+        ):
+            assert license_match.rule_id == other_license_match.rule_id
+            assert license_match.rule is RULE_INDEX.rules[license_match.rule_id]
+            matched_rule = license_match_serialized["matched_rule"]
+            assert license_match.rule_identifier == matched_rule["identifier"]
+            assert license_match.rule_length == matched_rule["rule_length"]
+            assert license_match.rule_features == (
+                license_analyzer.get_license_match_features(license_match.rule)
+            )
+
+    def test_license_match_is_pickled_with_its_rule_and_matched_text(self):
+        test_file = self.get_test_loc("from_files_license_one_match.json")
+        [license_match] = LicenseMatch.from_files_licenses(load_json(test_file))
+
+        unpickled = pickle.loads(pickle.dumps(license_match))
+        assert unpickled.matched_text == license_match.matched_text
+        assert unpickled.rule_id == license_match.rule_id
+        assert unpickled.to_dict() == license_match.to_dict()
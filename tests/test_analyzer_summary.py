@@ -7,7 +7,9 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+from collections import Counter
 import attr
+import json
 import os
 
 from commoncode.testcase import FileBasedTesting
@@ -16,9 +18,13 @@ from scancode.cli_test_utils import check_json_scan
 from scancode.cli_test_utils import run_scan_click
 
 from scancode_analyzer import license_analyzer
+from scancode_analyzer import stream_analyzer
 from file_io import load_json
 
 from scancode_analyzer.analyzer_plugin import LicenseMatch
+from scancode_analyzer.summary import LicenseIssuesAccumulator
+from scancode_analyzer.summary import merge_partial_summaries
+from scancode_analyzer.summary import PartialSummaryLicenseIssues
 from scancode_analyzer.summary import SummaryLicenseIssues
 from scancode_analyzer.summary import StatisticsLicenseIssues
 from scancode_analyzer.summary import UniqueIssue
@@ -192,6 +198,36 @@ class TestUniqueIssue(FileBasedTesting):
         unique_issues = UniqueIssue.get_unique_issues(all_issues)
         assert len(unique_issues) == 3
 
+    def test_analyzer_summary_get_unique_issues_same_as_rescanning_all_issues(self):
+
+        for test_file in (
+            "multiple_files_mixed_issues_2.json",
+            "multiple_files_unknown_intro.json",
+        ):
+            input_json = self.get_test_loc(test_file)
+            all_issues = get_all_license_issues_in_codebase(input_json)
+            unique_issues = UniqueIssue.get_unique_issues(all_issues)
+
+            expected = []
+            for unique_identifier in dict.fromkeys(get_identifiers(all_issues)):
+                occurrences = [
+                    issue for issue in all_issues
+                    if unique_identifier in [
+                        issue.identifier, issue.identifier_for_unknown_intro]
+                ]
+                expected.append(
+                    (
+                        occurrences[0].to_dict(),
+                        [issue.file_regions[0] for issue in occurrences],
+                    )
+                )
+
+            results = [
+                (unique_issue.license_detection_issue, unique_issue.files)
+                for unique_issue in unique_issues
+            ]
+            assert results == expected
+
     def test_analyzer_summary_get_formatted_unique_issue(self):
         input_json = self.get_test_loc("one_issue.json")
         [issue] = get_all_license_issues_in_codebase(input_json)
@@ -209,6 +245,148 @@ class TestUniqueIssue(FileBasedTesting):
             unique_issue.license_detection_issue['original_licenses']) == 1
 
 
+class TestLicenseIssuesAccumulator(FileBasedTesting):
+    test_data_dir = os.path.join(
+        os.path.dirname(__file__),
+        "data/analyzer-summary/"
+    )
+
+    def test_license_issues_accumulator_statistics_same_as_counting_all_issues(self):
+        input_json = self.get_test_loc("multiple_files_mixed_issues_2.json")
+        all_issues = get_all_license_issues_in_codebase(input_json)
+
+        accumulator = LicenseIssuesAccumulator()
+        for issue in all_issues:
+            accumulator.add_issue(issue)
+        statistics = accumulator.get_statistics(
+            count_has_license=5, count_files_with_issues=4)
+
+        assert statistics.total_unique_license_detection_issues == len(
+            UniqueIssue.get_unique_issues(all_issues))
+        assert statistics.issue_category_counts == dict(Counter(
+            issue.issue_category for issue in all_issues))
+        assert statistics.issue_classification_id_counts == dict(Counter(
+            issue.issue_type.classification_id for issue in all_issues))
+        assert statistics.analysis_confidence_counts == dict(Counter(
+            issue.issue_type.analysis_confidence for issue in all_issues))
+        assert sum(statistics.license_info_type_counts.values()) == len(
+            all_issues)
+
+    def test_license_issues_accumulator_summary_same_as_summarize(self):
+        input_json = self.get_test_loc("multiple_files_unknown_intro.json")
+        all_issues = get_all_license_issues_in_codebase(input_json)
+
+        accumulator = LicenseIssuesAccumulator()
+        for issue in all_issues:
+            accumulator.add_issue(issue)
+        summary = accumulator.summarize(
+            count_has_license=3, count_files_with_issues=3)
+
+        expected = SummaryLicenseIssues.summarize(all_issues, 3, 3)
+        assert summary.to_dict() == expected.to_dict()
+
+    def test_license_issues_accumulator_only_tracks_unknown_intros_of_unknown_matches(self):
+        input_json = self.get_test_loc("multiple_files_mixed_issues_2.json")
+        all_issues = get_all_license_issues_in_codebase(input_json)
+
+        accumulator = LicenseIssuesAccumulator()
+        accumulator.add_issues(all_issues)
+
+        expected = set()
+        for issue in all_issues:
+            expected.add(issue.identifier)
+            if license_analyzer.has_unknown_matches(issue.original_licenses):
+                expected.add(issue.identifier_for_unknown_intro)
+            else:
+                assert issue.identifier_for_unknown_intro is None
+        assert set(accumulator.file_regions_by_identifier) == expected
+        assert set(accumulator.first_issue_by_identifier) == expected
+        assert any(
+            not license_analyzer.has_unknown_matches(issue.original_licenses)
+            for issue in all_issues
+        )
+
+
+class TestPartialSummaryLicenseIssues(FileBasedTesting):
+    test_data_dir = os.path.join(
+        os.path.dirname(__file__),
+        "data/analyzer-summary/"
+    )
+
+    def get_scanned_files(self):
+        scanned_files = []
+        for test_file in (
+            "multiple_files_mixed_issues_1.json",
+            "multiple_files_unknown_intro.json",
+            "multiple_files_same_issues_socat.json",
+            "multiple_files_mixed_issues_2.json",
+            "multiple_files_unknown_intro_same_tokenized_text.json",
+        ):
+            scanned_files.extend(load_json(self.get_test_loc(test_file))["files"])
+        return scanned_files
+
+    def get_partial_summary(self, scanned_files):
+        """
+        Return a PartialSummaryLicenseIssues loaded back from JSON for the
+        analysis of the `scanned_files` list of mappings.
+        """
+        analyzer = stream_analyzer.ResultsFileAnalyzer()
+        for _analyzed_file in analyzer.analyze(scanned_files):
+            pass
+        partial_summary = json.loads(json.dumps(
+            analyzer.get_partial_summary().to_dict()
+        ))
+        return PartialSummaryLicenseIssues.from_dict(partial_summary)
+
+    def test_merged_partial_summaries_same_as_summary(self):
+        scanned_files = self.get_scanned_files()
+
+        analyzer = stream_analyzer.ResultsFileAnalyzer()
+        for _analyzed_file in analyzer.analyze(scanned_files):
+            pass
+        expected = analyzer.summarize().to_dict()
+
+        for shard_size in (1, 4, 7, len(scanned_files)):
+            partial_summaries = [
+                self.get_partial_summary(scanned_files[start:start + shard_size])
+                for start in range(0, len(scanned_files), shard_size)
+            ]
+            merged = merge_partial_summaries(partial_summaries)
+            assert merged.summarize().to_dict() == expected
+
+    def test_merge_partial_summaries_is_associative(self):
+        scanned_files = self.get_scanned_files()
+        first, second, third = (
+            scanned_files[:5], scanned_files[5:12], scanned_files[12:],
+        )
+
+        left = merge_partial_summaries([
+            merge_partial_summaries([
+                self.get_partial_summary(first),
+                self.get_partial_summary(second),
+            ]),
+            self.get_partial_summary(third),
+        ])
+        right = merge_partial_summaries([
+            self.get_partial_summary(first),
+            merge_partial_summaries([
+                self.get_partial_summary(second),
+                self.get_partial_summary(third),
+            ]),
+        ])
+        assert left.to_dict() == right.to_dict()
+
+    @staticmethod
+    def test_partial_summary_from_dict_raise_exception_for_other_version():
+        partial_summary = PartialSummaryLicenseIssues().to_dict()
+        partial_summary["license_detection_issues"]["analyzer_version"] = 0
+        try:
+            PartialSummaryLicenseIssues.from_dict(partial_summary)
+            raise Exception("Exception not raised")
+        except ValueError:
+            pass
+
+
 class TestGetIdentifiers(FileBasedTesting):
     test_data_dir = os.path.join(
         os.path.dirname(__file__),
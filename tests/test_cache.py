@@ -0,0 +1,129 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import os
+import sqlite3
+
+from commoncode.testcase import FileBasedTesting
+
+from analyzer_codebase import analyze_codebase
+from scancode_analyzer import cache
+
+
+class TestAnalysisCache(FileBasedTesting):
+    test_data_dir = os.path.join(
+        os.path.dirname(__file__),
+        "data/analyzer-plugins/"
+    )
+
+    def check_cached_analysis_is_same_as_uncached(self, input_json, processes=1):
+        input_json = self.get_test_loc(input_json)
+        cache_location = os.path.join(self.get_temp_dir(), "cache.sqlite")
+
+        expected_issues, expected_summary = analyze_codebase(input_json)
+
+        issues, summary = analyze_codebase(
+            input_json,
+            processes=processes,
+            analyze_license_results_cache=cache_location,
+        )
+        first_run_statistics = summary.pop("analysis_cache")
+        assert issues == expected_issues
+        assert summary == expected_summary
+        assert first_run_statistics["misses"]
+
+        issues, summary = analyze_codebase(
+            input_json,
+            processes=processes,
+            analyze_license_results_cache=cache_location,
+        )
+        statistics = summary.pop("analysis_cache")
+        assert issues == expected_issues
+        assert summary == expected_summary
+        assert statistics == dict(
+            hits=first_run_statistics["hits"] + first_run_statistics["misses"],
+            misses=0,
+            evictions=0,
+        )
+
+    def test_cached_analysis_is_same_as_uncached(self):
+        self.check_cached_analysis_is_same_as_uncached(
+            "sample_files_result.json")
+
+    def test_cached_analysis_is_same_as_uncached_with_unique_issues(self):
+        self.check_cached_analysis_is_same_as_uncached(
+            "sample_files_result_same_unique_issues.json")
+
+    def test_cached_analysis_is_same_as_uncached_with_processes(self):
+        self.check_cached_analysis_is_same_as_uncached(
+            "sample_files_result_same_unique_issues.json", processes=3)
+
+    def test_analysis_cache_evicts_least_recently_used_entries(self):
+        input_json = self.get_test_loc("sample_files_result.json")
+        cache_location = os.path.join(self.get_temp_dir(), "cache.sqlite")
+
+        _issues, summary = analyze_codebase(
+            input_json,
+            analyze_license_results_cache=cache_location,
+            analyze_license_results_cache_size=1,
+        )
+        statistics = summary["analysis_cache"]
+        # One of the files has only correct license detections, which are found
+        # without a full analysis and are not cached
+        assert statistics["misses"] == 2
+        assert statistics["evictions"] == 1
+
+        analysis_cache = cache.AnalysisCache(location=cache_location)
+        try:
+            [(count,)] = analysis_cache.connection.execute(
+                "SELECT COUNT(*) FROM license_detection_issues")
+        finally:
+            analysis_cache.close()
+        assert count == 1
+
+    def test_analysis_cache_commits_and_evicts_every_commit_interval(self):
+        cache_location = os.path.join(self.get_temp_dir(), "cache.sqlite")
+        analysis_cache = cache.AnalysisCache(
+            location=cache_location, max_entries=2, commit_interval=3,
+        )
+
+        def get_committed_keys():
+            connection = sqlite3.connect(cache_location)
+            try:
+                return sorted(key for key, in connection.execute(
+                    "SELECT key FROM license_detection_issues"))
+            finally:
+                connection.close()
+
+        try:
+            analysis_cache.put("a", [], [])
+            analysis_cache.put("b", [], [])
+            assert get_committed_keys() == []
+
+            analysis_cache.add_hit("a")
+            assert get_committed_keys() == ["a", "b"]
+
+            analysis_cache.put("c", [], [])
+            analysis_cache.put("d", [], [])
+            analysis_cache.put("e", [], [])
+            # Evicted before the commit, without waiting for the close
+            assert get_committed_keys() == ["d", "e"]
+            assert analysis_cache.evictions == 3
+        finally:
+            analysis_cache.close()
+
+    @staticmethod
+    def test_get_cache_key_depends_on_license_detections_and_flags():
+        licenses = [{"key": "mit", "matched_text": "MIT License"}]
+        key = cache.get_cache_key(licenses, False, True)
+        assert key == cache.get_cache_key(list(licenses), False, True)
+        assert key != cache.get_cache_key(licenses, True, True)
+        assert key != cache.get_cache_key(licenses, False, False)
+        assert key != cache.get_cache_key(
+            [{"key": "mit", "matched_text": "MIT"}], False, True)
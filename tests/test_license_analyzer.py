@@ -8,14 +8,19 @@
 #
 
 import attr
+import itertools
 import os
+import random
 
+import pytest
 from commoncode.testcase import FileBasedTesting
 
 from file_io import load_json
 
 from scancode_analyzer import license_analyzer
+from scancode_analyzer.analyzer_plugin import is_correct_detection_serialized
 from scancode_analyzer.analyzer_plugin import LicenseMatch
+from scancode_analyzer.source_text import SourceText
 from scancode_analyzer.summary import get_identifiers
 
 
@@ -393,6 +398,15 @@ class TestAnalyzer(FileBasedTesting):
 
         assert merged_string == strings["merge_with_overlap"]
 
+    @staticmethod
+    def test_get_overlap_length():
+        assert license_analyzer.get_overlap_length("", "abc") == 0
+        assert license_analyzer.get_overlap_length("abc", "") == 0
+        assert license_analyzer.get_overlap_length("xxabab", "ababc") == 4
+        assert license_analyzer.get_overlap_length("aaaa", "aa") == 2
+        assert license_analyzer.get_overlap_length("abc", "xbc") == 0
+        assert license_analyzer.get_overlap_length("ab" * 5000, "ab" * 6000) == 10000
+
     def test_get_start_end_line(self):
         test_file = self.get_test_loc(
             "analyzer_group_matches_notice_reference_fragments_group_1.json"
@@ -487,6 +501,50 @@ class TestAnalyzer(FileBasedTesting):
         )]
         assert result == expected
 
+    def test_get_identifier_unknown_intro_is_cached_on_issue(self):
+        test_file = self.get_test_loc(
+            "analyzer_is_license_case_intro_one.json")
+        license_matches = load_license_matches_from_json(test_file)
+        [issue] = license_analyzer.LicenseDetectionIssue.from_license_matches(
+            license_matches=license_matches,
+            path="path/to/group_matches_by_location_analyze_result.json",
+            is_license_text=False,
+            is_legal=False,
+        )
+        assert issue.identifier_for_unknown_intro is issue.identifier_for_unknown_intro
+        assert issue.identifier is issue.identifier
+
+    @staticmethod
+    def test_tokenized_matched_texts_are_interned():
+        tokenized_matched_texts = license_analyzer.TokenizedMatchedTexts()
+        tokens = tokenized_matched_texts.get_tokens("Licensed under the MIT")
+        same_tokens = tokenized_matched_texts.get_tokens("licensed  under the\nMIT")
+        assert tokens == ("licensed", "under", "the", "mit")
+        assert same_tokens is tokens
+
+        tokenized_matched_texts.clear()
+        assert not tokenized_matched_texts.tokens_by_matched_text
+        assert not tokenized_matched_texts.interned_tokens
+
+    @staticmethod
+    def test_tokenized_matched_texts_only_caches_recently_used_texts():
+        tokenized_matched_texts = license_analyzer.TokenizedMatchedTexts(max_size=2)
+        tokens = tokenized_matched_texts.get_tokens("Licensed under the MIT")
+        tokenized_matched_texts.get_tokens("Licensed under the GPL")
+        # The first text is used again, so the second text is the least recently
+        # used text
+        assert tokenized_matched_texts.get_tokens("Licensed under the MIT") is tokens
+        tokenized_matched_texts.get_tokens("Licensed under the BSD")
+
+        assert list(tokenized_matched_texts.tokens_by_matched_text) == [
+            "Licensed under the MIT",
+            "Licensed under the BSD",
+        ]
+        # Evicted texts are tokenized again to the same interned tokens
+        same_tokens = tokenized_matched_texts.get_tokens("licensed under the mit")
+        assert same_tokens is tokens
+        assert len(tokenized_matched_texts.tokens_by_matched_text) == 2
+
     def test_analyzer_analyze_region_for_license_scan_issues_notice(self):
         test_file = self.get_test_loc(
             "analyzer_group_matches_notice_reference_fragments.json"
@@ -593,8 +651,261 @@ class TestFromLicenseMatches(FileBasedTesting):
         results = [ar.to_dict(is_summary=False) for ar in ars]
         assert results == expected
 
+    def test_from_license_matches_suggests_matched_text_from_source_text(self):
+        test_file = self.get_test_loc(
+            "analyzer_group_matches_notice_reference_fragments.json"
+        )
+        license_matches = LicenseMatch.from_files_licenses(load_json(test_file))
+        source_file = self.get_temp_file("c")
+        with open(source_file, "w") as f:
+            f.write("".join(f"line {line}\n" for line in range(1, 51)))
+
+        with SourceText(source_file) as source_text:
+            ars = list(license_analyzer.LicenseDetectionIssue.from_license_matches(
+                license_matches=license_matches,
+                source_text=source_text,
+            ))
+        consolidated = list(
+            license_analyzer.LicenseDetectionIssue.from_license_matches(
+                license_matches=license_matches,
+            )
+        )
+
+        assert len(ars) == len(consolidated)
+        for ar, expected_ar in zip(ars, consolidated):
+            [file_region] = ar.file_regions
+            if len(ar.original_licenses) > 1:
+                expected_matched_text = "\n".join(
+                    f"line {line}" for line in
+                    range(file_region.start_line, file_region.end_line + 1)
+                )
+            else:
+                expected_matched_text = expected_ar.suggested_license.matched_text
+            assert ar.suggested_license.matched_text == expected_matched_text
+            assert (
+                ar.suggested_license.license_expression
+                == expected_ar.suggested_license.license_expression
+            )
+
+
+class TestIssueTypesDecisionTable(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data/analyzer/")
+
+    def test_get_issue_type_from_decision_table_same_as_get_issue_type(self):
+        for test_file in sorted(os.listdir(self.test_data_dir)):
+            if not test_file.startswith(("analyzer_is_license_case", "get_error")):
+                continue
+            license_matches = load_license_matches_from_json(
+                self.get_test_loc(test_file))
+            check_issue_type_from_decision_table(license_matches)
+
 
 def load_license_matches_from_json(json_file):
     license_matches = load_json(json_file)
     license_matches = LicenseMatch.from_files_licenses(license_matches)
     return license_matches
+
+
+class TestIsCorrectDetectionSerialized(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data/analyzer/")
+
+    def test_is_correct_detection_serialized_has_no_issues(self):
+        correct_detections_count = 0
+        for test_file in sorted(os.listdir(self.test_data_dir)):
+            if not test_file.startswith("analyzer_"):
+                continue
+            try:
+                license_matches_serialized = load_json(self.get_test_loc(test_file))
+                correct_detections_count += check_is_correct_detection_serialized(
+                    license_matches_serialized)
+            except (ValueError, KeyError, TypeError):
+                # Not a complete list of serialized license matches
+                continue
+        assert correct_detections_count
+
+    @staticmethod
+    def test_is_correct_detection_serialized_with_exact_matches():
+        license_match = get_random_serialized_license_match(random.Random(42))
+        license_match["matched_rule"].update(
+            matcher="4-spdx-id", match_coverage=50.0, rule_length=1,
+        )
+        assert is_correct_detection_serialized([license_match, license_match])
+
+        license_match["matched_rule"].update(identifier="unknown_1.RULE")
+        assert is_correct_detection_serialized([license_match])
+
+
+def quadratic_merge_string_with_overlap(string1, string2):
+    """
+    Return the merge of two strings as `merge_string_with_overlap` did before it
+    ran in linear time.
+    """
+    idx = 0
+    while not string2.startswith(string1[idx:]):
+        idx += 1
+    return string1[:idx] + string2
+
+
+def get_random_strings(randomizer):
+    return tuple(
+        "".join(randomizer.choice("ab ") for _ in range(randomizer.randint(0, 15)))
+        for _ in range(2)
+    )
+
+
+def check_merge_string_with_overlap(strings):
+    """
+    Check that `merge_string_with_overlap` merges a `strings` tuple of two
+    strings as `quadratic_merge_string_with_overlap` does. Return True if these
+    strings overlap.
+    """
+    string1, string2 = strings
+    merged = license_analyzer.merge_string_with_overlap(string1, string2)
+    assert merged == quadratic_merge_string_with_overlap(string1, string2)
+    return merged != string1 + string2
+
+
+def get_random_mock_license_matches(randomizer):
+    return [
+        MockLicenseMatch(
+            rule_identifier=randomizer.choice([
+                "mit.LICENSE",
+                "lead-in_unknown_1.RULE",
+                "license-intro_2.RULE",
+                "unknown_3.RULE",
+                "gpl-2.0_lead_4.RULE",
+            ]),
+            license_expression=randomizer.choice([
+                "mit",
+                "unknown",
+                "gpl-2.0 OR mit",
+                "gpl-2.0 WITH classpath-exception-2.0",
+                "unknown AND mit",
+                "andor",
+            ]),
+            is_license_text=randomizer.random() < 0.1,
+            is_license_notice=randomizer.random() < 0.3,
+            is_license_tag=randomizer.random() < 0.3,
+            is_license_reference=randomizer.random() < 0.3,
+            is_license_intro=randomizer.random() < 0.3,
+        )
+        for _ in range(randomizer.randint(1, 3))
+    ]
+
+
+def check_issue_type_from_decision_table(license_matches):
+    """
+    Check that `get_issue_type_from_decision_table` returns the same issue types
+    as `get_issue_type` for `license_matches` in every file and issue category.
+    Return a tuple of these issue types.
+    """
+    results = []
+    for is_license_text, is_legal, issue_category in itertools.product(
+        (False, True), (False, True), license_analyzer.ISSUE_CATEGORIES,
+    ):
+        issue_rule_type = license_analyzer.get_issue_rule_type(
+            license_matches, is_license_text, is_legal,
+        )
+        expected = license_analyzer.get_issue_type(
+            license_matches,
+            is_license_text,
+            is_legal,
+            issue_category,
+            issue_rule_type,
+        )
+        result = license_analyzer.get_issue_type_from_decision_table(
+            license_matches, is_license_text, is_legal, issue_category,
+        )
+        assert result == expected
+        results.append(result)
+    return tuple(results)
+
+
+def get_random_serialized_license_match(randomizer):
+    """
+    Return a serialized license match mapping with random values for the
+    attributes used to classify license detection issues.
+    """
+    start_line = randomizer.choice([1, 10, 1000, 1001, 5000])
+    return {
+        "score": randomizer.choice([50.0, 99.0, 100.0]),
+        "start_line": start_line,
+        "end_line": start_line + randomizer.choice([0, 5, 20]),
+        "matched_rule": {
+            "identifier": randomizer.choice(
+                ["mit.LICENSE", "gpl_12.RULE", "unknown_3.RULE"]),
+            "license_expression": randomizer.choice(["mit", "gpl-2.0"]),
+            "is_license_text": randomizer.choice([True, False]),
+            "is_license_notice": randomizer.choice([True, False]),
+            "is_license_reference": False,
+            "is_license_tag": randomizer.choice([True, False]),
+            "is_license_intro": False,
+            "matcher": randomizer.choice(["1-hash", "2-aho", "3-seq", "4-spdx-id"]),
+            "matched_length": 10,
+            "rule_length": randomizer.choice([1, 3, 4, 100]),
+            "match_coverage": randomizer.choice([50.0, 99.5, 100.0]),
+            "rule_relevance": randomizer.choice([50, 99, 100]),
+        },
+        "matched_text": "license text",
+    }
+
+
+def get_random_serialized_license_matches(randomizer):
+    return [
+        get_random_serialized_license_match(randomizer)
+        for _ in range(randomizer.randint(1, 4))
+    ]
+
+
+def check_is_correct_detection_serialized(license_matches_serialized):
+    """
+    Check that a file found to have only correct license detections from its
+    `license_matches_serialized` has no license detection issue. Return True if
+    found to have only correct license detections.
+    """
+    if not is_correct_detection_serialized(license_matches_serialized):
+        return False
+
+    license_matches = LicenseMatch.from_files_licenses(license_matches_serialized)
+    for is_license_text in (False, True):
+        ars = license_analyzer.LicenseDetectionIssue.from_license_matches(
+            license_matches, is_license_text=is_license_text)
+        assert list(ars) == []
+    return True
+
+
+@pytest.mark.parametrize(
+    "get_random_input, check, runs",
+    [
+        pytest.param(
+            get_random_strings,
+            check_merge_string_with_overlap,
+            20000,
+            id="merge_string_with_overlap",
+        ),
+        pytest.param(
+            get_random_mock_license_matches,
+            check_issue_type_from_decision_table,
+            2000,
+            id="get_issue_type_from_decision_table",
+        ),
+        pytest.param(
+            get_random_serialized_license_matches,
+            check_is_correct_detection_serialized,
+            2000,
+            id="is_correct_detection_serialized",
+        ),
+    ],
+)
+def test_is_same_as_reference_implementation_with_random_inputs(
+    get_random_input, check, runs,
+):
+    """
+    Check `runs` random inputs from `get_random_input` with a `check` function,
+    which asserts that an optimized function has the same results as its
+    reference implementation, and returns an outcome of the input. The random
+    inputs must reach different outcomes.
+    """
+    randomizer = random.Random(42)
+    outcomes = {check(get_random_input(randomizer)) for _ in range(runs)}
+    assert len(outcomes) > 1
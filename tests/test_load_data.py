@@ -0,0 +1,324 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import os
+import shutil
+import warnings
+from unittest import mock
+
+import pytest
+
+from commoncode.testcase import FileBasedTesting
+
+pd = pytest.importorskip("pandas")
+
+from licensedcode import models
+
+from scancode_analyzer import load_data
+
+
+def get_values(df, column):
+    """
+    Return a list of the values of a `column` of a `df` DataFrame, with None for
+    the missing values.
+    """
+    return [
+        None if not isinstance(value, list) and pd.isna(value) else value
+        for value in df[column]
+    ]
+
+
+class TestLoadData(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data/load_data/")
+
+    def get_rule_records(self):
+        rules = models.load_rules(self.get_test_loc("rules"))
+        return [load_data.get_rule_record(rule) for rule in rules]
+
+    def test_build_dataframe_is_same_as_per_row_dataframes(self):
+        records = self.get_rule_records()
+        # As built before, with a one-row DataFrame for each rule
+        expected = pd.concat([
+            pd.DataFrame.from_dict(record, orient="index").T
+            for record in records
+        ])
+
+        df = load_data.build_dataframe(
+            records,
+            categorical_columns=load_data.categorical_rule_attributes,
+            boolean_columns=load_data.boolean_rule_attributes,
+        )
+
+        assert list(df.columns) == list(expected.columns)
+        assert list(df.index) == list(range(len(records)))
+        for column in df.columns:
+            expected_values = get_values(expected, column)
+            if column in load_data.boolean_rule_attributes:
+                assert df[column].dtype == bool
+                expected_values = [value is True for value in expected_values]
+            assert get_values(df, column) == expected_values, column
+
+        assert isinstance(df["license_expression"].dtype, pd.CategoricalDtype)
+        assert set(df["license_expression"].cat.categories) == {"isc", "mit"}
+        assert df["words_count"].dtype == "int64"
+
+    def test_rules_compute_relevance(self):
+        # The false positive rule is not the first, so that selecting it by its
+        # index label 0 would fail
+        records = sorted(
+            self.get_rule_records(),
+            key=lambda record: record["rule_filename"],
+            reverse=True,
+        )
+        rule_df = load_data.build_dataframe(
+            records,
+            boolean_columns=load_data.boolean_rule_attributes,
+        )
+
+        load_data.LicenseRulesInfo.rules_compute_relevance(rule_df)
+
+        relevances = dict(zip(rule_df["rule_filename"], rule_df["relevance"]))
+        assert relevances == {
+            # False positive rules have a relevance of 100
+            "false-positive_1": 100,
+            # Stored relevances are kept for the other rules
+            "mit_2": 99,
+            "isc_1": 100,
+            # Rules with more words than the threshold have a relevance of 100
+            "mit_1": 100,
+            "isc_2": 100,
+            # Short rules have a relevance computed from their words count
+            "mit_3": 11.12,
+        }
+
+    def get_license_rules_info(self, **kwargs):
+        return load_data.LicenseRulesInfo(
+            rules_folder=self.get_test_loc("rules"),
+            licenses_folder=self.get_test_loc("licenses"),
+            **kwargs,
+        )
+
+    def test_license_rules_info_cache_round_trip(self):
+        cache_dir = self.get_temp_dir()
+        expected = self.get_license_rules_info(cache_dir=None)
+
+        info = self.get_license_rules_info(cache_dir=cache_dir)
+        cache_files = os.listdir(cache_dir)
+        assert len(cache_files) == 1
+        pd.testing.assert_frame_equal(info.rule_df, expected.rule_df)
+        pd.testing.assert_frame_equal(info.lic_df, expected.lic_df)
+
+        # Loaded from the cache, without loading any rule
+        with mock.patch.object(load_data.models, "load_rules") as load_rules:
+            cached = self.get_license_rules_info(cache_dir=cache_dir)
+        assert not load_rules.called
+        assert os.listdir(cache_dir) == cache_files
+        pd.testing.assert_frame_equal(cached.rule_df, expected.rule_df)
+        pd.testing.assert_frame_equal(cached.lic_df, expected.lic_df)
+
+    def test_license_rules_info_rebuilds_a_corrupted_cache(self):
+        cache_dir = self.get_temp_dir()
+        expected = self.get_license_rules_info(cache_dir=cache_dir)
+        cache_file, = os.listdir(cache_dir)
+        with open(os.path.join(cache_dir, cache_file), "wb") as corrupted:
+            corrupted.write(b"not a pickle")
+
+        with pytest.warns(UserWarning, match="invalid license rules info cache"):
+            info = self.get_license_rules_info(cache_dir=cache_dir)
+        pd.testing.assert_frame_equal(info.rule_df, expected.rule_df)
+        pd.testing.assert_frame_equal(info.lic_df, expected.lic_df)
+
+    def test_license_rules_info_rebuilds_a_truncated_cache(self):
+        cache_dir = self.get_temp_dir()
+        expected = self.get_license_rules_info(cache_dir=cache_dir)
+        cache_file, = os.listdir(cache_dir)
+        cache_location = os.path.join(cache_dir, cache_file)
+        with open(cache_location, "rb") as cache:
+            content = cache.read()
+        with open(cache_location, "wb") as truncated:
+            truncated.write(content[:len(content) // 2])
+
+        with pytest.warns(UserWarning, match="invalid license rules info cache"):
+            info = self.get_license_rules_info(cache_dir=cache_dir)
+        pd.testing.assert_frame_equal(info.rule_df, expected.rule_df)
+        pd.testing.assert_frame_equal(info.lic_df, expected.lic_df)
+
+    def test_license_rules_info_does_not_load_a_cache_of_another_pandas_version(self):
+        cache_dir = self.get_temp_dir()
+        info = self.get_license_rules_info(cache_dir=cache_dir)
+        cache_file, = os.listdir(cache_dir)
+
+        with mock.patch.object(load_data.pd, "__version__", "0.0.0"):
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                assert not info.load_cache(os.path.join(cache_dir, cache_file))
+                assert not info.load_stale_cache(cache_dir)
+
+        with mock.patch.object(load_data, "scancode_version", "0.0.0"):
+            assert not info.load_cache(os.path.join(cache_dir, cache_file))
+            assert info.load_stale_cache(cache_dir)
+
+    def test_license_rules_info_with_processes_is_same_as_serial(self):
+        expected = self.get_license_rules_info(cache_dir=None)
+
+        info = self.get_license_rules_info(cache_dir=None, processes=2)
+
+        # Rows are loaded in a different order
+        for df, expected_df, key in (
+            (info.rule_df, expected.rule_df, "rule_filename"),
+            (info.lic_df, expected.lic_df, "license_filename"),
+        ):
+            pd.testing.assert_frame_equal(
+                df.sort_values(key).reset_index(drop=True),
+                expected_df.sort_values(key).reset_index(drop=True),
+                check_like=True,
+            )
+
+    def test_license_rules_info_without_text(self):
+        expected = self.get_license_rules_info(cache_dir=None)
+
+        info = self.get_license_rules_info(cache_dir=None, with_text=False)
+        assert "text" not in info.rule_df.columns
+        assert "text" not in info.lic_df.columns
+        pd.testing.assert_frame_equal(
+            info.rule_df,
+            expected.rule_df.drop(columns=["text"]),
+        )
+
+        rule_texts = dict(
+            zip(expected.rule_df["rule_filename"], expected.rule_df["text"])
+        )
+        assert info.get_rule_text("mit_3") == rule_texts["mit_3"]
+        license_texts = dict(
+            zip(expected.lic_df["license_filename"], expected.lic_df["text"])
+        )
+        assert info.get_license_text("isc") == license_texts["isc"]
+
+        info.load_texts()
+        for df, expected_df in (
+            (info.rule_df, expected.rule_df),
+            (info.lic_df, expected.lic_df),
+        ):
+            pd.testing.assert_frame_equal(df, expected_df, check_like=True)
+
+    def copy_test_data(self):
+        """
+        Return a tuple of (rules folder, licenses folder) of a copy of the test
+        rules and licenses in a temporary directory.
+        """
+        data_dir = self.get_temp_dir()
+        folders = []
+        for name in ("rules", "licenses"):
+            folder = os.path.join(data_dir, name)
+            shutil.copytree(self.get_test_loc(name), folder)
+            folders.append(folder)
+        return tuple(folders)
+
+    def assert_same_dataframes(self, df, expected_df, key):
+        pd.testing.assert_frame_equal(
+            df.sort_values(key).reset_index(drop=True),
+            expected_df.sort_values(key).reset_index(drop=True),
+            check_like=True,
+        )
+
+    def test_license_rules_info_refreshes_a_stale_cache_with_changed_rules(self):
+        rules_folder, licenses_folder = self.copy_test_data()
+        cache_dir = self.get_temp_dir()
+        load_data.LicenseRulesInfo(rules_folder, licenses_folder, cache_dir)
+        stale_cache_file, = os.listdir(cache_dir)
+
+        # Added rule
+        with open(os.path.join(rules_folder, "isc_3.yml"), "w") as data_file:
+            data_file.write("license_expression: isc\nis_license_reference: yes\n")
+        with open(os.path.join(rules_folder, "isc_3.RULE"), "w") as text_file:
+            text_file.write("ISC license")
+        # Modified rule
+        data_file = os.path.join(rules_folder, "mit_2.yml")
+        with open(data_file) as data:
+            content = data.read()
+        with open(data_file, "w") as data:
+            data.write(content.replace("relevance: 99", "relevance: 90"))
+        # Deleted rule
+        os.remove(os.path.join(rules_folder, "isc_1.yml"))
+        os.remove(os.path.join(rules_folder, "isc_1.RULE"))
+        # Touched rule, as when ScanCode is reinstalled, which is not reloaded
+        text_file = os.path.join(rules_folder, "mit_1.RULE")
+        stat = os.stat(text_file)
+        os.utime(text_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        with mock.patch.object(
+            load_data, "get_rule_record", wraps=load_data.get_rule_record,
+        ) as get_rule_record:
+            with mock.patch.object(load_data.models, "load_rules") as load_rules:
+                with mock.patch.object(
+                    load_data.models, "load_licenses",
+                ) as load_licenses:
+                    info = load_data.LicenseRulesInfo(
+                        rules_folder, licenses_folder, cache_dir,
+                    )
+
+        assert not load_rules.called
+        assert not load_licenses.called
+        loaded = sorted(
+            call.args[0].identifier for call in get_rule_record.call_args_list
+        )
+        assert loaded == ["isc_3.RULE", "mit_2.RULE"]
+        # The refreshed cache replaces the stale cache
+        cache_file, = os.listdir(cache_dir)
+        assert cache_file != stale_cache_file
+
+        expected = load_data.LicenseRulesInfo(rules_folder, licenses_folder, None)
+        relevances = dict(
+            zip(info.rule_df["rule_filename"], info.rule_df["relevance"])
+        )
+        assert "isc_1" not in relevances
+        assert relevances["mit_2"] == 90
+        self.assert_same_dataframes(info.rule_df, expected.rule_df, "rule_filename")
+        pd.testing.assert_frame_equal(info.lic_df, expected.lic_df)
+
+    def test_license_rules_info_refreshes_a_stale_cache_with_changed_licenses(self):
+        rules_folder, licenses_folder = self.copy_test_data()
+        cache_dir = self.get_temp_dir()
+        load_data.LicenseRulesInfo(rules_folder, licenses_folder, cache_dir)
+
+        data_file = os.path.join(licenses_folder, "isc.yml")
+        with open(data_file) as data:
+            content = data.read()
+        with open(data_file, "w") as data:
+            data.write(content.replace("minimum_coverage: 80", "minimum_coverage: 70"))
+
+        with mock.patch.object(load_data.models, "load_rules") as load_rules:
+            info = load_data.LicenseRulesInfo(rules_folder, licenses_folder, cache_dir)
+        assert not load_rules.called
+
+        expected = load_data.LicenseRulesInfo(rules_folder, licenses_folder, None)
+        min_covs = dict(zip(info.lic_df["key"], info.lic_df["minimum_coverage"]))
+        assert min_covs["isc"] == 70
+        pd.testing.assert_frame_equal(info.rule_df, expected.rule_df)
+        pd.testing.assert_frame_equal(info.lic_df, expected.lic_df)
+
+    def test_license_rules_info_refreshes_a_cache_of_another_scancode_version(self):
+        cache_dir = self.get_temp_dir()
+        expected = self.get_license_rules_info(cache_dir=cache_dir)
+        fingerprint = load_data.get_data_fingerprint(
+            self.get_test_loc("rules"), self.get_test_loc("licenses")
+        )
+
+        with mock.patch.object(load_data, "scancode_version", "0.0.0"):
+            upgraded_fingerprint = load_data.get_data_fingerprint(
+                self.get_test_loc("rules"), self.get_test_loc("licenses")
+            )
+            with mock.patch.object(load_data.models, "load_rules") as load_rules:
+                info = self.get_license_rules_info(cache_dir=cache_dir)
+        assert upgraded_fingerprint != fingerprint
+        assert not load_rules.called
+        cache_file, = os.listdir(cache_dir)
+        assert upgraded_fingerprint in cache_file
+        pd.testing.assert_frame_equal(info.rule_df, expected.rule_df)
+        pd.testing.assert_frame_equal(info.lic_df, expected.lic_df)
@@ -0,0 +1,74 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import os
+
+from commoncode.testcase import FileBasedTesting
+
+from scancode_analyzer.source_text import SourceText
+
+
+class TestSourceText(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data/analyzer/")
+
+    def get_source_file(self, content):
+        source_file = self.get_temp_file("txt")
+        with open(source_file, "wb") as f:
+            f.write(content)
+        return source_file
+
+    def test_get_lines_text(self):
+        source_file = self.get_source_file(b"one\ntwo\nthree\nfour\n")
+        with SourceText(source_file) as source_text:
+            assert source_text.get_lines_text(1, 1) == "one"
+            assert source_text.get_lines_text(2, 3) == "two\nthree"
+            assert source_text.get_lines_text(1, 4) == "one\ntwo\nthree\nfour"
+            assert source_text.get_lines_text(4, 4) == "four"
+
+    def test_get_lines_text_indexes_lines_lazily(self):
+        source_file = self.get_source_file(b"one\ntwo\nthree\nfour\nfive\n")
+        with SourceText(source_file) as source_text:
+            assert source_text.get_lines_text(1, 2) == "one\ntwo"
+            assert len(source_text.line_offsets) == 3
+            assert not source_text.is_indexed
+
+    def test_get_lines_text_without_final_newline(self):
+        source_file = self.get_source_file(b"one\ntwo")
+        with SourceText(source_file) as source_text:
+            assert source_text.get_lines_text(1, 2) == "one\ntwo"
+            assert source_text.get_lines_text(2, 2) == "two"
+
+    def test_get_lines_text_normalizes_crlf_newlines(self):
+        source_file = self.get_source_file(b"one\r\ntwo\r\nthree\r\n")
+        with SourceText(source_file) as source_text:
+            assert source_text.get_lines_text(1, 2) == "one\ntwo"
+            assert source_text.get_lines_text(3, 3) == "three"
+
+    def test_get_lines_text_replaces_undecodable_bytes(self):
+        source_file = self.get_source_file(b"caf\xe9\n")
+        with SourceText(source_file) as source_text:
+            assert source_text.get_lines_text(1, 1) == "caf�"
+
+    def test_get_lines_text_returns_none_for_missing_lines(self):
+        source_file = self.get_source_file(b"one\ntwo\n")
+        with SourceText(source_file) as source_text:
+            assert source_text.get_lines_text(2, 4) is None
+            assert source_text.get_lines_text(0, 1) is None
+            assert source_text.get_lines_text(2, 1) is None
+
+    def test_get_lines_text_with_empty_file(self):
+        source_file = self.get_source_file(b"")
+        with SourceText(source_file) as source_text:
+            assert source_text.get_lines_text(1, 1) == ""
+            assert source_text.get_lines_text(1, 2) is None
+
+    def test_get_lines_text_returns_none_for_missing_file(self):
+        source_file = os.path.join(self.get_temp_dir(), "missing.txt")
+        with SourceText(source_file) as source_text:
+            assert source_text.get_lines_text(1, 1) is None
@@ -0,0 +1,255 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import io
+import json
+import os
+from unittest import mock
+
+from click.testing import CliRunner
+from commoncode.testcase import FileBasedTesting
+
+from file_io import load_json
+from scancode_analyzer import cli
+from scancode_analyzer import stream_analyzer
+
+
+class TestJSONStreamReader(FileBasedTesting):
+    test_data_dir = os.path.join(
+        os.path.dirname(__file__),
+        "data/analyzer-plugins/"
+    )
+
+    def test_iter_scanned_files_is_same_as_json_load(self):
+        input_json = self.get_test_loc("sample_files_result.json")
+        expected = load_json(input_json)["files"]
+        results = list(stream_analyzer.iter_scanned_files(input_json))
+        assert results == expected
+
+    def test_iter_scanned_files_from_json_lines(self):
+        input_json = self.get_test_loc("sample_files_result.json")
+        scan = load_json(input_json)
+        input_json_lines = self.get_temp_file("json")
+        with open(input_json_lines, "w") as jsonl:
+            jsonl.write(json.dumps({"headers": scan["headers"]}) + "\n")
+            for scanned_file in scan["files"]:
+                jsonl.write(json.dumps({"files": [scanned_file]}) + "\n")
+
+        results = list(stream_analyzer.iter_scanned_files(input_json_lines))
+        assert results == scan["files"]
+
+    @staticmethod
+    def test_json_stream_reader_with_small_chunks():
+        data = {
+            "headers": [{"tool_name": "scancode-toolkit", "count": 123456789}],
+            "files": [{"path": "a", "size": 1234}, {"path": "b", "size": 5}],
+            "other": [],
+        }
+        reader = stream_analyzer.JSONStreamReader(
+            io.StringIO(json.dumps(data, indent=2)), chunk_size=3,
+        )
+        results = {}
+        for key, value in reader.iter_object_items(streamed_keys=("files",)):
+            if key == "files":
+                value = list(value)
+            results[key] = value
+        assert results == data
+        assert not reader.peek()
+
+    @staticmethod
+    def test_json_stream_reader_raise_exception_on_invalid_json():
+        reader = stream_analyzer.JSONStreamReader(
+            io.StringIO('{"files": [{"path": "a"} {"path": "b"}]}'),
+        )
+        try:
+            for _key, value in reader.iter_object_items(streamed_keys=("files",)):
+                list(value)
+            raise Exception("Exception not raised")
+        except stream_analyzer.ResultsFileError:
+            pass
+
+
+class TestResultsFileAnalyzer(FileBasedTesting):
+    test_data_dir = os.path.join(
+        os.path.dirname(__file__),
+        "data/analyzer-plugins/"
+    )
+
+    def check_analyze_results_file(self, input_json, expected_json, processes=1):
+        analyzed_files, analyzer = stream_analyzer.analyze_results_file(
+            location=self.get_test_loc(input_json),
+            processes=processes,
+        )
+        results = {
+            analyzed_file.path: analyzed_file.license_detection_issues
+            for analyzed_file in analyzed_files
+        }
+        summary = analyzer.summarize().to_dict()
+
+        expected_scan = load_json(self.get_test_loc(expected_json))
+        expected = {
+            scanned_file["path"]: scanned_file["license_detection_issues"]
+            for scanned_file in expected_scan["files"]
+            if scanned_file["license_detection_issues"]
+        }
+        expected_summary = expected_scan["license_detection_issues_summary"]
+
+        assert results == expected
+        assert json.loads(json.dumps(summary)) == expected_summary
+
+    def test_analyze_results_file(self):
+        self.check_analyze_results_file(
+            "sample_files_result.json",
+            "results_analyzer_from_sample_json_expected.json",
+        )
+
+    def test_analyze_results_file_with_processes(self):
+        self.check_analyze_results_file(
+            "sample_files_result.json",
+            "results_analyzer_from_sample_json_expected.json",
+            processes=2,
+        )
+
+    def test_analyze_results_file_with_processes_is_same_as_serial(self):
+        input_json = self.get_test_loc("sample_files_result_same_unique_issues.json")
+
+        analyzed_files, analyzer = stream_analyzer.analyze_results_file(
+            location=input_json,
+        )
+        expected = [analyzed_file.to_dict() for analyzed_file in analyzed_files]
+        expected_summary = analyzer.summarize().to_dict()
+
+        analyzed_files, analyzer = stream_analyzer.analyze_results_file(
+            location=input_json,
+            processes=3,
+        )
+        results = [analyzed_file.to_dict() for analyzed_file in analyzed_files]
+        assert results == expected
+        assert analyzer.summarize().to_dict() == expected_summary
+
+    def test_analyze_results_file_raise_exception_if_missing_is_legal(self):
+        for processes in (1, 2):
+            analyzed_files, _analyzer = stream_analyzer.analyze_results_file(
+                location=self.get_test_loc("sample_files_missing_legal.json"),
+                processes=processes,
+            )
+            try:
+                list(analyzed_files)
+                self.fail(msg="Exception not raised")
+            except stream_analyzer.ResultsFileError:
+                pass
+
+    def test_analyze_with_processes_reads_bounded_chunks_ahead(self):
+        scan = load_json(self.get_test_loc("sample_files_result.json"))
+        scanned_file, = [
+            scanned_file for scanned_file in scan["files"]
+            if scanned_file["path"] == "scan-files/genshell.c"
+        ]
+        read_paths = []
+
+        def get_scanned_files():
+            for index in range(100):
+                path = f"{index}/genshell.c"
+                read_paths.append(path)
+                yield dict(scanned_file, path=path)
+
+        analyzer = stream_analyzer.ResultsFileAnalyzer()
+        with mock.patch.object(stream_analyzer, "ANALYSIS_CHUNKSIZE", 10):
+            analyzed_files = analyzer.analyze(get_scanned_files(), processes=2)
+            first = next(analyzed_files)
+            # Two pending chunks for each process
+            assert len(read_paths) == 40
+            results = [first] + list(analyzed_files)
+
+        assert [analyzed_file.path for analyzed_file in results] == read_paths
+
+    def test_analyze_command(self):
+        input_json = self.get_test_loc("sample_files_result.json")
+        result_file = self.get_temp_file("json")
+        runner = CliRunner()
+        result = runner.invoke(cli.cli, ["analyze", input_json, result_file])
+        assert result.exit_code == 0, result.output
+
+        with open(result_file) as results:
+            lines = [json.loads(line) for line in results]
+
+        *analyzed_files, summary = lines
+        assert [analyzed_file["path"] for analyzed_file in analyzed_files] == [
+            "scan-files/1921-socat-2.0.0-error.h",
+            "scan-files/genshell.c",
+        ]
+        statistics = summary["license_detection_issues_summary"]["statistics"]
+        assert statistics["total_files_with_license"] == 3
+        assert statistics["total_files_with_license_detection_issues"] == 2
+
+    def test_analyze_command_fails_with_invalid_license_matches(self):
+        scan = load_json(self.get_test_loc("sample_files_result.json"))
+        for scanned_file in scan["files"]:
+            for license_match in scanned_file.get("licenses", []):
+                del license_match["matched_rule"]["rule_length"]
+        input_json = self.get_temp_file("json")
+        with open(input_json, "w") as scan_file:
+            json.dump(scan, scan_file)
+
+        runner = CliRunner()
+        result = runner.invoke(
+            cli.cli, ["analyze", input_json, self.get_temp_file("json")]
+        )
+        assert result.exit_code == 1
+        assert not result.exception or isinstance(result.exception, SystemExit)
+        assert (
+            "Error: Invalid license matches in the scan: Cannot convert scancode "
+            "data to LicenseMatch class: 'rule_length'. The scan must be run"
+        ) in result.output
+        assert "Traceback" not in result.output
+
+    def test_merge_command(self):
+        input_json = self.get_test_loc("sample_files_result_same_unique_issues.json")
+        scan = load_json(input_json)
+        runner = CliRunner()
+
+        partial_summaries = []
+        for scanned_files in (scan["files"][:4], scan["files"][4:]):
+            shard_json = self.get_temp_file("json")
+            with open(shard_json, "w") as shard:
+                json.dump({"files": scanned_files}, shard)
+            partial_summary = self.get_temp_file("json")
+            result = runner.invoke(cli.cli, [
+                "analyze", shard_json, self.get_temp_file("json"),
+                "--partial-summary", partial_summary,
+            ])
+            assert result.exit_code == 0, result.output
+            partial_summaries.append(partial_summary)
+
+        result_file = self.get_temp_file("json")
+        result = runner.invoke(cli.cli, ["merge", *partial_summaries, result_file])
+        assert result.exit_code == 0, result.output
+
+        analyzed_files, analyzer = stream_analyzer.analyze_results_file(input_json)
+        for _analyzed_file in analyzed_files:
+            pass
+        expected = analyzer.summarize().to_dict()
+        assert load_json(result_file) == {
+            "license_detection_issues_summary": json.loads(json.dumps(expected))
+        }
+
+    def test_merge_command_does_not_write_output_with_invalid_partial_summary(self):
+        partial_summary = self.get_temp_file("json")
+        with open(partial_summary, "w") as invalid:
+            json.dump({"count_has_license": 1}, invalid)
+        result_file = self.get_temp_file("json")
+        with open(result_file, "w") as previous:
+            previous.write("previous summary")
+
+        runner = CliRunner()
+        result = runner.invoke(cli.cli, ["merge", partial_summary, result_file])
+        assert result.exit_code == 1
+        assert "Invalid partial summary" in result.output
+        with open(result_file) as previous:
+            assert previous.read() == "previous summary"
@@ -0,0 +1,72 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/scancode-toolkit for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import os
+
+from commoncode.testcase import FileBasedTesting
+
+from file_io import load_json
+from scancode_analyzer import license_analyzer
+from scancode_analyzer.analyzer_plugin import LicenseMatch
+from scancode_analyzer.timings import AnalysisTimings
+
+
+class TestAnalysisTimings(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data/analyzer/")
+
+    @staticmethod
+    def test_add_time_returns_next_start_time():
+        timings = AnalysisTimings()
+        start = timings.start()
+        next_start = timings.add_time("stage", start)
+        assert next_start >= start
+        assert timings.timings["stage"] == next_start - start
+
+    @staticmethod
+    def test_merge_and_to_dict():
+        timings = AnalysisTimings()
+        timings.timings["b"] = 0.25
+        timings.count("files")
+        other_timings = AnalysisTimings()
+        other_timings.timings.update(a=1.0, b=0.5)
+        other_timings.count("files", 2)
+        other_timings.count("regions", 3)
+
+        timings.merge(other_timings)
+        assert timings.to_dict() == dict(
+            timings=dict(a=1.0, b=0.75),
+            counters=dict(files=3, regions=3),
+        )
+
+    def test_from_license_matches_with_timings_has_same_issues(self):
+        test_file = self.get_test_loc(
+            "analyzer_group_matches_notice_reference_fragments.json"
+        )
+        license_matches = LicenseMatch.from_files_licenses(load_json(test_file))
+
+        timings = AnalysisTimings()
+        ars = list(license_analyzer.LicenseDetectionIssue.from_license_matches(
+            license_matches, timings=timings,
+        ))
+        expected = list(license_analyzer.LicenseDetectionIssue.from_license_matches(
+            license_matches,
+        ))
+
+        assert [ar.to_dict() for ar in ars] == [ar.to_dict() for ar in expected]
+        assert set(timings.timings) == {
+            "group_matches", "analyze_regions", "format_issues",
+        }
+        regions_count = timings.counters["regions"]
+        assert regions_count == len(
+            list(license_analyzer.group_matches(license_matches))
+        )
+        assert regions_count == sum(
+            count for counter, count in timings.counters.items()
+            if counter.startswith("regions:")
+        )